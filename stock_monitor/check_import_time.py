@@ -0,0 +1,114 @@
+#!/usr/bin/env python3
+"""
+Measure CLI startup cost with `python -X importtime` and track it over time
+"""
+import argparse
+import csv
+import os
+import subprocess
+import sys
+from datetime import datetime
+from pathlib import Path
+
+SRC_DIR = Path(__file__).parent / 'src'
+HISTORY_FILE = Path(__file__).parent / 'logs' / 'import_time.csv'
+
+# Modules that must not be loaded just by importing the CLI module
+HEAVY_MODULES = ['tushare', 'pandas', 'numpy', 'schedule']
+
+# What `--test-email` runs, with SMTP replaced so nothing is sent
+TEST_EMAIL_PATH = """
+import smtplib
+
+class NoSMTP:
+    def __init__(self, *args, **kwargs): pass
+    def __enter__(self): return self
+    def __exit__(self, *exc): return False
+    def starttls(self): pass
+    def login(self, *args): pass
+    def send_message(self, msg): pass
+
+smtplib.SMTP = NoSMTP
+import stock_monitor
+from email_notifier import EmailNotifier
+assert EmailNotifier('smtp.example.com', 587, 'me@example.com', 'x', ['me@example.com']).send_test_email()
+"""
+
+
+def measure_import_time(module: str = 'stock_monitor'):
+    """Import `module` in a fresh interpreter and parse the -X importtime report"""
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR))
+    result = subprocess.run(
+        [sys.executable, '-X', 'importtime', '-c', f'import {module}'],
+        cwd=SRC_DIR, env=env, capture_output=True, text=True
+    )
+    if result.returncode != 0:
+        raise RuntimeError(f"Importing {module} failed:\n{result.stderr}")
+
+    # Lines look like: "import time:       123 |        456 |   package.module"
+    entries = []
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'self [us]' in line:
+            continue
+        self_us, cumulative_us, name = line[len('import time:'):].split('|')
+        entries.append((name.strip(), int(self_us), int(cumulative_us)))
+
+    return entries
+
+
+def heavy_modules_after(code: str):
+    """Heavy modules in sys.modules after running `code` in a fresh interpreter"""
+    env = dict(os.environ, PYTHONPATH=str(SRC_DIR))
+    probe = f"{code}\nimport sys\nprint(' '.join(m for m in {HEAVY_MODULES!r} if m in sys.modules))"
+    result = subprocess.run([sys.executable, '-c', probe], cwd=SRC_DIR, env=env, capture_output=True, text=True)
+    if result.returncode != 0:
+        raise RuntimeError(f"Running the probe failed:\n{result.stderr}")
+    return result.stdout.split()
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Measure stock_monitor import time')
+    parser.add_argument('--module', default='stock_monitor', help='Module to import')
+    parser.add_argument('--top', type=int, default=10, help='Number of slowest imports to show')
+    parser.add_argument('--budget-ms', type=float, help='Fail if total import time exceeds this')
+    parser.add_argument('--no-track', action='store_true', help='Do not append to the history file')
+    args = parser.parse_args()
+
+    entries = measure_import_time(args.module)
+    total_ms = sum(self_us for _, self_us, _ in entries) / 1000
+    loaded = {name.split('.')[0] for name, _, _ in entries}
+    heavy_loaded = [name for name in HEAVY_MODULES if name in loaded]
+
+    print(f"Importing {args.module}: {total_ms:.1f} ms across {len(entries)} modules")
+    print(f"\nSlowest {args.top} imports (cumulative):")
+    for name, _, cumulative_us in sorted(entries, key=lambda e: e[2], reverse=True)[:args.top]:
+        print(f"  {cumulative_us / 1000:8.1f} ms  {name}")
+
+    if not args.no_track:
+        HISTORY_FILE.parent.mkdir(exist_ok=True)
+        write_header = not HISTORY_FILE.exists()
+        with open(HISTORY_FILE, 'a', newline='') as f:
+            writer = csv.writer(f)
+            if write_header:
+                writer.writerow(['timestamp', 'module', 'total_ms', 'module_count', 'heavy_modules'])
+            writer.writerow([datetime.now().isoformat(timespec='seconds'), args.module,
+                             f"{total_ms:.1f}", len(entries), ' '.join(heavy_loaded)])
+        print(f"\nRecorded in {HISTORY_FILE}")
+
+    failed = False
+    if heavy_loaded:
+        print(f"\n❌ Heavy modules loaded at import time: {', '.join(heavy_loaded)}")
+        failed = True
+    test_email_loaded = heavy_modules_after(TEST_EMAIL_PATH)
+    if test_email_loaded:
+        print(f"\n❌ --test-email loads heavy modules: {', '.join(test_email_loaded)}")
+        failed = True
+    if args.budget_ms is not None and total_ms > args.budget_ms:
+        print(f"\n❌ Import time {total_ms:.1f} ms exceeds budget of {args.budget_ms:.1f} ms")
+        failed = True
+
+    sys.exit(1 if failed else 0)
+
+
+if __name__ == "__main__":
+    main()
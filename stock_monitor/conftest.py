@@ -0,0 +1,2 @@
+# Manual scripts: they need config/secrets.json, send real email or run forever
+collect_ignore = ['test_email_debug.py', 'test_email_format.py', 'test_scheduler.py']
@@ -0,0 +1,103 @@
+import hashlib
+import json
+import os
+import threading
+import pandas as pd
+import logging
+from pathlib import Path
+from typing import Dict, List, Optional, Tuple
+
+from json_encoding import json_default
+
+logger = logging.getLogger(__name__)
+
+FINGERPRINT_COLUMNS = ['trade_date', 'open', 'high', 'low', 'close']
+
+
+class AnalysisMemo:
+    """Per-stock analysis results memoized by a fingerprint of their input.
+
+    The fingerprint hashes a stock's daily bars together with the rule
+    parameters, so a stock whose bars did not change since the last run
+    reuses its stored alert and indicators instead of being re-analyzed.
+    Each entry also remembers its last bar date: once that equals the latest
+    closed session, the stock's data for the session is final and it does
+    not even need to be fetched again. Changing any rule parameter discards
+    the whole memo.
+    """
+
+    def __init__(self, path: str, parameters: Dict):
+        self.path = Path(path)
+        self.parameters = json.dumps(parameters, sort_keys=True, default=str)
+        self.entries: Dict[str, Dict] = self._load()
+        self.stats = {'session_hits': 0, 'fingerprint_hits': 0, 'misses': 0}
+        self._lock = threading.Lock()
+
+    def _load(self) -> Dict[str, Dict]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable analysis memo {self.path}: {e}")
+            return {}
+        if data.get('parameters') != self.parameters:
+            logger.info("Rule parameters changed, analysis memo discarded")
+            return {}
+        return data.get('stocks', {})
+
+    def fingerprint(self, df: pd.DataFrame) -> Tuple[str, str]:
+        """(fingerprint, last bar as YYYYMMDD) of one stock's bars"""
+        bars = df[FINGERPRINT_COLUMNS].sort_values('trade_date')
+        digest = hashlib.sha1(self.parameters.encode('utf-8'))
+        digest.update(pd.util.hash_pandas_object(bars, index=False).values.tobytes())
+        return digest.hexdigest(), pd.Timestamp(bars['trade_date'].iloc[-1]).strftime('%Y%m%d')
+
+    def complete(self, stock_codes: List[str], session: Optional[str]) -> List[str]:
+        """Stocks whose memoized bars already include the given session"""
+        if session is None:
+            return []
+        done = [code for code in stock_codes if self.entries.get(code, {}).get('last_bar') == session]
+        self.stats['session_hits'] += len(done)
+        return done
+
+    def matches(self, stock_code: str, fingerprint: str) -> bool:
+        hit = self.entries.get(stock_code, {}).get('fingerprint') == fingerprint
+        with self._lock:
+            self.stats['fingerprint_hits' if hit else 'misses'] += 1
+        return hit
+
+    def store(self, stock_codes: List[str], alerts: List[Dict], latest: pd.DataFrame,
+              fingerprints: Dict[str, Tuple[str, str]]):
+        """Remember the results of freshly analyzed stocks"""
+        by_code = {alert['stock_code']: alert for alert in alerts}
+        rows = latest.reset_index().to_dict('records')
+        with self._lock:
+            for row in rows:
+                code = row['ts_code']
+                if code not in fingerprints or code not in stock_codes:
+                    continue
+                fingerprint, last_bar = fingerprints[code]
+                self.entries[code] = {'fingerprint': fingerprint, 'last_bar': last_bar,
+                                      'alert': by_code.get(code), 'indicators': row}
+
+    def results(self, stock_codes: List[str]) -> Tuple[List[Dict], pd.DataFrame]:
+        """Stored (alerts, latest indicators) of the given stocks"""
+        entries = [self.entries[code] for code in stock_codes if code in self.entries]
+        alerts = [entry['alert'] for entry in entries if entry['alert']]
+        if not entries:
+            return alerts, pd.DataFrame()
+        latest = pd.DataFrame([entry['indicators'] for entry in entries]).set_index('ts_code')
+        latest['trade_date'] = pd.to_datetime(latest['trade_date'])
+        return alerts, latest
+
+    def save(self):
+        """Write the memo atomically so a crash never leaves half a file"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with self._lock:
+            data = {'parameters': self.parameters, 'stocks': self.entries}
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False, default=json_default)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,183 @@
+import queue
+import threading
+import time
+import pandas as pd
+import logging
+from typing import Callable, Dict, List, Optional, Tuple
+
+from quota_ledger import QuotaExceeded
+
+logger = logging.getLogger(__name__)
+
+_DONE = object()
+
+
+class AnalysisPipeline:
+    """Streaming fetch -> analyze with a bounded buffer between the stages.
+
+    Fetch workers (threads, so network waits overlap) pull stock codes and
+    put each stock's frame on a bounded queue; when the queue is full they
+    block instead of buffering more. The analyzer drains whatever has arrived
+    (up to `chunk_size` stocks), adjusts and analyzes it with the vectorized
+    batch rules, keeps only the one-row-per-stock indicators and alerts, and
+    releases the raw frames. Peak memory therefore depends on `queue_size`
+    and `chunk_size`, not on the number of stocks.
+    """
+
+    def __init__(self, fetch: Callable[[str], Optional[pd.DataFrame]], analyzer,
+                 adjust: Optional[Callable[[Dict[str, pd.DataFrame]], Dict[str, pd.DataFrame]]] = None,
+                 workers: int = 4, queue_size: int = 32, chunk_size: int = 32,
+                 on_chunk: Optional[Callable[[List[str], List[Dict], pd.DataFrame], None]] = None,
+                 on_failed: Optional[Callable[[str, str], None]] = None,
+                 sparklines=None):
+        self.fetch = fetch
+        self.analyzer = analyzer
+        # SparklineRenderer that charts alerted stocks while their bars are still in memory
+        self.sparklines = sparklines
+        self.adjust = adjust
+        # Called with (codes, alerts, latest indicators) after each analyzed chunk
+        self.on_chunk = on_chunk
+        # Called with (code, error) from the fetch worker when fetching a stock raised
+        self.on_failed = on_failed
+        self.workers = workers
+        self.queue_size = queue_size
+        self.chunk_size = chunk_size
+        self.stats = {'fetched': 0, 'analyzed': 0, 'chunks': 0, 'peak_buffered': 0}
+        # Codes not started before the deadline of the last run(), or before the API quota ran out
+        self.unfinished: List[str] = []
+        # Set when the last run() stopped early because no API request slot was left
+        self.quota_exceeded: Optional[QuotaExceeded] = None
+        # Codes whose fetch raised in the last run(), with the error; they were not analyzed
+        self.failed: Dict[str, str] = {}
+        # Trailing closes of alerted stocks, kept for correlation clustering after the raw frames are gone
+        self.alert_closes: List[pd.DataFrame] = []
+
+    def _put(self, results: queue.Queue, item, stop: threading.Event):
+        while not stop.is_set():
+            try:
+                results.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                continue
+
+    def _fetch_worker(self, codes: queue.Queue, results: queue.Queue, stop: threading.Event,
+                      draining: threading.Event):
+        try:
+            while not stop.is_set() and not draining.is_set():
+                try:
+                    stock_code = codes.get_nowait()
+                except queue.Empty:
+                    break
+                try:
+                    df = self.fetch(stock_code)
+                except QuotaExceeded as e:
+                    # Every further fetch would fail too: start no more stocks, leave this one unfinished
+                    self.quota_exceeded = e
+                    draining.set()
+                    codes.put(stock_code)
+                    break
+                except Exception as e:
+                    logger.error(f"Error fetching data for {stock_code}: {e}")
+                    self.failed[stock_code] = str(e)
+                    if self.on_failed is not None:
+                        self.on_failed(stock_code, str(e))
+                    continue
+                self._put(results, (stock_code, df), stop)
+        finally:
+            self._put(results, _DONE, stop)
+
+    def _analyze_chunk(self, chunk: Dict[str, pd.DataFrame], alerts: List[Dict], indicators: List[pd.DataFrame]):
+        if self.adjust is not None:
+            chunk = self.adjust(chunk)
+
+        panel = self.analyzer.build_panel(chunk)
+        self.analyzer.timeframes.refresh(panel)
+        latest = self.analyzer.latest_indicators(panel)
+        chunk_alerts = self.analyzer.evaluate_indicators(latest)
+        alerts.extend(chunk_alerts)
+        if chunk_alerts:
+            alerted = [alert['stock_code'] for alert in chunk_alerts]
+            self.alert_closes.append(self.analyzer.trailing_closes(panel, alerted))
+            if self.sparklines is not None:
+                self.sparklines.render(panel, alerted)
+        indicators.append(latest)
+        if self.on_chunk is not None:
+            self.on_chunk(list(chunk), chunk_alerts, latest)
+
+        self.stats['analyzed'] += len(chunk)
+        self.stats['chunks'] += 1
+
+    def run(self, stock_codes: List[str], deadline: Optional[float] = None) -> Tuple[List[Dict], pd.DataFrame]:
+        """Fetch and analyze stocks in the given order; returns (alerts, latest indicators per stock).
+
+        With a `deadline` (epoch seconds), no new stock is started once it
+        passes: fetches in flight are finished and analyzed, and the codes
+        never started are left in `self.unfinished`. The same happens when a
+        fetch raises QuotaExceeded, which is kept in `self.quota_exceeded`.
+        Stocks whose fetch raised anything else are skipped and listed in
+        `self.failed`, so the caller can retry them instead of losing them.
+        """
+        codes = queue.Queue()
+        for stock_code in stock_codes:
+            codes.put(stock_code)
+        results = queue.Queue(maxsize=self.queue_size)
+        stop = threading.Event()
+        draining = threading.Event()
+        self.quota_exceeded = None
+        self.failed = {}
+
+        n_workers = max(1, min(self.workers, len(stock_codes)))
+        threads = [threading.Thread(target=self._fetch_worker, args=(codes, results, stop, draining), daemon=True)
+                   for _ in range(n_workers)]
+        for thread in threads:
+            thread.start()
+
+        alerts: List[Dict] = []
+        indicators: List[pd.DataFrame] = []
+        chunk: Dict[str, pd.DataFrame] = {}
+        finished = 0
+        try:
+            while finished < n_workers:
+                if deadline is not None and not draining.is_set() and time.time() >= deadline:
+                    draining.set()
+                    logger.warning("Deadline reached, finishing stocks already in flight")
+                try:
+                    item = results.get(timeout=0.2)
+                except queue.Empty:
+                    continue
+                if item is _DONE:
+                    finished += 1
+                else:
+                    stock_code, df = item
+                    if df is not None and not df.empty:
+                        chunk[stock_code] = df
+                        self.stats['fetched'] += 1
+
+                self.stats['peak_buffered'] = max(self.stats['peak_buffered'], len(chunk) + results.qsize())
+
+                # Analyze as soon as nothing else is waiting, batching only what already arrived
+                if chunk and (len(chunk) >= self.chunk_size or results.empty() or finished == n_workers):
+                    self._analyze_chunk(chunk, alerts, indicators)
+                    chunk = {}
+        finally:
+            stop.set()
+            for thread in threads:
+                thread.join(timeout=1)
+
+        self.unfinished = []
+        while not codes.empty():
+            self.unfinished.append(codes.get_nowait())
+        if self.quota_exceeded is not None:
+            logger.error(f"API quota used up, {len(self.unfinished)} stocks not fetched: {self.quota_exceeded}")
+
+        # Report alerts in watchlist order, like the per-stock path
+        order = {stock_code: i for i, stock_code in enumerate(stock_codes)}
+        alerts.sort(key=lambda alert: order.get(alert['stock_code'], len(order)))
+        latest = pd.concat(indicators) if indicators else pd.DataFrame()
+
+        logger.info(f"Pipeline analyzed {self.stats['analyzed']} of {len(stock_codes)} stocks in "
+                    f"{self.stats['chunks']} chunks (peak {self.stats['peak_buffered']} frames buffered), "
+                    f"found {len(alerts)} alerts")
+        if self.failed:
+            logger.warning(f"Fetching failed for {len(self.failed)} stocks: {sorted(self.failed)}")
+        return alerts, latest
@@ -31,6 +31,15 @@ class ConfigManager:
     @property
     def tushare_api_key(self) -> str:
         return self.config['tushare']['api_key']
+
+    @property
+    def tushare_transport(self) -> str:
+        # 'sdk' goes through the tushare package, 'http' uses the lean ProTransport
+        return self.config['tushare'].get('transport', 'sdk')
+
+    @property
+    def tushare_api_url(self) -> str:
+        return self.config['tushare'].get('api_url')
     
     @property
     def email_config(self) -> Dict[str, Any]:
@@ -40,10 +49,85 @@ class ConfigManager:
     def stock_list_path(self) -> str:
         return self.config['stock_list_path']
     
+    @property
+    def watchlists(self) -> Dict[str, Dict[str, Any]]:
+        """Named watchlists; a single stock_list_path becomes one list called 'default'"""
+        receivers = self.config.get('email', {}).get('receivers', [])
+        if 'watchlists' not in self.config:
+            return {'default': {'stock_list_path': self.stock_list_path, 'receivers': receivers}}
+        return {name: {'receivers': receivers, **spec} for name, spec in self.config['watchlists'].items()}
+
+    @property
+    def cache_dir(self) -> str:
+        default = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache')
+        return self.config.get('cache_dir', default)
+    
+    @property
+    def export_dir(self) -> str:
+        """Parquet export of alerts and indicators; None disables it"""
+        return self.config.get('export_dir')
+
+    @property
+    def shard_dir(self) -> str:
+        """Partial results of --shard runs, combined by --merge"""
+        return self.config.get('shard_dir', os.path.join(self.cache_dir, 'shards'))
+
+    @property
+    def pipeline_config(self) -> Dict[str, int]:
+        """Fetch workers and buffer sizes of the streaming watchlist run"""
+        pipeline = {'workers': 4, 'queue_size': 32, 'chunk_size': 32}
+        pipeline.update(self.config.get('pipeline', {}))
+        return pipeline
+
+    @property
+    def quota_config(self) -> Dict[str, Any]:
+        quota = {'per_minute': 500, 'per_day': None, 'max_wait': 300, 'ledger_path': os.path.join(self.cache_dir, 'quota.sqlite')}
+        quota.update(self.config.get('quota', {}))
+        return quota
+
+    @property
+    def snapshot_path(self) -> str:
+        """Memory-mapped panel snapshot; None disables it"""
+        return self.config.get('snapshot_path')
+    
+    @property
+    def price_adjustment(self) -> str:
+        """'qfq' (forward), 'hfq' (backward) or 'none'"""
+        return self.config.get('price_adjustment', 'qfq')
+    
+    @property
+    def baseline_source(self) -> str:
+        """'fixed' (9/30 for every stock), 'watch_date' (close on 自选时间) or 'watch_price' (自选价格)"""
+        return self.config.get('baseline_source', 'fixed')
+
     @property
     def run_time(self) -> str:
         return self.config['schedule']['run_time']
+
+    @property
+    def deadline(self) -> str:
+        """'HH:MM' by which alerts must go out; None disables it"""
+        return self.config.get('schedule', {}).get('deadline')
     
+    @property
+    def notification_channels(self) -> List[Dict[str, Any]]:
+        """Alert outputs (email, webhook, file, socket), each with its own timeout and retries"""
+        return self.config.get('notifications', {}).get('channels', [{'type': 'email'}])
+
+    @property
+    def outbox_config(self) -> Dict[str, Any]:
+        """Durable notification outbox drained by a background sender"""
+        outbox = {'path': os.path.join(self.cache_dir, 'outbox.sqlite'), 'max_attempts': 10}
+        outbox.update(self.config.get('notifications', {}).get('outbox', {}))
+        return outbox
+
+    @property
+    def email_timeout(self) -> float:
+        for channel in self.notification_channels:
+            if channel['type'] == 'email' and 'timeout' in channel:
+                return channel['timeout']
+        return self.email_config.get('timeout', 60)
+
     @property
     def smtp_server(self) -> str:
         return self.email_config['smtp_server']
@@ -0,0 +1,63 @@
+import pandas as pd
+import logging
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class DailyBarCache:
+    """Cross-sectional daily bars cached on disk, one file per trade date.
+
+    One `pro.daily(trade_date=...)` call returns every listed stock for that
+    session, so a full-market window of N sessions costs N requests on the
+    first run and one request per new session afterwards.
+    """
+
+    def __init__(self, tushare_client, cache_dir: str):
+        self.tushare_client = tushare_client
+        self.daily_dir = Path(cache_dir) / 'daily'
+
+    def cached_dates(self) -> List[str]:
+        if not self.daily_dir.exists():
+            return []
+        return sorted(path.stem for path in self.daily_dir.glob('*.csv'))
+
+    def get_day(self, trade_date: str) -> Optional[pd.DataFrame]:
+        cache_file = self.daily_dir / f'{trade_date}.csv'
+        if cache_file.exists():
+            return pd.read_csv(cache_file, dtype={'trade_date': str})
+
+        df = self.tushare_client.get_daily_by_date(trade_date)
+        if df is not None:
+            # Only sessions that returned data are cached, so an intraday
+            # (not yet published) date is fetched again next time
+            self.daily_dir.mkdir(parents=True, exist_ok=True)
+            df.to_csv(cache_file, index=False)
+        return df
+
+    def get_panel(self, trade_dates: List[str], stock_codes: Optional[List[str]] = None,
+                  cached_only: bool = False) -> pd.DataFrame:
+        """Long (ts_code, trade_date) panel for the given dates, optionally limited to some stocks"""
+        cached = set(self.cached_dates())
+        missing = [d for d in trade_dates if d not in cached]
+        if missing and not cached_only:
+            logger.info(f"Fetching {len(missing)} of {len(trade_dates)} trade dates from API")
+
+        frames = []
+        for trade_date in trade_dates:
+            if cached_only and trade_date not in cached:
+                continue
+            df = self.get_day(trade_date)
+            if df is not None:
+                frames.append(df)
+
+        if not frames:
+            return pd.DataFrame(columns=['ts_code', 'trade_date', 'open', 'high', 'low', 'close'])
+
+        panel = pd.concat(frames, ignore_index=True)
+        if stock_codes is not None:
+            panel = panel[panel['ts_code'].isin(stock_codes)]
+
+        panel = panel.assign(trade_date=pd.to_datetime(panel['trade_date'].astype(str), format='%Y%m%d'))
+        return panel.sort_values(['ts_code', 'trade_date'], ignore_index=True)
@@ -0,0 +1,113 @@
+import numpy as np
+import pandas as pd
+import logging
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class DataDiagnostics:
+    """Data-health checks over an already cached panel.
+
+    Replaces the ad-hoc debug scripts: one group-by over the long
+    (ts_code, trade_date) panel gives every stock's bar count, first and last
+    bar, the sessions it is missing compared with the trading calendar, how
+    many sessions its last bar is behind, and whether it has a bar on or
+    before its baseline date (the bar the baseline rule resolves to when the
+    date itself is a holiday or suspension day). Baseline dates are per stock
+    when the watchlist sets them. Nothing here talks to the API.
+    """
+
+    # Bars each rule needs on the latest day (see StockAnalyzer.analyze_panel)
+    RULE_MIN_BARS = {'ma_breach': 20, 'boll_drop': 21, 'mtr_drop': 100}
+
+    def __init__(self, baseline_date: str):
+        self.baseline_date = pd.Timestamp(baseline_date)
+
+    def check(self, panel: pd.DataFrame, calendar: Optional[Sequence] = None,
+              stock_codes: Optional[List[str]] = None, baselines: Optional[pd.Series] = None) -> pd.DataFrame:
+        """One row per stock with its data-health figures.
+
+        `calendar` is the list of trading sessions the panel should cover
+        (default: every date present in the panel). Stocks in `stock_codes`
+        without any cached bar are reported with zero bars. `baselines` maps
+        ts_code to that stock's baseline date (see
+        StockAnalyzer.resolve_baselines); others use the default date.
+        """
+        panel = panel[panel['close'].notna()]
+        if calendar is None:
+            calendar = panel['trade_date'].unique()
+        sessions = np.sort(pd.DatetimeIndex(calendar).values)
+
+        grouped = panel.groupby('ts_code')['trade_date']
+        report = grouped.agg(bars='size', first_date='min', last_date='max')
+        report.index.name = 'ts_code'
+
+        # Positions on the calendar; bars between them that are absent are gaps
+        first_idx = np.searchsorted(sessions, report['first_date'].values)
+        last_idx = np.searchsorted(sessions, report['last_date'].values)
+        report['gap_days'] = (last_idx - first_idx + 1) - report['bars'].values
+        report['sessions_behind'] = len(sessions) - 1 - last_idx
+
+        if stock_codes is not None:
+            report = report.reindex(pd.Index(stock_codes, name='ts_code'))
+            report['bars'] = report['bars'].fillna(0).astype(int)
+            report['gap_days'] = report['gap_days'].fillna(0).astype(int)
+            report['sessions_behind'] = report['sessions_behind'].fillna(len(sessions)).astype(int)
+
+        report['baseline_date'] = self.baseline_date
+        if baselines is not None:
+            report['baseline_date'] = pd.to_datetime(baselines).reindex(report.index).fillna(self.baseline_date)
+        # A stock without bars has no first date and so no baseline bar
+        report['has_baseline'] = (report['first_date'] <= report['baseline_date']).astype(bool)
+
+        for rule, min_bars in self.RULE_MIN_BARS.items():
+            report[f'{rule}_ready'] = report['bars'] >= min_bars
+
+        return report
+
+    def summarize(self, report: pd.DataFrame, calendar: Sequence) -> Dict:
+        sessions = pd.DatetimeIndex(calendar)
+        # A baseline before the first cached session cannot be checked
+        judged = report['baseline_date'] >= sessions.min() if len(sessions) else report['baseline_date'].isna()
+        summary = {
+            'stocks': len(report),
+            'sessions': len(sessions),
+            'last_session': sessions.max().strftime('%Y-%m-%d') if len(sessions) else None,
+            'baseline_date': self.baseline_date.strftime('%Y-%m-%d'),
+            'baseline_cached': bool(judged.all()),
+            'baseline_uncached': int((~judged).sum()),
+            'no_data': int((report['bars'] == 0).sum()),
+            'stale': int(((report['sessions_behind'] > 0) & (report['bars'] > 0)).sum()),
+            'with_gaps': int((report['gap_days'] > 0).sum()),
+            'missing_baseline': int((~report['has_baseline'] & judged).sum()),
+        }
+        for rule in self.RULE_MIN_BARS:
+            summary[f'{rule}_not_ready'] = int((~report[f'{rule}_ready']).sum())
+        return summary
+
+    def format_report(self, report: pd.DataFrame, summary: Dict, limit: int = 20) -> str:
+        lines = [
+            f"Data health: {summary['stocks']} stocks, {summary['sessions']} cached sessions "
+            f"(last {summary['last_session']})",
+            f"  No cached bars:        {summary['no_data']}",
+            f"  Stale last bar:        {summary['stale']}",
+            f"  Gaps vs calendar:      {summary['with_gaps']}",
+        ]
+        lines.append(f"  Missing baseline bar:  {summary['missing_baseline']}")
+        if not summary['baseline_cached']:
+            lines.append(f"  Baseline before cache: {summary['baseline_uncached']}")
+        for rule, min_bars in self.RULE_MIN_BARS.items():
+            lines.append(f"  < {min_bars} bars ({rule}): {summary[f'{rule}_not_ready']}")
+
+        problems = report[(report['bars'] < max(self.RULE_MIN_BARS.values())) | (report['gap_days'] > 0)
+                          | (report['sessions_behind'] > 0) | ~report['has_baseline']]
+        if not problems.empty:
+            lines.append("")
+            lines.append(f"Stocks with problems (showing {min(limit, len(problems))} of {len(problems)}):")
+            worst = problems.sort_values(['bars', 'gap_days'], ascending=[True, False]).head(limit)
+            for code, row in worst.iterrows():
+                last = row['last_date'].strftime('%Y-%m-%d') if pd.notna(row['last_date']) else '-'
+                lines.append(f"  {code}: {row['bars']} bars, {row['gap_days']} gaps, last {last} "
+                             f"({row['sessions_behind']} behind), baseline {'yes' if row['has_baseline'] else 'no'}")
+        return "\n".join(lines)
@@ -3,20 +3,27 @@ from email.mime.text import MIMEText
 from email.mime.multipart import MIMEMultipart
 from datetime import datetime
 import logging
-from typing import List, Dict
+from typing import List, Dict, Optional
 
 logger = logging.getLogger(__name__)
 
 
+def alert_subject(watchlist_name: Optional[str] = None, label: Optional[str] = None) -> str:
+    list_tag = f" [{watchlist_name}]" if watchlist_name else ""
+    label_tag = f" ({label})" if label else ""
+    return f"股票监控警报{list_tag}{label_tag} - {datetime.now().strftime('%Y-%m-%d')}"
+
+
 class EmailNotifier:
     def __init__(self, smtp_server: str, smtp_port: int, from_email: str,
-                 password: str, receivers: List[str], use_tls: bool = True):
+                 password: str, receivers: List[str], use_tls: bool = True, timeout: float = 60):
         self.smtp_server = smtp_server
         self.smtp_port = smtp_port
         self.from_email = from_email
         self.password = password
         self.receivers = receivers
         self.use_tls = use_tls
+        self.timeout = timeout
 
     def _get_eastmoney_url(self, stock_code: str) -> str:
         """Generate EastMoney URL for stock code"""
@@ -46,31 +53,36 @@ class EmailNotifier:
         # TradingView URL format: https://www.tradingview.com/chart/?symbol={exchange}:{code}
         return f"https://www.tradingview.com/chart/?symbol={tv_exchange}%3A{code}"
     
-    def send_alert(self, alerts: List[Dict]) -> bool:
+    def send_alert(self, alerts: List[Dict], receivers: Optional[List[str]] = None,
+                   watchlist_name: Optional[str] = None, label: Optional[str] = None,
+                   note: Optional[str] = None, sectors: Optional['pd.DataFrame'] = None) -> bool:
+        """Send the alert email; `label` tags the subject, `note` is shown above the summary
+        and `sectors` (from StockAnalyzer.sector_summary) adds an industry table"""
         if not alerts:
             logger.info("No alerts to send")
             return True
 
+        receivers = receivers or self.receivers
         try:
-            subject = f"股票监控警报 - {datetime.now().strftime('%Y-%m-%d')}"
-            body = self._format_alert_body(alerts)
+            subject = alert_subject(watchlist_name, label)
+            body = self._format_alert_body(alerts, note, sectors)
             
             msg = MIMEMultipart('alternative')
             msg['Subject'] = subject
             msg['From'] = self.from_email
-            msg['To'] = ', '.join(self.receivers)
+            msg['To'] = ', '.join(receivers)
             
             html_part = MIMEText(body, 'html', 'utf-8')
             msg.attach(html_part)
             
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
+            with smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout) as server:
                 # server.set_debuglevel(1)  # Enable debug output (disabled for cleaner logs)
                 if self.use_tls:
                     server.starttls()
                 server.login(self.from_email, self.password)
                 server.send_message(msg)
             
-            logger.info(f"Alert email sent successfully to {', '.join(self.receivers)}")
+            logger.info(f"Alert email sent successfully to {', '.join(receivers)}")
             logger.info(f"Email subject: {subject}")
             logger.info(f"Number of alerts: {len(alerts)}")
             return True
@@ -79,6 +91,34 @@ class EmailNotifier:
             logger.error(f"Failed to send email: {e}")
             return False
     
+    @staticmethod
+    def _short_date(date_str: str) -> str:
+        """'2025-09-30' -> '9/30'"""
+        date = datetime.strptime(date_str, '%Y-%m-%d')
+        return f"{date.month}/{date.day}"
+
+    @classmethod
+    def describe_alert(cls, alert: Dict) -> List[str]:
+        """Short description of each rule the stock breached"""
+        alert_types = []
+
+        # Baseline drop alert (9/30 unless the stock has its own baseline)
+        if alert.get('baseline_drop_alert'):
+            drop_pct = alert['baseline_drop_alert']['drop_percentage']
+            baseline_label = cls._short_date(alert['baseline_drop_alert']['baseline_date'])
+            alert_types.append(f"较{baseline_label}跌{abs(drop_pct):.1f}%")
+
+        # MTR drop alert
+        if alert.get('mtr_drop_alert'):
+            alert_types.append("20周均线上方跌一个MTR")
+
+        # Bollinger Band drop alert
+        if alert.get('boll_drop_alert'):
+            drop_pct = alert['boll_drop_alert']['drop_percentage']
+            alert_types.append(f"布林线上方跌{abs(drop_pct):.1f}%")
+
+        return alert_types
+
     def _generate_summary(self, alerts: List[Dict]) -> str:
         """Generate a concise summary of breached stocks"""
         summary_lines = []
@@ -87,21 +127,7 @@ class EmailNotifier:
             stock_code = alert['stock_code']
             eastmoney_url = self._get_eastmoney_url(stock_code)
             tradingview_url = self._get_tradingview_url(stock_code)
-            alert_types = []
-
-            # 9/30 baseline drop alert
-            if alert.get('baseline_drop_alert'):
-                drop_pct = alert['baseline_drop_alert']['drop_percentage']
-                alert_types.append(f"较9/30跌{abs(drop_pct):.1f}%")
-
-            # MTR drop alert
-            if alert.get('mtr_drop_alert'):
-                alert_types.append("20周均线上方跌一个MTR")
-
-            # Bollinger Band drop alert
-            if alert.get('boll_drop_alert'):
-                drop_pct = alert['boll_drop_alert']['drop_percentage']
-                alert_types.append(f"布林线上方跌{abs(drop_pct):.1f}%")
+            alert_types = self.describe_alert(alert)
 
             if alert_types:
                 links = f'<a href="{eastmoney_url}" target="_blank">{stock_code}</a> [<a href="{tradingview_url}" target="_blank">TV</a>]'
@@ -109,7 +135,33 @@ class EmailNotifier:
 
         return '<br>'.join(summary_lines)
     
-    def _format_alert_body(self, alerts: List[Dict]) -> str:
+    def _format_sector_table(self, sectors: Optional['pd.DataFrame'], max_rows: int = 15) -> str:
+        """Compact industry table: stocks, share under MA100, median drawdown, alerts"""
+        if sectors is None or sectors.empty:
+            return ""
+        import pandas as pd
+
+        rows = ""
+        for industry, row in sectors.head(max_rows).iterrows():
+            under = f"{row['under_ma100'] * 100:.0f}%" if pd.notna(row['under_ma100']) else "-"
+            drawdown = f"{row['median_drawdown']:+.1f}%" if pd.notna(row['median_drawdown']) else "-"
+            rows += (f"<tr><td>{industry}</td><td>{int(row['stocks'])}</td><td>{under}</td>"
+                     f"<td>{drawdown}</td><td>{int(row['alerts'])}</td></tr>")
+
+        more = f"<p><small>另有 {len(sectors) - max_rows} 个行业未显示</small></p>" if len(sectors) > max_rows else ""
+        return f"""
+            <h3>行业概览</h3>
+            <table class="sector-table">
+                <tr><th>行业</th><th>股票数</th><th>MA100下方占比</th><th>较基准涨跌中位数</th><th>警报数</th></tr>
+                {rows}
+            </table>
+            {more}
+        """
+
+    def _format_alert_body(self, alerts: List[Dict], note: Optional[str] = None,
+                           sectors: Optional['pd.DataFrame'] = None) -> str:
+        note_html = f'<div class="alert-note"><strong>{note}</strong></div>' if note else ""
+
         html = f"""
         <html>
         <head>
@@ -125,12 +177,15 @@ class EmailNotifier:
                 .alert-summary {{ background-color: #fff3e0; padding: 15px; border-radius: 5px; margin-bottom: 20px; }}
                 .stock-section {{ margin: 20px 0; padding: 15px; border: 1px solid #e0e0e0; border-radius: 5px; }}
                 .alert-type {{ background-color: #e3f2fd; padding: 10px; margin: 10px 0; border-radius: 3px; }}
+                .sector-table th, .sector-table td {{ padding: 4px 8px; }}
+                .alert-note {{ background-color: #ffebee; color: #b71c1c; padding: 15px; border-radius: 5px; margin-bottom: 20px; }}
                 a {{ color: #1976d2; text-decoration: none; font-weight: bold; }}
                 a:hover {{ text-decoration: underline; }}
             </style>
         </head>
         <body>
             <h2>股票监控警报</h2>
+            {note_html}
             <div class="alert-summary">
                 <p><strong>警报时间:</strong> {datetime.now().strftime('%Y-%m-%d %H:%M:%S')}</p>
                 <p><strong>触发警报股票数:</strong> {len(alerts)} 只</p>
@@ -140,14 +195,29 @@ class EmailNotifier:
                 <h3>快速摘要</h3>
                 <p>{self._generate_summary(alerts)}</p>
             </div>
+            {self._format_sector_table(sectors)}
 
             <h3>详细信息</h3>
         """
 
+        # Correlated stocks arrive next to each other; label each group
+        clustered = any(alert.get('cluster') for alert in alerts)
+        cluster_sizes = {}
+        for alert in alerts:
+            cluster_sizes[alert.get('cluster')] = cluster_sizes.get(alert.get('cluster'), 0) + 1
+        current_cluster = object()
+
         for alert in alerts:
             stock_code = alert['stock_code']
             eastmoney_url = self._get_eastmoney_url(stock_code)
             tradingview_url = self._get_tradingview_url(stock_code)
+            if clustered and alert.get('cluster') != current_cluster:
+                current_cluster = alert.get('cluster')
+                if current_cluster:
+                    html += (f'<h3 class="cluster-header">相关性分组 {current_cluster} '
+                             f'({cluster_sizes[current_cluster]} 只走势高度相关)</h3>')
+                else:
+                    html += '<h3 class="cluster-header">其他</h3>'
             html += f"""
             <div class="stock-section">
                 <h4>
@@ -157,12 +227,16 @@ class EmailNotifier:
                 </h4>
             """
 
+            # 60-bar chart: close (red), MA100 (dashed orange), Bollinger band (blue)
+            if alert.get('sparkline'):
+                html += f'<div class="sparkline">{alert["sparkline"]}</div>'
+
             # Baseline drop alert
             if alert.get('baseline_drop_alert'):
                 bd = alert['baseline_drop_alert']
                 html += f"""
                 <div class="alert-type">
-                    <strong>基线下跌警报 (相对9/30):</strong>
+                    <strong>基线下跌警报 (相对{self._short_date(bd['baseline_date'])}):</strong>
                     <ul>
                         <li>基线日期: {bd['baseline_date']}</li>
                         <li>基线价格: ¥{bd['baseline_price']:.2f}</li>
@@ -175,11 +249,14 @@ class EmailNotifier:
             # MTR drop alert
             if alert.get('mtr_drop_alert'):
                 mtr = alert['mtr_drop_alert']
+                weekly_ma20 = mtr.get('weekly_ma20')
+                weekly_line = f"<li>周线MA20: ¥{weekly_ma20:.2f}</li>" if weekly_ma20 is not None else ""
                 html += f"""
                 <div class="alert-type">
                     <strong>MTR下跌警报 (20周均线上方):</strong>
                     <ul>
                         <li>20周均线: ¥{mtr['ma100_value']:.2f}</li>
+                        {weekly_line}
                         <li>前收盘价: ¥{mtr['previous_close']:.2f}</li>
                         <li>当前价格: ¥{mtr['current_price']:.2f}</li>
                         <li>价格下跌: ¥{mtr['price_drop']:.2f}</li>
@@ -237,7 +314,7 @@ class EmailNotifier:
             html_part = MIMEText(body, 'html', 'utf-8')
             msg.attach(html_part)
             
-            with smtplib.SMTP(self.smtp_server, self.smtp_port) as server:
+            with smtplib.SMTP(self.smtp_server, self.smtp_port, timeout=self.timeout) as server:
                 if self.use_tls:
                     server.starttls()
                 server.login(self.from_email, self.password)
@@ -0,0 +1,10 @@
+from datetime import datetime
+
+
+def json_default(value):
+    """`default=` hook for json.dump: timestamps as ISO strings, NumPy scalars as Python numbers"""
+    if isinstance(value, datetime):  # includes pd.Timestamp
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        return value.item()
+    return str(value)
@@ -0,0 +1,224 @@
+import json
+import os
+import socketserver
+import threading
+import time
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import urlparse, parse_qs
+import logging
+from typing import Any, Dict, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+def to_json_safe(value: Any) -> Any:
+    """Convert numpy scalars, timestamps and NaN into plain JSON values"""
+    if isinstance(value, dict):
+        return {str(k): to_json_safe(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [to_json_safe(v) for v in value]
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if hasattr(value, 'item'):
+        value = value.item()
+    if isinstance(value, float) and value != value:
+        return None
+    return value
+
+
+class _UnixHTTPServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+    def get_request(self):
+        # BaseHTTPRequestHandler expects (host, port) style client addresses
+        request, _ = super().get_request()
+        return request, ('local', 0)
+
+
+class MonitorDaemon:
+    """Long-running monitor that keeps the panel, indicators and alerts in memory.
+
+    Serves a small read-only JSON API on localhost (or a Unix socket):
+
+        /analyze?code=300959.SZ   latest indicators and any alert for one stock
+        /alerts?date=2025-10-17   alerts recorded for a trade date (default: latest)
+        /triggers                 alerts from the most recent analysis
+        /health                   refresh time and number of stocks held
+
+    The scheduled daily run refreshes the state and sends the usual email; a
+    change to the watchlist CSV triggers a silent refresh. A failed refresh,
+    including the one at startup, is logged and retried; the API keeps serving
+    the last good state.
+    """
+
+    def __init__(self, monitor, host: str = '127.0.0.1', port: int = 8765, socket_path: Optional[str] = None,
+                 run_options: Optional[Dict] = None, reload_interval: int = 5, retry_interval: int = 60):
+        self.monitor = monitor
+        self.host = host
+        self.port = port
+        self.socket_path = socket_path
+        self.run_options = dict(run_options or {})
+        self.reload_interval = reload_interval
+        self.retry_interval = retry_interval
+
+        self._lock = threading.Lock()
+        self.indicators: Dict[str, Dict] = {}
+        self.triggers: Dict[str, Dict] = {}
+        self.alerts_by_date: Dict[str, Dict[str, Dict]] = {}
+        self.last_refresh: Optional[datetime] = None
+        self._watchlist_mtime: Optional[float] = None
+        self._server = None
+        self._stopping = threading.Event()
+
+    def refresh(self, notify: bool = True):
+        alerts = self.monitor.run_analysis(notify=notify, **self.run_options) or []
+
+        indicators = {}
+        latest = self.monitor.latest_indicators()
+        if latest is not None and not latest.empty:
+            latest = latest.copy()
+            latest['trade_date'] = latest['trade_date'].dt.strftime('%Y-%m-%d')
+            indicators = to_json_safe(latest.to_dict('index'))
+
+        triggers = {alert['stock_code']: to_json_safe(alert) for alert in alerts}
+        by_date: Dict[str, Dict[str, Dict]] = {}
+        for code, alert in triggers.items():
+            by_date.setdefault(alert['trade_date'], {})[code] = alert
+        # A refresh re-evaluates whole trade dates, so its alerts replace what was recorded
+        # for them: an alert that stopped firing after a same-day reload disappears
+        analyzed = {row['trade_date'] for row in indicators.values()} | set(by_date)
+
+        # Swap in the new state in one step so readers never see a partial refresh
+        with self._lock:
+            self.indicators = indicators
+            self.triggers = triggers
+            for date in analyzed:
+                self.alerts_by_date[date] = by_date.get(date, {})
+            self.last_refresh = datetime.now()
+
+        logger.info(f"Daemon state refreshed: {len(indicators)} stocks, {len(alerts)} alerts")
+
+    def check_watchlist(self):
+        """Refresh when any watchlist CSV changes on disk"""
+        if self.run_options.get('universe') == 'all':
+            return
+
+        try:
+            mtime = max(os.path.getmtime(path) for path in self.monitor.watchlist_set.paths())
+        except (OSError, ValueError):
+            return
+
+        if self._watchlist_mtime is None:
+            self._watchlist_mtime = mtime
+        elif mtime != self._watchlist_mtime:
+            self._watchlist_mtime = mtime
+            logger.info("Watchlist changed, reloading")
+            self.refresh(notify=False)
+
+    def handle_query(self, path: str) -> Tuple[int, Dict]:
+        url = urlparse(path)
+        params = {key: values[0] for key, values in parse_qs(url.query).items()}
+
+        with self._lock:
+            if url.path == '/analyze':
+                code = params.get('code')
+                if not code:
+                    return 400, {'error': 'missing code parameter'}
+                if code not in self.indicators:
+                    return 404, {'error': f'unknown stock {code}'}
+                return 200, {
+                    'stock_code': code,
+                    'indicators': self.indicators[code],
+                    'alert': self.triggers.get(code)
+                }
+
+            if url.path == '/alerts':
+                date = params.get('date') or max(self.alerts_by_date, default=None)
+                alerts = list(self.alerts_by_date.get(date, {}).values()) if date else []
+                return 200, {'date': date, 'count': len(alerts), 'alerts': alerts}
+
+            if url.path == '/triggers':
+                return 200, {'count': len(self.triggers), 'alerts': list(self.triggers.values())}
+
+            if url.path == '/health':
+                return 200, {
+                    'last_refresh': to_json_safe(self.last_refresh),
+                    'stocks': len(self.indicators),
+                    'alerts': len(self.triggers)
+                }
+
+        return 404, {'error': f'unknown endpoint {url.path}'}
+
+    def make_server(self):
+        daemon = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                status, payload = daemon.handle_query(self.path)
+                body = json.dumps(payload, ensure_ascii=False).encode('utf-8')
+                self.send_response(status)
+                self.send_header('Content-Type', 'application/json; charset=utf-8')
+                self.send_header('Content-Length', str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                logger.debug(format % args)
+
+        if self.socket_path:
+            if os.path.exists(self.socket_path):
+                os.unlink(self.socket_path)
+            return _UnixHTTPServer(self.socket_path, Handler)
+
+        server = ThreadingHTTPServer((self.host, self.port), Handler)
+        server.daemon_threads = True
+        return server
+
+    def start(self):
+        """Start serving in a background thread (state must be refreshed separately)"""
+        self._server = self.make_server()
+        threading.Thread(target=self._server.serve_forever, daemon=True).start()
+        where = self.socket_path or f"http://{self.host}:{self._server.server_address[1]}"
+        logger.info(f"Query API listening on {where}")
+
+    def stop(self):
+        if self._server is not None:
+            self._server.shutdown()
+            self._server.server_close()
+            self._server = None
+        self._stopping = threading.Event()
+        if self.socket_path and os.path.exists(self.socket_path):
+            os.unlink(self.socket_path)
+
+    def shutdown(self):
+        """Ask serve_forever to return (from another thread)"""
+        self._stopping.set()
+
+    def serve_forever(self):
+        import schedule
+
+        self.start()
+
+        run_time = self.monitor.config.run_time
+        job = schedule.every().day.at(run_time).do(self.refresh)
+        logger.info(f"Daemon started, daily refresh at {run_time}. Press Ctrl+C to stop.")
+
+        next_attempt = 0.0
+        try:
+            while not self._stopping.is_set():
+                try:
+                    if self.last_refresh is None and time.monotonic() >= next_attempt:
+                        # Initial load; retried until it succeeds instead of ending the daemon
+                        next_attempt = time.monotonic() + self.retry_interval
+                        self.refresh(notify=False)
+                    schedule.run_pending()
+                    self.check_watchlist()
+                except Exception as e:
+                    logger.error(f"Daemon error: {e}")
+                self._stopping.wait(self.reload_interval)
+        except KeyboardInterrupt:
+            logger.info("Daemon stopped by user")
+        finally:
+            schedule.cancel_job(job)
+            self.stop()
@@ -0,0 +1,201 @@
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from pathlib import Path
+import logging
+from typing import Dict, List, Optional
+
+from email_notifier import EmailNotifier, alert_subject
+from json_encoding import json_default
+
+logger = logging.getLogger(__name__)
+
+
+def build_message(alerts: List[Dict], receivers: Optional[List[str]] = None, watchlist_name: Optional[str] = None,
+                  label: Optional[str] = None, note: Optional[str] = None, sectors=None) -> Dict:
+    """The send_alert arguments as one message that every channel understands"""
+    return {'alerts': alerts, 'receivers': receivers, 'watchlist_name': watchlist_name,
+            'label': label, 'note': note, 'sectors': sectors}
+
+
+def format_markdown(message: Dict) -> str:
+    """Plain markdown version of an alert message for chat webhooks"""
+    lines = [f"### {alert_subject(message['watchlist_name'], message['label'])}"]
+    if message['note']:
+        lines.append(f"> {message['note']}")
+    lines.append(f"触发警报股票数: {len(message['alerts'])} 只")
+    for alert in message['alerts']:
+        reasons = ", ".join(EmailNotifier.describe_alert(alert))
+        lines.append(f"- {alert['stock_code']} ¥{alert['close_price']:.2f}: {reasons}")
+    return "\n".join(lines)
+
+
+class Channel:
+    """One notification output; `deliver` raises on failure so the dispatcher can retry"""
+    kind = 'channel'
+
+    def __init__(self, name: Optional[str] = None, timeout: float = 10, retries: int = 2, backoff: float = 1.0):
+        self.name = name or self.kind
+        self.timeout = timeout
+        self.retries = retries
+        self.backoff = backoff
+
+    def deliver(self, message: Dict):
+        raise NotImplementedError
+
+
+class EmailChannel(Channel):
+    """SMTP through the EmailNotifier (its own `timeout` bounds each connection)"""
+    kind = 'email'
+
+    def __init__(self, notifier, **options):
+        super().__init__(**options)
+        self.notifier = notifier
+
+    def deliver(self, message: Dict):
+        if not self.notifier.send_alert(message['alerts'], receivers=message['receivers'],
+                                        watchlist_name=message['watchlist_name'], label=message['label'],
+                                        note=message['note'], sectors=message['sectors']):
+            raise RuntimeError("SMTP delivery failed")
+
+
+class WebhookChannel(Channel):
+    """JSON POST in the WeCom ('wecom') or DingTalk ('dingtalk') markdown robot format"""
+    kind = 'webhook'
+
+    def __init__(self, url: str, format: str = 'wecom', **options):
+        super().__init__(**options)
+        self.url = url
+        self.format = format
+
+    def payload(self, message: Dict) -> Dict:
+        text = format_markdown(message)
+        if self.format == 'dingtalk':
+            title = alert_subject(message['watchlist_name'], message['label'])
+            return {'msgtype': 'markdown', 'markdown': {'title': title, 'text': text}}
+        return {'msgtype': 'markdown', 'markdown': {'content': text}}
+
+    def deliver(self, message: Dict):
+        import requests
+
+        response = requests.post(self.url, json=self.payload(message), timeout=self.timeout)
+        response.raise_for_status()
+        # Both robots answer HTTP 200 with a non-zero errcode when they reject a message
+        try:
+            result = response.json()
+        except ValueError:
+            return
+        if isinstance(result, dict) and result.get('errcode', 0) != 0:
+            raise RuntimeError(f"Webhook rejected the message: {result.get('errmsg')}")
+
+
+def _record(message: Dict) -> bytes:
+    """One JSON line per message with the alerts as sent"""
+    record = {'time': datetime.now().isoformat(timespec='seconds'), 'watchlist': message['watchlist_name'],
+              'label': message['label'], 'note': message['note'], 'alerts': message['alerts']}
+    return (json.dumps(record, ensure_ascii=False, default=json_default) + '\n').encode('utf-8')
+
+
+class FileChannel(Channel):
+    """Appends each message as a JSON line to a local file"""
+    kind = 'file'
+
+    def __init__(self, path: str, **options):
+        super().__init__(**options)
+        self.path = Path(path)
+        self._lock = threading.Lock()
+
+    def deliver(self, message: Dict):
+        line = _record(message)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        with self._lock:
+            with open(self.path, 'ab') as f:
+                f.write(line)
+
+
+class SocketChannel(Channel):
+    """Writes each message as a JSON line to a listening Unix socket"""
+    kind = 'socket'
+
+    def __init__(self, path: str, **options):
+        super().__init__(**options)
+        self.path = path
+
+    def deliver(self, message: Dict):
+        with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+            sock.settimeout(self.timeout)
+            sock.connect(self.path)
+            sock.sendall(_record(message))
+            sock.shutdown(socket.SHUT_WR)
+
+
+CHANNEL_TYPES = {cls.kind: cls for cls in (WebhookChannel, FileChannel, SocketChannel)}
+
+
+class NotificationDispatcher:
+    """Fans each alert message out to every channel at the same time.
+
+    Channels run on their own threads, each bounded by its own timeout and
+    retried `retries` times with doubling backoff, so a slow SMTP server
+    never holds up the webhook or the local file. `send_alert` takes the same
+    arguments as EmailNotifier.send_alert and returns True when every
+    channel delivered; `last_results` maps channel name to success.
+    """
+
+    def __init__(self, channels: List[Channel]):
+        self.channels = channels
+        self.last_results: Dict[str, bool] = {}
+        seen = {}
+        for channel in channels:
+            seen[channel.name] = seen.get(channel.name, 0) + 1
+            if seen[channel.name] > 1:
+                channel.name = f"{channel.name}{seen[channel.name]}"
+
+    @classmethod
+    def from_config(cls, specs: List[Dict], email_notifier=None) -> 'NotificationDispatcher':
+        """Build channels from `notifications.channels` entries such as {'type': 'webhook', 'url': ...}"""
+        channels = []
+        for spec in specs:
+            options = dict(spec)
+            kind = options.pop('type')
+            if kind == 'email':
+                options.pop('timeout', None)  # applied to the EmailNotifier's SMTP connection
+                channels.append(EmailChannel(email_notifier, **options))
+            elif kind in CHANNEL_TYPES:
+                channels.append(CHANNEL_TYPES[kind](**options))
+            else:
+                raise ValueError(f"Unknown notification channel type: {kind}")
+        return cls(channels)
+
+    def deliver(self, channel: Channel, message: Dict) -> bool:
+        """Deliver one message on one channel with that channel's retries"""
+        for attempt in range(channel.retries + 1):
+            start = time.time()
+            try:
+                channel.deliver(message)
+                logger.info(f"Notification delivered via {channel.name} in {time.time() - start:.2f}s")
+                return True
+            except Exception as e:
+                logger.warning(f"Notification via {channel.name} failed "
+                               f"(attempt {attempt + 1}/{channel.retries + 1}): {e}")
+                if attempt < channel.retries:
+                    time.sleep(channel.backoff * 2 ** attempt)
+        logger.error(f"Giving up on notification via {channel.name}")
+        return False
+
+    def send_alert(self, alerts: List[Dict], receivers: Optional[List[str]] = None,
+                   watchlist_name: Optional[str] = None, label: Optional[str] = None,
+                   note: Optional[str] = None, sectors=None) -> bool:
+        if not alerts:
+            logger.info("No alerts to send")
+            return True
+
+        message = build_message(alerts, receivers, watchlist_name, label, note, sectors)
+        with ThreadPoolExecutor(max_workers=max(len(self.channels), 1), thread_name_prefix='notify') as executor:
+            futures = {channel.name: executor.submit(self.deliver, channel, message)
+                       for channel in self.channels}
+            self.last_results = {name: future.result() for name, future in futures.items()}
+        return all(self.last_results.values())
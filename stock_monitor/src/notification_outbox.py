@@ -0,0 +1,230 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+import logging
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from json_encoding import json_default
+
+logger = logging.getLogger(__name__)
+
+
+def _encode(message: Dict) -> str:
+    payload = dict(message)
+    if isinstance(payload.get('sectors'), pd.DataFrame):
+        payload['sectors'] = payload['sectors'].to_dict(orient='split')
+    return json.dumps(payload, ensure_ascii=False, default=json_default)
+
+
+def _decode(payload: str) -> Dict:
+    message = json.loads(payload)
+    if message.get('sectors') is not None:
+        message['sectors'] = pd.DataFrame(**message['sectors'])
+    return message
+
+
+class NotificationOutbox:
+    """Durable queue of alert messages, one delivery row per channel.
+
+    A message is committed to a small SQLite file before anything is sent,
+    so alerts survive a failed SMTP server or a killed process. A delivery
+    is leased inside an immediate transaction right before it is sent, so
+    two processes draining the same outbox never send a message twice, and
+    a lease only has to outlast one delivery (its timeout and retries), not
+    a whole backlog. A lease left by a crashed sender expires and the
+    delivery is retried. After `max_attempts` failed attempts a delivery is
+    given up.
+    """
+
+    def __init__(self, path: str, max_attempts: int = 10, keep_days: int = 30):
+        self.path = path
+        self.max_attempts = max_attempts
+        self.keep_days = keep_days
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS messages "
+                         "(id INTEGER PRIMARY KEY, created REAL NOT NULL, payload TEXT NOT NULL)")
+            conn.execute("CREATE TABLE IF NOT EXISTS deliveries "
+                         "(message_id INTEGER NOT NULL, channel TEXT NOT NULL, attempts INTEGER NOT NULL DEFAULT 0, "
+                         "delivered REAL, claimed_until REAL, last_error TEXT, PRIMARY KEY (message_id, channel))")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    def enqueue(self, message: Dict, channels: List[str]) -> int:
+        """Commit a message for every channel and return its id"""
+        payload = _encode(message)
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                message_id = conn.execute("INSERT INTO messages (created, payload) VALUES (?, ?)",
+                                          (now, payload)).lastrowid
+                conn.executemany("INSERT INTO deliveries (message_id, channel) VALUES (?, ?)",
+                                 [(message_id, channel) for channel in channels])
+                self._prune(conn, now)
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        return message_id
+
+    def _prune(self, conn: sqlite3.Connection, now: float):
+        """Drop old messages that every channel delivered or gave up on"""
+        conn.execute("DELETE FROM messages WHERE created < ? AND id NOT IN "
+                     "(SELECT message_id FROM deliveries WHERE delivered IS NULL AND attempts < ?)",
+                     (now - self.keep_days * 86400, self.max_attempts))
+        conn.execute("DELETE FROM deliveries WHERE message_id NOT IN (SELECT id FROM messages)")
+
+    def claim_next(self, channel: str, lease: float = 300) -> Optional[Dict]:
+        """Take the oldest pending delivery on `channel` for `lease` seconds.
+
+        None when nothing is pending, or when the oldest delivery is leased by
+        another sender: that sender is draining the channel, and taking a later
+        message would send the channel's messages out of order.
+        """
+        now = time.time()
+        conn = self._connect()
+        try:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT d.message_id, d.attempts, d.claimed_until, m.payload FROM deliveries d "
+                    "JOIN messages m ON m.id = d.message_id "
+                    "WHERE d.delivered IS NULL AND d.attempts < ? AND d.channel = ? "
+                    "ORDER BY d.message_id LIMIT 1", (self.max_attempts, channel)).fetchone()
+                if row is None or (row[2] is not None and row[2] >= now):
+                    conn.execute("COMMIT")
+                    return None
+                message_id, attempts, _, payload = row
+                conn.execute("UPDATE deliveries SET claimed_until = ? WHERE message_id = ? AND channel = ?",
+                             (now + lease, message_id, channel))
+                conn.execute("COMMIT")
+            except Exception:
+                conn.execute("ROLLBACK")
+                raise
+        finally:
+            conn.close()
+        return {'id': message_id, 'channel': channel, 'attempts': attempts, 'message': _decode(payload)}
+
+    def _update(self, sql: str, params: tuple):
+        conn = self._connect()
+        try:
+            conn.execute(sql, params)
+        finally:
+            conn.close()
+
+    def mark_delivered(self, message_id: int, channel: str):
+        self._update("UPDATE deliveries SET delivered = ?, claimed_until = NULL, attempts = attempts + 1 "
+                     "WHERE message_id = ? AND channel = ?", (time.time(), message_id, channel))
+
+    def mark_failed(self, message_id: int, channel: str, error: str):
+        self._update("UPDATE deliveries SET claimed_until = NULL, attempts = attempts + 1, last_error = ? "
+                     "WHERE message_id = ? AND channel = ?", (error, message_id, channel))
+
+    def pending(self) -> Dict[str, int]:
+        """Undelivered messages per channel (including ones given up on)"""
+        conn = self._connect()
+        try:
+            rows = conn.execute("SELECT channel, COUNT(*) FROM deliveries WHERE delivered IS NULL "
+                                "GROUP BY channel").fetchall()
+        finally:
+            conn.close()
+        return dict(rows)
+
+
+class OutboxSender:
+    """Background thread that drains the outbox through a NotificationDispatcher.
+
+    `submit` returns as soon as the message is committed. Each drain sends
+    the pending deliveries of every channel at the same time, in order
+    within a channel, using the channel's own timeout and retries; when a
+    channel still fails, its remaining messages wait for the next drain
+    (the next run). The thread exits once nothing new was submitted.
+    """
+
+    def __init__(self, outbox: NotificationOutbox, dispatcher, lease: float = 300):
+        self.outbox = outbox
+        self.dispatcher = dispatcher
+        self.lease = lease
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def submit(self, message: Dict) -> int:
+        message_id = self.outbox.enqueue(message, [channel.name for channel in self.dispatcher.channels])
+        self.wake()
+        return message_id
+
+    def wake(self):
+        """Start draining in the background (again, if a drain is under way)"""
+        with self._lock:
+            self._wake.set()
+            if self._thread is None:
+                # Not a daemon: a --run-once process exits after the last delivery attempt
+                self._thread = threading.Thread(target=self._run, name='outbox-sender')
+                self._thread.start()
+
+    def _run(self):
+        while True:
+            with self._lock:
+                if not self._wake.is_set():
+                    self._thread = None
+                    return
+                self._wake.clear()
+            try:
+                self.drain()
+            except Exception as e:
+                logger.error(f"Outbox drain failed: {e}")
+
+    def join(self, timeout: Optional[float] = None) -> bool:
+        """Wait for the background sender to finish; False on timeout"""
+        deadline = None if timeout is None else time.time() + timeout
+        while True:
+            with self._lock:
+                thread = self._thread
+            if thread is None:
+                return True
+            remaining = None if deadline is None else deadline - time.time()
+            if remaining is not None and remaining <= 0:
+                return False
+            thread.join(remaining)
+
+    def _drain_channel(self, channel) -> int:
+        """Send the channel's pending messages in order, each leased just before it is sent"""
+        sent = 0
+        while True:
+            delivery = self.outbox.claim_next(channel.name, self.lease)
+            if delivery is None:
+                return sent
+            if not self.dispatcher.deliver(channel, delivery['message']):
+                self.outbox.mark_failed(delivery['id'], channel.name, f"failed after {channel.retries + 1} attempts")
+                # Keep the channel's messages in order: the rest wait for the next drain
+                kept = self.outbox.pending().get(channel.name, 0)
+                logger.warning(f"{kept} message(s) via {channel.name} kept in the outbox for the next run")
+                return sent
+            self.outbox.mark_delivered(delivery['id'], channel.name)
+            sent += 1
+
+    def drain(self) -> Dict[str, int]:
+        """Send everything pending once, channels at the same time; returns deliveries made per channel"""
+        channels = self.dispatcher.channels
+        if not channels:
+            return {}
+        with ThreadPoolExecutor(max_workers=len(channels), thread_name_prefix='outbox') as executor:
+            futures = {channel.name: executor.submit(self._drain_channel, channel) for channel in channels}
+            return {name: future.result() for name, future in futures.items()}
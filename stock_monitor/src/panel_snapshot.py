@@ -0,0 +1,373 @@
+import json
+import mmap
+import os
+import struct
+import pandas as pd
+import numpy as np
+import logging
+from pathlib import Path
+from typing import List, Optional, Sequence
+
+from price_panel import PricePanel
+
+logger = logging.getLogger(__name__)
+
+
+class PanelSnapshot:
+    """Single-file, memory-mapped snapshot of the price panel and indicator state.
+
+    Layout (all sections 64-byte aligned, little endian):
+
+        header      magic, version, column count, commit word, date capacity,
+                    stock count, indicator count, metadata length
+        metadata    JSON with column and indicator names
+        codes       S16 ts_code per stock
+        dates       int64 days since epoch, `capacity` slots
+        prices      float32 [stocks, capacity] block per column (NaN = no bar)
+        indicators  two float32 [stocks, indicators] slots
+
+    Each stock's series is contiguous within a column block, so opening the
+    file and reading a few stocks only pages in those stocks. New days are
+    written into spare date capacity first and then published by a single
+    8-byte commit word (date count << 1 | active indicator slot); when the
+    capacity or the stock list has to grow, the file is rewritten to a
+    temporary path and swapped in with os.replace. Readers therefore always
+    see a consistent set of committed days.
+
+    A stock first seen in an appended day is added by that rewrite. Its bars
+    on already stored days are taken from the same appended frame when it
+    includes them; otherwise those days stay NaN (for a full-market daily
+    cross-section that only happens for days before its listing). Sessions
+    older than the first stored day, needed when a baseline date falls before
+    the window the snapshot was created with, are added by `prepend`.
+    """
+
+    MAGIC = b'SMPANEL1'
+    VERSION = 1
+    HEADER = struct.Struct('<8sIIQQQQQ')
+    COMMIT_OFFSET = 16
+    ALIGN = 64
+    CODE_DTYPE = 'S16'
+
+    def __init__(self, path: Path, mm: mmap.mmap, writable: bool):
+        self.path = Path(path)
+        self._mm = mm
+        self.writable = writable
+        self._load_layout()
+
+    # ------------------------------------------------------------------ layout
+
+    @classmethod
+    def _align(cls, n: int) -> int:
+        return (n + cls.ALIGN - 1) // cls.ALIGN * cls.ALIGN
+
+    @classmethod
+    def _layout(cls, n_codes: int, capacity: int, n_columns: int, n_indicators: int, meta_len: int):
+        meta_start = cls._align(cls.HEADER.size)
+        codes_start = cls._align(meta_start + meta_len)
+        dates_start = cls._align(codes_start + n_codes * np.dtype(cls.CODE_DTYPE).itemsize)
+        prices_start = cls._align(dates_start + capacity * 8)
+        block = cls._align(n_codes * capacity * 4)
+        indicators_start = prices_start + block * n_columns
+        slot = cls._align(n_codes * n_indicators * 4)
+        total = indicators_start + slot * 2
+        return {
+            'meta': meta_start, 'codes': codes_start, 'dates': dates_start,
+            'prices': prices_start, 'block': block,
+            'indicators': indicators_start, 'slot': slot, 'total': total,
+        }
+
+    def _load_layout(self):
+        magic, version, n_columns, commit, capacity, n_codes, n_indicators, meta_len = \
+            self.HEADER.unpack_from(self._mm, 0)
+        if magic != self.MAGIC or version != self.VERSION:
+            raise ValueError(f"{self.path} is not a panel snapshot (version {self.VERSION})")
+
+        self.capacity = capacity
+        self.layout = self._layout(n_codes, capacity, n_columns, n_indicators, meta_len)
+        meta = json.loads(bytes(self._mm[self.layout['meta']:self.layout['meta'] + meta_len]))
+        self.columns: List[str] = meta['columns']
+        self.indicator_names: List[str] = meta['indicators']
+
+        raw_codes = np.frombuffer(self._mm, dtype=self.CODE_DTYPE, count=n_codes, offset=self.layout['codes'])
+        self.codes: List[str] = [code.decode() for code in raw_codes]
+        self._code_index = {code: i for i, code in enumerate(self.codes)}
+
+        self._dates = np.frombuffer(self._mm, dtype=np.int64, count=capacity, offset=self.layout['dates'])
+        self._prices = {
+            column: np.frombuffer(self._mm, dtype=np.float32, count=n_codes * capacity,
+                                  offset=self.layout['prices'] + i * self.layout['block']).reshape(n_codes, capacity)
+            for i, column in enumerate(self.columns)
+        }
+        self._indicator_slots = [
+            np.frombuffer(self._mm, dtype=np.float32, count=n_codes * n_indicators,
+                          offset=self.layout['indicators'] + s * self.layout['slot']).reshape(n_codes, n_indicators)
+            for s in (0, 1)
+        ]
+
+    @property
+    def _commit(self) -> int:
+        return struct.unpack_from('<Q', self._mm, self.COMMIT_OFFSET)[0]
+
+    def _publish(self, n_dates: int, slot: int):
+        self._mm.flush()
+        struct.pack_into('<Q', self._mm, self.COMMIT_OFFSET, n_dates << 1 | slot)
+        self._mm.flush()
+
+    # ------------------------------------------------------------- open/create
+
+    @classmethod
+    def open(cls, path, writable: bool = False) -> 'PanelSnapshot':
+        with open(path, 'r+b' if writable else 'rb') as f:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_WRITE if writable else mmap.ACCESS_READ)
+        return cls(path, mm, writable)
+
+    @classmethod
+    def create(cls, path, prices: PricePanel, indicators: Optional[pd.DataFrame] = None,
+               capacity: Optional[int] = None) -> 'PanelSnapshot':
+        """Write a new snapshot atomically and open it for writing"""
+        n_codes, n_dates = len(prices.codes), len(prices.dates)
+        dense = np.full((len(prices.columns), n_codes, n_dates), np.nan, dtype=np.float32)
+        rows = np.repeat(np.arange(n_codes), prices.bar_counts)
+        for i, column in enumerate(prices.columns):
+            dense[i, rows, prices.date_index] = prices.column(column)
+
+        days = prices.dates.astype('datetime64[D]').astype(np.int64)
+        cls._write_file(path, prices.columns, prices.codes, days, dense, indicators, capacity)
+        return cls.open(path, writable=True)
+
+    @classmethod
+    def _write_file(cls, path, columns: Sequence[str], codes: Sequence[str], days: np.ndarray,
+                    dense: np.ndarray, indicators: Optional[pd.DataFrame], capacity: Optional[int]):
+        n_dates = len(days)
+        # Leave room for roughly a year of appends before the next rewrite
+        capacity = max(capacity or 0, n_dates + 250)
+        indicator_names = list(indicators.columns) if indicators is not None else []
+        meta = json.dumps({'columns': list(columns), 'indicators': indicator_names}).encode()
+        layout = cls._layout(len(codes), capacity, len(columns), len(indicator_names), len(meta))
+
+        path = Path(path)
+        path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = path.with_name(path.name + '.tmp')
+        with open(tmp_path, 'w+b') as f:
+            f.truncate(layout['total'])
+            mm = mmap.mmap(f.fileno(), layout['total'])
+            cls.HEADER.pack_into(mm, 0, cls.MAGIC, cls.VERSION, len(columns), n_dates << 1,
+                                 capacity, len(codes), len(indicator_names), len(meta))
+            mm[layout['meta']:layout['meta'] + len(meta)] = meta
+
+            code_array = np.frombuffer(mm, dtype=cls.CODE_DTYPE, count=len(codes), offset=layout['codes'])
+            code_array[:] = np.array(codes, dtype=cls.CODE_DTYPE)
+            date_array = np.frombuffer(mm, dtype=np.int64, count=capacity, offset=layout['dates'])
+            date_array[:n_dates] = days
+            for i in range(len(columns)):
+                block = np.frombuffer(mm, dtype=np.float32, count=len(codes) * capacity,
+                                      offset=layout['prices'] + i * layout['block']).reshape(len(codes), capacity)
+                block[:, :n_dates] = dense[i]
+                block[:, n_dates:] = np.nan
+            if indicator_names:
+                slot = np.frombuffer(mm, dtype=np.float32, count=len(codes) * len(indicator_names),
+                                     offset=layout['indicators']).reshape(len(codes), len(indicator_names))
+                slot[:] = indicators.reindex(list(codes)).to_numpy(dtype=np.float32)
+
+            del code_array, date_array, block
+            if indicator_names:
+                del slot
+            mm.flush()
+            mm.close()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        logger.info(f"Wrote panel snapshot {path} ({len(codes)} stocks, {n_dates} days, "
+                    f"{layout['total'] / 1024 / 1024:.1f} MB)")
+
+    def close(self):
+        # Drop array views before closing the map
+        self._dates = self._prices = self._indicator_slots = None
+        try:
+            self._mm.close()
+        except BufferError:
+            # Views handed out by get() are still alive; the map closes when they are released
+            pass
+
+    # ------------------------------------------------------------------ reading
+
+    @property
+    def n_dates(self) -> int:
+        return self._commit >> 1
+
+    @property
+    def dates(self) -> np.ndarray:
+        return self._dates[:self.n_dates].astype('datetime64[D]')
+
+    def __contains__(self, stock_code: str) -> bool:
+        return stock_code in self._code_index
+
+    def get(self, stock_code: str, column: str = 'close') -> Optional[np.ndarray]:
+        """Zero-copy float32 view of one stock's committed series (NaN where it did not trade)"""
+        i = self._code_index.get(stock_code)
+        if i is None:
+            return None
+        return self._prices[column][i, :self.n_dates]
+
+    def indicators(self) -> pd.DataFrame:
+        slot = self._indicator_slots[self._commit & 1]
+        return pd.DataFrame(slot.astype(np.float64), index=pd.Index(self.codes, name='ts_code'),
+                            columns=self.indicator_names)
+
+    def to_frame(self, stock_codes: Optional[Sequence[str]] = None, start_date=None) -> pd.DataFrame:
+        """Long (ts_code, trade_date, ...) frame for the requested stocks, reading only their rows"""
+        n_dates = self.n_dates
+        first = 0
+        if start_date is not None:
+            first = int(np.searchsorted(self._dates[:n_dates], np.datetime64(pd.Timestamp(start_date), 'D').astype(np.int64)))
+
+        if stock_codes is None:
+            selected = list(self.codes)
+        else:
+            selected = [code for code in stock_codes if code in self._code_index]
+        rows = np.array([self._code_index[code] for code in selected], dtype=np.int64)
+
+        # Bars are raw prices quoted in 0.01 yuan; rounding undoes the float32 storage error
+        # so thresholds compare the exact prices
+        data = {column: self._prices[column][rows, first:n_dates].astype(np.float64).ravel().round(2)
+                for column in self.columns}
+        frame = pd.DataFrame({
+            'ts_code': np.repeat(np.array(selected, dtype=object), n_dates - first),
+            'trade_date': pd.to_datetime(np.tile(self._dates[first:n_dates], len(selected)).astype('datetime64[D]')),
+            **data
+        })
+        return frame[frame['close'].notna()].reset_index(drop=True)
+
+    def to_price_panel(self, stock_codes: Optional[Sequence[str]] = None, start_date=None) -> PricePanel:
+        frame = self.to_frame(stock_codes, start_date)
+        if frame.empty:
+            return PricePanel.empty(self.columns)
+        return PricePanel.from_frame(frame, self.columns)
+
+    # ------------------------------------------------------------------ writing
+
+    def append(self, day_panel: pd.DataFrame, indicators: Optional[pd.DataFrame] = None) -> 'PanelSnapshot':
+        """Append sessions newer than the last committed day.
+
+        Rows of stocks not in the snapshot yet may also cover stored days;
+        they back-fill the new stocks' history. Returns the snapshot to use
+        afterwards (a new object when the file had to be rewritten to grow).
+        """
+        if not self.writable:
+            raise PermissionError("Snapshot was opened read-only")
+
+        n_dates = self.n_dates
+        last_day = self._dates[n_dates - 1] if n_dates else np.iinfo(np.int64).min
+        day_panel = day_panel.assign(
+            day=pd.to_datetime(day_panel['trade_date']).to_numpy().astype('datetime64[D]').astype(np.int64))
+        new_codes = sorted(set(day_panel['ts_code']) - set(self.codes))
+        backfill = day_panel[day_panel['ts_code'].isin(new_codes) & (day_panel['day'] <= last_day)]
+        day_panel = day_panel[day_panel['day'] > last_day]
+
+        new_days = np.unique(day_panel['day'].to_numpy())
+        if indicators is not None and list(indicators.columns) != self.indicator_names:
+            new_layout = True
+        else:
+            new_layout = bool(new_codes) or n_dates + len(new_days) > self.capacity
+
+        if new_layout:
+            return self._rewrite(day_panel, new_days, new_codes, indicators, backfill)
+
+        if len(new_days):
+            day_pos = n_dates + np.searchsorted(new_days, day_panel['day'].to_numpy())
+            rows = np.array([self._code_index[code] for code in day_panel['ts_code']], dtype=np.int64)
+            self._dates[n_dates:n_dates + len(new_days)] = new_days
+            for column in self.columns:
+                self._prices[column][:, n_dates:n_dates + len(new_days)] = np.nan
+                self._prices[column][rows, day_pos] = day_panel[column].to_numpy(dtype=np.float32)
+
+        slot = self._commit & 1
+        if indicators is not None:
+            # Merge into the current state so stocks not in `indicators` keep their values
+            merged = self.indicators()
+            merged.update(indicators.reindex(columns=self.indicator_names))
+            slot ^= 1
+            self._indicator_slots[slot][:] = merged.to_numpy(dtype=np.float32)
+
+        self._publish(n_dates + len(new_days), slot)
+        if len(new_days):
+            logger.info(f"Appended {len(new_days)} days to panel snapshot in place")
+        return self
+
+    def write_indicators(self, indicators: pd.DataFrame) -> 'PanelSnapshot':
+        """Publish new indicator state (one row per ts_code) without adding days"""
+        empty = pd.DataFrame(columns=['ts_code', 'trade_date', *self.columns])
+        return self.append(empty, indicators)
+
+    def prepend(self, day_panel: pd.DataFrame) -> 'PanelSnapshot':
+        """Add sessions older than the first committed day; the file is always rewritten"""
+        if not self.writable:
+            raise PermissionError("Snapshot was opened read-only")
+
+        n_dates = self.n_dates
+        first_day = self._dates[0] if n_dates else np.iinfo(np.int64).max
+        day_panel = day_panel.assign(
+            day=pd.to_datetime(day_panel['trade_date']).to_numpy().astype('datetime64[D]').astype(np.int64))
+        day_panel = day_panel[day_panel['day'] < first_day]
+        old_days = np.unique(day_panel['day'].to_numpy())
+        if not len(old_days):
+            return self
+
+        codes = list(self.codes) + sorted(set(day_panel['ts_code']) - set(self.codes))
+        code_index = {code: i for i, code in enumerate(codes)}
+        days = np.concatenate([old_days, self._dates[:n_dates]])
+
+        dense = np.full((len(self.columns), len(codes), len(days)), np.nan, dtype=np.float32)
+        day_pos = np.searchsorted(old_days, day_panel['day'].to_numpy())
+        rows = np.array([code_index[code] for code in day_panel['ts_code']], dtype=np.int64)
+        for i, column in enumerate(self.columns):
+            dense[i, :len(self.codes), len(old_days):] = self._prices[column][:, :n_dates]
+            dense[i, rows, day_pos] = day_panel[column].to_numpy(dtype=np.float32)
+
+        indicators = self.indicators() if self.indicator_names else None
+        capacity = self.capacity + len(old_days)
+        path = self.path
+        self.close()
+        self._write_file(path, self.columns, codes, days, dense, indicators, capacity)
+        logger.info(f"Prepended {len(old_days)} older days to panel snapshot")
+        return PanelSnapshot.open(path, writable=True)
+
+    def _rewrite(self, day_panel: pd.DataFrame, new_days: np.ndarray, new_codes: List[str],
+                 indicators: Optional[pd.DataFrame], backfill: Optional[pd.DataFrame] = None) -> 'PanelSnapshot':
+        n_dates = self.n_dates
+        codes = list(self.codes) + new_codes
+        days = np.concatenate([self._dates[:n_dates], new_days])
+        code_index = {code: i for i, code in enumerate(codes)}
+
+        dense = np.full((len(self.columns), len(codes), len(days)), np.nan, dtype=np.float32)
+        for i, column in enumerate(self.columns):
+            dense[i, :len(self.codes), :n_dates] = self._prices[column][:, :n_dates]
+
+        if len(new_days):
+            day_pos = n_dates + np.searchsorted(new_days, day_panel['day'].to_numpy())
+            rows = np.array([code_index[code] for code in day_panel['ts_code']], dtype=np.int64)
+            for i, column in enumerate(self.columns):
+                dense[i, rows, day_pos] = day_panel[column].to_numpy(dtype=np.float32)
+
+        if backfill is not None and not backfill.empty:
+            # Only days the snapshot already has; earlier history is outside its window
+            stored = self._dates[:n_dates]
+            backfill = backfill[np.isin(backfill['day'].to_numpy(), stored)]
+            day_pos = np.searchsorted(stored, backfill['day'].to_numpy())
+            rows = np.array([code_index[code] for code in backfill['ts_code']], dtype=np.int64)
+            for i, column in enumerate(self.columns):
+                dense[i, rows, day_pos] = backfill[column].to_numpy(dtype=np.float32)
+            logger.info(f"Back-filled {len(backfill)} bars of {backfill['ts_code'].nunique()} new stocks")
+
+        if indicators is None and self.indicator_names:
+            indicators = self.indicators()
+        elif indicators is not None and list(indicators.columns) == self.indicator_names:
+            merged = self.indicators()
+            merged.update(indicators)
+            indicators = merged
+
+        capacity = max(self.capacity, int(len(days) * 1.5))
+        path = self.path
+        self.close()
+        self._write_file(path, self.columns, codes, days, dense, indicators, capacity)
+        return PanelSnapshot.open(path, writable=True)
@@ -0,0 +1,97 @@
+import pandas as pd
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+ALERT_COLUMNS = [
+    'stock_code', 'trade_date', 'close_price',
+    'baseline_drop', 'baseline_date', 'baseline_price', 'baseline_drop_pct',
+    'mtr_drop', 'ma100', 'previous_close', 'price_drop', 'mtr_value',
+    'boll_drop', 'previous_bb_upper', 'current_bb_upper', 'boll_drop_pct'
+]
+
+
+def flatten_alert(alert: Dict) -> Dict:
+    """One flat row per alert; rule fields are NaN when that rule did not fire"""
+    baseline = alert.get('baseline_drop_alert') or {}
+    mtr = alert.get('mtr_drop_alert') or {}
+    boll = alert.get('boll_drop_alert') or {}
+    previous_close = mtr.get('previous_close', boll.get('previous_close'))
+    return {
+        'stock_code': alert['stock_code'],
+        'trade_date': alert['trade_date'],
+        'close_price': alert['close_price'],
+        'baseline_drop': bool(baseline),
+        'baseline_date': baseline.get('baseline_date'),
+        'baseline_price': baseline.get('baseline_price'),
+        'baseline_drop_pct': baseline.get('drop_percentage'),
+        'mtr_drop': bool(mtr),
+        'ma100': mtr.get('ma100_value'),
+        'previous_close': previous_close,
+        'price_drop': mtr.get('price_drop'),
+        'mtr_value': mtr.get('mtr_value'),
+        'boll_drop': bool(boll),
+        'previous_bb_upper': boll.get('previous_bb_upper'),
+        'current_bb_upper': boll.get('current_bb_upper'),
+        'boll_drop_pct': boll.get('drop_percentage'),
+    }
+
+
+class ParquetExporter:
+    """Append-only Parquet datasets of alerts and indicator snapshots.
+
+    Each run adds new files under `<export_dir>/alerts/` and
+    `<export_dir>/indicators/`, hive-partitioned as `trade_date=YYYY-MM-DD/`,
+    zstd-compressed. Existing files are never rewritten, so other tools can
+    scan months of history with partition pruning, e.g.
+    `pd.read_parquet('exports/indicators', filters=[('trade_date', '>=', '2025-10-01')])`.
+    Requires the optional `pyarrow` package.
+    """
+
+    def __init__(self, export_dir: str, compression: str = 'zstd'):
+        self.export_dir = Path(export_dir)
+        self.compression = compression
+
+    def _write(self, name: str, df: pd.DataFrame, run_id: str) -> int:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+
+        if df.empty:
+            return 0
+        pq.write_to_dataset(
+            pa.Table.from_pandas(df, preserve_index=False),
+            root_path=str(self.export_dir / name),
+            partition_cols=['trade_date'],
+            basename_template=f'{run_id}-{{i}}.parquet',
+            existing_data_behavior='overwrite_or_ignore',
+            compression=self.compression
+        )
+        return len(df)
+
+    def export(self, alerts: List[Dict], indicators: Optional[pd.DataFrame],
+               run_at: Optional[datetime] = None) -> Dict[str, int]:
+        """Write one run's alerts and latest per-stock indicators; returns rows written"""
+        run_at = run_at or datetime.now()
+        run_id = run_at.strftime('%Y%m%dT%H%M%S%f')
+
+        alert_rows = pd.DataFrame([flatten_alert(alert) for alert in alerts], columns=ALERT_COLUMNS)
+        alert_rows['run_at'] = pd.Timestamp(run_at)
+
+        if indicators is not None and not indicators.empty:
+            snapshot = indicators.reset_index()
+            snapshot['trade_date'] = snapshot['trade_date'].dt.strftime('%Y-%m-%d')
+            snapshot['baseline_ratio'] = snapshot['close'] / snapshot['baseline_price']
+            snapshot['run_at'] = pd.Timestamp(run_at)
+        else:
+            snapshot = pd.DataFrame()
+
+        written = {
+            'alerts': self._write('alerts', alert_rows, run_id),
+            'indicators': self._write('indicators', snapshot, run_id)
+        }
+        logger.info(f"Exported {written['alerts']} alerts and {written['indicators']} indicator rows "
+                    f"to {self.export_dir}")
+        return written
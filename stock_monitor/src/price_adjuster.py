@@ -0,0 +1,162 @@
+import pandas as pd
+import numpy as np
+import logging
+import time
+from pathlib import Path
+from typing import Dict, List, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+class PriceAdjuster:
+    """Split/dividend adjustment of the daily panel using cached adj_factor data.
+
+    Factors are fetched cross-sectionally (one `pro.adj_factor` call per trade
+    date covers every stock) and cached on disk, so after the first run only
+    new sessions cost a request. The latest factor of each stock is remembered
+    so a new corporate action can be detected and only that stock's cached
+    indicators invalidated.
+    """
+
+    PRICE_COLUMNS = ['open', 'high', 'low', 'close', 'pre_close']
+    # A date without factors (not published yet, or the request failed) is asked again after this
+    EMPTY_RETRY_SECONDS = 30 * 60
+
+    def __init__(self, tushare_client, cache_dir: str):
+        self.tushare_client = tushare_client
+        self.factor_dir = Path(cache_dir) / 'adj_factor'
+        self.latest_path = Path(cache_dir) / 'adj_factor_latest.csv'
+        # Factor files already read this process, and dates already checked for changes
+        self._factors: Dict[str, pd.DataFrame] = {}
+        self._checked_dates = set()
+        # Dates the API had no factors for -> when it was asked; not cached on disk
+        self._empty: Dict[str, float] = {}
+
+    def get_factors(self, trade_dates: List[str]) -> pd.DataFrame:
+        """Adjustment factors for all stocks on the given YYYYMMDD dates"""
+        self.factor_dir.mkdir(parents=True, exist_ok=True)
+
+        frames = []
+        fetched = 0
+        for trade_date in sorted(set(trade_dates)):
+            if trade_date in self._factors:
+                frames.append(self._factors[trade_date])
+                continue
+            if time.time() - self._empty.get(trade_date, 0) < self.EMPTY_RETRY_SECONDS:
+                continue
+
+            cache_file = self.factor_dir / f'{trade_date}.csv'
+            if cache_file.exists():
+                df = pd.read_csv(cache_file, dtype={'trade_date': str})
+            else:
+                df = self.tushare_client.get_adj_factor_by_date(trade_date)
+                fetched += 1
+                if df is not None:
+                    df.to_csv(cache_file, index=False)
+                else:
+                    self._empty[trade_date] = time.time()
+
+            if df is not None:
+                self._factors[trade_date] = df
+                frames.append(df)
+
+        # Dates that have left the window are dropped from memory
+        if trade_dates:
+            first = min(trade_dates)
+            self._factors = {d: df for d, df in self._factors.items() if d >= first}
+            self._empty = {d: t for d, t in self._empty.items() if d >= first}
+        logger.debug(f"Loaded adjustment factors for {len(trade_dates)} dates ({fetched} fetched from API)")
+        if fetched:
+            logger.info(f"Fetched adjustment factors for {fetched} new dates")
+
+        if not frames:
+            return pd.DataFrame(columns=['ts_code', 'trade_date', 'adj_factor'])
+        return pd.concat(frames, ignore_index=True)
+
+    def adjust(self, panel: pd.DataFrame, factors: pd.DataFrame, how: str = 'qfq') -> pd.DataFrame:
+        """Apply forward ('qfq') or backward ('hfq') adjustment to the whole panel"""
+        if how not in ('qfq', 'hfq'):
+            raise ValueError(f"Unknown adjustment type: {how}")
+
+        factors = factors.assign(trade_date=pd.to_datetime(factors['trade_date'], format='%Y%m%d'))
+        panel = panel.drop(columns='adj_factor', errors='ignore')
+        panel = panel.merge(factors, on=['ts_code', 'trade_date'], how='left')
+        panel = panel.sort_values(['ts_code', 'trade_date'], ignore_index=True)
+
+        # qfq scales by the latest factor; a stale one mis-scales history after a new corporate action
+        unfilled = panel.loc[~panel['ts_code'].duplicated(keep='last') & panel['adj_factor'].isna(), 'ts_code']
+        if len(unfilled):
+            logger.warning(f"{len(unfilled)} stocks have no adjustment factor on their latest bar "
+                           f"(e.g. {unfilled.iloc[0]}), using their previous factor")
+
+        # Fill dates without a factor (suspension, fetch gaps) from neighbouring sessions
+        factor = panel.groupby('ts_code')['adj_factor'].ffill()
+        factor = factor.groupby(panel['ts_code']).bfill().fillna(1.0)
+
+        if how == 'qfq':
+            # Scale history to the latest factor so the latest price equals the raw price
+            scale = factor / factor.groupby(panel['ts_code']).transform('last')
+        else:
+            scale = factor
+
+        columns = [c for c in self.PRICE_COLUMNS if c in panel.columns]
+        panel[columns] = panel[columns].mul(scale, axis=0)
+        panel['adj_factor'] = factor
+        # Raw -> adjusted multiplier of each bar, for raw prices from elsewhere (e.g. a watch price)
+        panel['price_scale'] = scale
+
+        return panel
+
+    def detect_factor_changes(self, factors: pd.DataFrame) -> List[str]:
+        """Stocks whose latest factor differs from the one seen on the previous run"""
+        latest = (factors.sort_values('trade_date')
+                  .groupby('ts_code')['adj_factor'].last())
+
+        changed = []
+        if self.latest_path.exists():
+            previous = pd.read_csv(self.latest_path, index_col='ts_code')['adj_factor']
+            common = latest.index.intersection(previous.index)
+            diff = ~np.isclose(latest[common].values, previous[common].values)
+            changed = common[diff].tolist()
+        else:
+            previous = pd.Series(dtype=float)
+
+        merged = pd.concat([previous[~previous.index.isin(latest.index)], latest])
+        self.latest_path.parent.mkdir(parents=True, exist_ok=True)
+        merged.rename('adj_factor').rename_axis('ts_code').to_csv(self.latest_path)
+
+        if changed:
+            logger.info(f"Adjustment factor changed for {len(changed)} stocks: {', '.join(changed)}")
+        return changed
+
+    def adjust_panel(self, panel: pd.DataFrame, how: str = 'qfq') -> Tuple[pd.DataFrame, List[str]]:
+        """Adjust a long panel; returns the adjusted panel and stocks with new factors"""
+        if panel.empty:
+            return panel, []
+
+        trade_dates = panel['trade_date'].dt.strftime('%Y%m%d').unique().tolist()
+
+        factors = self.get_factors(trade_dates)
+        if factors.empty:
+            logger.warning("No adjustment factors available, using raw prices")
+            return panel, []
+
+        # A streaming run adjusts chunk by chunk; check each window for changes once
+        changed = []
+        if not set(trade_dates) <= self._checked_dates:
+            changed = self.detect_factor_changes(factors)
+            self._checked_dates.update(trade_dates)
+        return self.adjust(panel, factors, how), changed
+
+    def adjust_stock_data(self, stock_data: Dict[str, pd.DataFrame],
+                          how: str = 'qfq') -> Tuple[Dict[str, pd.DataFrame], List[str]]:
+        """Adjust per-stock frames in one pass; returns adjusted data and stocks with new factors"""
+        frames = [df.assign(ts_code=code) for code, df in stock_data.items()]
+        if not frames:
+            return stock_data, []
+
+        adjusted, changed = self.adjust_panel(pd.concat(frames, ignore_index=True), how)
+        if 'adj_factor' not in adjusted.columns:
+            return stock_data, changed
+
+        return {code: df.reset_index(drop=True) for code, df in adjusted.groupby('ts_code', sort=False)}, changed
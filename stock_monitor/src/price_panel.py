@@ -0,0 +1,131 @@
+import pandas as pd
+import numpy as np
+import logging
+from typing import Dict, List, Optional, Sequence
+
+logger = logging.getLogger(__name__)
+
+
+class PricePanel:
+    """Compact, array-backed store of daily prices for many stocks.
+
+    Bars are laid out stock by stock (CSR style): stock i owns rows
+    offsets[i]:offsets[i + 1], each row points into one shared date axis via
+    a small integer index, and every price column is a single contiguous
+    float32 array. Only the columns the rules use are kept.
+
+    This is how the panel snapshot is built: 18 bytes per bar instead of a
+    float64 DataFrame with every Tushare column. float32 rounds prices to
+    about seven significant digits, so analysis reads them back as float64
+    rounded to 0.01 yuan (see PanelSnapshot.to_frame).
+    """
+
+    DEFAULT_COLUMNS = ('open', 'high', 'low', 'close')
+
+    def __init__(self, dates: np.ndarray, codes: Sequence[str], offsets: np.ndarray,
+                 date_index: np.ndarray, values: Dict[str, np.ndarray]):
+        self.dates = dates                  # datetime64[D], shared date axis
+        self.codes = list(codes)            # stock i -> ts_code
+        self.offsets = offsets              # int64, len(codes) + 1
+        self.date_index = date_index        # int16/int32 into self.dates, one per bar
+        self.values = values                # column -> float32 array, one value per bar
+        self._code_index = {code: i for i, code in enumerate(self.codes)}
+
+    @classmethod
+    def from_frame(cls, panel: pd.DataFrame, columns: Sequence[str] = DEFAULT_COLUMNS) -> 'PricePanel':
+        """Build from a long (ts_code, trade_date, ...) DataFrame"""
+        panel = panel.sort_values(['ts_code', 'trade_date'], kind='stable')
+        codes, code_pos = np.unique(panel['ts_code'].to_numpy(), return_inverse=True)
+        dates, date_pos = np.unique(panel['trade_date'].to_numpy().astype('datetime64[D]'), return_inverse=True)
+
+        offsets = np.zeros(len(codes) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(code_pos, minlength=len(codes)), out=offsets[1:])
+        index_dtype = np.int16 if len(dates) <= np.iinfo(np.int16).max else np.int32
+
+        values = {column: panel[column].to_numpy(dtype=np.float32) for column in columns}
+        return cls(dates, codes.tolist(), offsets, date_pos.astype(index_dtype), values)
+
+    @classmethod
+    def from_stock_data(cls, stock_data: Dict[str, pd.DataFrame],
+                        columns: Sequence[str] = DEFAULT_COLUMNS) -> 'PricePanel':
+        frames = [df[['trade_date', *columns]].assign(ts_code=code)
+                  for code, df in stock_data.items() if df is not None and not df.empty]
+        if not frames:
+            return cls.empty(columns)
+        return cls.from_frame(pd.concat(frames, ignore_index=True), columns)
+
+    @classmethod
+    def empty(cls, columns: Sequence[str] = DEFAULT_COLUMNS) -> 'PricePanel':
+        return cls(np.array([], dtype='datetime64[D]'), [], np.zeros(1, dtype=np.int64),
+                   np.array([], dtype=np.int16), {c: np.array([], dtype=np.float32) for c in columns})
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def __contains__(self, stock_code: str) -> bool:
+        return stock_code in self._code_index
+
+    @property
+    def columns(self) -> List[str]:
+        return list(self.values)
+
+    @property
+    def bar_counts(self) -> np.ndarray:
+        return np.diff(self.offsets)
+
+    def column(self, column: str, start: int = 0, end: Optional[int] = None) -> np.ndarray:
+        """Bars start:end of one column (all stocks by default) as float64"""
+        return self.values[column][start:end].astype(np.float64)
+
+    def get(self, stock_code: str, column: str = 'close') -> Optional[np.ndarray]:
+        """Price series of one stock as float64 (a copy; the stored arrays stay compact)"""
+        i = self._code_index.get(stock_code)
+        if i is None:
+            return None
+        return self.column(column, self.offsets[i], self.offsets[i + 1])
+
+    def get_dates(self, stock_code: str) -> Optional[np.ndarray]:
+        i = self._code_index.get(stock_code)
+        if i is None:
+            return None
+        return self.dates[self.date_index[self.offsets[i]:self.offsets[i + 1]]]
+
+    def stock_frame(self, stock_code: str) -> Optional[pd.DataFrame]:
+        i = self._code_index.get(stock_code)
+        if i is None:
+            return None
+        start, end = self.offsets[i], self.offsets[i + 1]
+        df = pd.DataFrame({column: self.column(column, start, end) for column in self.values})
+        df.insert(0, 'trade_date', pd.to_datetime(self.dates[self.date_index[start:end]]))
+        df.insert(0, 'ts_code', stock_code)
+        return df
+
+    def to_frame(self) -> pd.DataFrame:
+        """Expand back into a long DataFrame for pandas-based analysis"""
+        df = pd.DataFrame({column: self.column(column) for column in self.values})
+        df.insert(0, 'trade_date', pd.to_datetime(self.dates[self.date_index]))
+        df.insert(0, 'ts_code', np.repeat(np.array(self.codes, dtype=object), self.bar_counts))
+        return df
+
+    def to_stock_data(self) -> Dict[str, pd.DataFrame]:
+        return {code: self.stock_frame(code) for code in self.codes}
+
+    def memory_report(self) -> Dict[str, int]:
+        """Bytes held by each component of the panel"""
+        report = {
+            'dates': self.dates.nbytes,
+            'offsets': self.offsets.nbytes,
+            'date_index': self.date_index.nbytes,
+        }
+        for column, array in self.values.items():
+            report[column] = array.nbytes
+        report['total'] = sum(report.values())
+        report['stocks'] = len(self.codes)
+        report['bars'] = len(self.date_index)
+        return report
+
+    def log_memory_report(self):
+        report = self.memory_report()
+        per_bar = report['total'] / report['bars'] if report['bars'] else 0
+        logger.info(f"Price panel: {report['stocks']} stocks, {report['bars']} bars, "
+                    f"{report['total'] / 1024 / 1024:.1f} MB ({per_bar:.1f} bytes/bar)")
@@ -0,0 +1,92 @@
+import numpy as np
+import pandas as pd
+import requests
+from requests.adapters import HTTPAdapter
+import logging
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_API_URL = 'http://api.tushare.pro'
+
+
+def items_to_arrays(fields: List[str], items: List[list]) -> Dict[str, np.ndarray]:
+    """Turn the API's row-wise `items` into one NumPy array per field.
+
+    Columns holding only numbers (and nulls) become float64 with NaN for
+    missing values; anything else, e.g. ts_code or trade_date, stays object.
+    """
+    if not items:
+        return {field: np.empty(0, dtype=object) for field in fields}
+
+    arrays = {}
+    for field, column in zip(fields, zip(*items)):
+        values = np.array(column, dtype=object)
+        if all(v is None or (isinstance(v, (int, float)) and not isinstance(v, bool)) for v in column):
+            values = np.array([np.nan if v is None else v for v in column], dtype=np.float64)
+        arrays[field] = values
+    return arrays
+
+
+class ProTransport:
+    """Thin replacement for the tushare SDK's `pro_api()` HTTP layer.
+
+    Keeps one pooled keep-alive session, asks for gzip-compressed responses
+    and parses the `fields`/`items` payload straight into NumPy arrays. Any
+    API is available as a method, so `transport.daily(trade_date='20251017')`
+    works like `pro.daily(...)` and returns a DataFrame built once from those
+    arrays.
+    """
+
+    def __init__(self, token: str, api_url: Optional[str] = None, timeout: float = 30,
+                 pool_size: int = 10, max_retries: int = 2):
+        self.token = token
+        self.api_url = api_url or DEFAULT_API_URL
+        self.timeout = timeout
+
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=max_retries)
+        self.session.mount('http://', adapter)
+        self.session.mount('https://', adapter)
+        self.session.headers.update({
+            'Accept-Encoding': 'gzip, deflate',
+            'Connection': 'keep-alive'
+        })
+        self.stats = {'requests': 0, 'bytes_received': 0, 'compressed_responses': 0}
+
+    def query_arrays(self, api_name: str, fields: str = '', **params) -> Dict[str, np.ndarray]:
+        """Call an API and return {field: array}; raises on transport or API errors"""
+        payload = {
+            'api_name': api_name,
+            'token': self.token,
+            'params': {k: v for k, v in params.items() if v is not None},
+            'fields': fields
+        }
+        response = self.session.post(self.api_url, json=payload, timeout=self.timeout)
+        response.raise_for_status()
+
+        self.stats['requests'] += 1
+        self.stats['bytes_received'] += int(response.headers.get('Content-Length', len(response.content)))
+        if response.headers.get('Content-Encoding') in ('gzip', 'deflate'):
+            self.stats['compressed_responses'] += 1
+
+        result = response.json()
+        if result.get('code') != 0:
+            raise Exception(result.get('msg') or f"API {api_name} returned code {result.get('code')}")
+
+        data = result.get('data') or {}
+        return items_to_arrays(data.get('fields', []), data.get('items', []))
+
+    def query(self, api_name: str, fields: str = '', **params) -> pd.DataFrame:
+        return pd.DataFrame(self.query_arrays(api_name, fields, **params))
+
+    def __getattr__(self, api_name: str):
+        if api_name.startswith('_'):
+            raise AttributeError(api_name)
+
+        def call(fields: str = '', **params):
+            return self.query(api_name, fields, **params)
+        return call
+
+    def close(self):
+        self.session.close()
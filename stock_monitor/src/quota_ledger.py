@@ -0,0 +1,130 @@
+import hashlib
+import os
+import sqlite3
+import time
+from datetime import datetime, timedelta
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_LEDGER_PATH = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'cache', 'quota.sqlite')
+
+
+class QuotaExceeded(Exception):
+    """No request slot became available before the timeout"""
+
+
+class QuotaLedger:
+    """API quota shared by every process that uses the same token.
+
+    Each granted request is recorded in a small SQLite file, so parallel
+    scripts see each other's usage. A request is allowed when fewer than
+    `per_minute` requests were made in the last 60 seconds and fewer than
+    `per_day` since local midnight. Slots are taken inside an immediate
+    transaction, which holds SQLite's file lock, so two processes can never
+    both take the last slot. The token is stored only as a hash.
+
+    `max_wait` caps how long a client waits for a slot: once the daily quota
+    is used up the next slot is at midnight, and a scheduled run should fail
+    with QuotaExceeded (and be resumed later) rather than sleep until then.
+    """
+
+    def __init__(self, token: str, path: Optional[str] = None, per_minute: int = 500,
+                 per_day: Optional[int] = None, max_wait: Optional[float] = 300):
+        self.path = path or DEFAULT_LEDGER_PATH
+        self.key = hashlib.sha256(token.encode('utf-8')).hexdigest()[:16]
+        self.per_minute = per_minute
+        self.per_day = per_day
+        self.max_wait = max_wait
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = self._connect()
+        try:
+            conn.execute("CREATE TABLE IF NOT EXISTS requests (token TEXT NOT NULL, ts REAL NOT NULL)")
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_requests_token_ts ON requests (token, ts)")
+        finally:
+            conn.close()
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        return conn
+
+    @staticmethod
+    def _day_start(now: float) -> float:
+        return datetime.fromtimestamp(now).replace(hour=0, minute=0, second=0, microsecond=0).timestamp()
+
+    def _try_take(self, conn: sqlite3.Connection, now: float) -> float:
+        """Take a slot and return 0, or return seconds until one frees up"""
+        day_start = self._day_start(now)
+        conn.execute("DELETE FROM requests WHERE token = ? AND ts < ?", (self.key, min(day_start, now - 60)))
+
+        minute_count, oldest_in_minute = conn.execute(
+            "SELECT COUNT(*), MIN(ts) FROM requests WHERE token = ? AND ts > ?", (self.key, now - 60)
+        ).fetchone()
+        day_count = conn.execute(
+            "SELECT COUNT(*) FROM requests WHERE token = ? AND ts >= ?", (self.key, day_start)
+        ).fetchone()[0]
+
+        if self.per_day is not None and day_count >= self.per_day:
+            tomorrow = datetime.fromtimestamp(day_start) + timedelta(days=1)
+            return tomorrow.timestamp() - now
+        if minute_count >= self.per_minute:
+            # The window slides: a slot frees once the oldest request is a minute old
+            return max(oldest_in_minute + 60 - now, 0.01)
+
+        conn.execute("INSERT INTO requests (token, ts) VALUES (?, ?)", (self.key, now))
+        return 0
+
+    def try_acquire(self) -> bool:
+        """Take a slot if one is free right now"""
+        return self.acquire(timeout=0)
+
+    def acquire(self, timeout: Optional[float] = None) -> bool:
+        """Wait until a slot is available and take it.
+
+        Returns False if `timeout` seconds pass first (never, if timeout is None),
+        without waiting at all when the next free slot is later than that.
+        """
+        deadline = None if timeout is None else time.time() + timeout
+        conn = self._connect()
+        try:
+            while True:
+                conn.execute("BEGIN IMMEDIATE")
+                try:
+                    wait = self._try_take(conn, time.time())
+                    conn.execute("COMMIT")
+                except Exception:
+                    conn.execute("ROLLBACK")
+                    raise
+
+                if wait == 0:
+                    return True
+                if deadline is not None:
+                    remaining = deadline - time.time()
+                    if wait > remaining:
+                        return False
+                logger.info(f"API quota reached, waiting {wait:.1f}s for a free slot")
+                time.sleep(wait)
+        finally:
+            conn.close()
+
+    def wait_for_slot(self, timeout: Optional[float] = None):
+        """Like acquire(), but raises QuotaExceeded on timeout"""
+        if not self.acquire(timeout):
+            usage = self.usage()
+            raise QuotaExceeded(f"No API request slot available within {timeout}s "
+                                f"({usage['minute']} requests in the last minute, {usage['day']} today)")
+
+    def usage(self) -> Dict[str, int]:
+        now = time.time()
+        conn = self._connect()
+        try:
+            minute = conn.execute("SELECT COUNT(*) FROM requests WHERE token = ? AND ts > ?",
+                                  (self.key, now - 60)).fetchone()[0]
+            day = conn.execute("SELECT COUNT(*) FROM requests WHERE token = ? AND ts >= ?",
+                               (self.key, self._day_start(now))).fetchone()[0]
+        finally:
+            conn.close()
+        return {'minute': minute, 'day': day}
@@ -0,0 +1,130 @@
+import pandas as pd
+import logging
+import threading
+from collections import OrderedDict
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+DateRange = Tuple[date, date]
+
+
+class RangeCache:
+    """In-process cache of daily bars keyed by stock, aware of which date ranges were fetched.
+
+    Each stock keeps a sorted list of disjoint, merged [start, end] calendar
+    ranges that have been fetched, plus the bars inside them. A request is
+    served from memory when its range is covered; otherwise only the gaps are
+    reported by `missing()` so the caller fetches just those. Stocks are
+    evicted least-recently-used once the cached frames exceed `max_bytes`.
+    """
+
+    def __init__(self, max_bytes: int = 64 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries: 'OrderedDict[str, Dict]' = OrderedDict()
+        self.total_bytes = 0
+        self.stats = {'hits': 0, 'partial_hits': 0, 'misses': 0, 'evictions': 0}
+        self._lock = threading.RLock()
+
+    def __contains__(self, stock_code: str) -> bool:
+        return stock_code in self._entries
+
+    def ranges(self, stock_code: str) -> List[DateRange]:
+        with self._lock:
+            entry = self._entries.get(stock_code)
+            return list(entry['ranges']) if entry else []
+
+    def missing(self, stock_code: str, start: date, end: date) -> List[DateRange]:
+        """Sub-ranges of [start, end] not yet fetched for this stock"""
+        with self._lock:
+            return self._missing(stock_code, start, end)
+
+    def _missing(self, stock_code: str, start: date, end: date) -> List[DateRange]:
+        gaps = []
+        cursor = start
+        for range_start, range_end in self.ranges(stock_code):
+            if range_end < cursor:
+                continue
+            if range_start > end:
+                break
+            if range_start > cursor:
+                gaps.append((cursor, range_start - timedelta(days=1)))
+            cursor = max(cursor, range_end + timedelta(days=1))
+            if cursor > end:
+                break
+        if cursor <= end:
+            gaps.append((cursor, end))
+
+        if not gaps:
+            self.stats['hits'] += 1
+        elif gaps == [(start, end)]:
+            self.stats['misses'] += 1
+        else:
+            self.stats['partial_hits'] += 1
+        return gaps
+
+    def add(self, stock_code: str, start: date, end: date, df: Optional[pd.DataFrame]):
+        """Record that [start, end] was fetched, with the bars it returned (may be empty)"""
+        with self._lock:
+            self._add(stock_code, start, end, df)
+
+    def _add(self, stock_code: str, start: date, end: date, df: Optional[pd.DataFrame]):
+        entry = self._entries.pop(stock_code, None)
+        if entry is None:
+            entry = {'ranges': [], 'data': None, 'bytes': 0}
+        else:
+            self.total_bytes -= entry['bytes']
+
+        entry['ranges'] = self._merge(entry['ranges'] + [(start, end)])
+        if df is not None and not df.empty:
+            frames = [f for f in (entry['data'], df) if f is not None]
+            data = pd.concat(frames, ignore_index=True)
+            entry['data'] = (data.drop_duplicates('trade_date', keep='last')
+                             .sort_values('trade_date', ignore_index=True))
+        entry['bytes'] = int(entry['data'].memory_usage(deep=True).sum()) if entry['data'] is not None else 0
+
+        self._entries[stock_code] = entry
+        self.total_bytes += entry['bytes']
+        self._evict()
+
+    def get(self, stock_code: str, start: date, end: date) -> Optional[pd.DataFrame]:
+        """Bars in [start, end] if that range is fully covered, else None"""
+        with self._lock:
+            return self._get(stock_code, start, end)
+
+    def _get(self, stock_code: str, start: date, end: date) -> Optional[pd.DataFrame]:
+        entry = self._entries.get(stock_code)
+        if entry is None or not any(s <= start and end <= e for s, e in entry['ranges']):
+            return None
+
+        self._entries.move_to_end(stock_code)
+        data = entry['data']
+        if data is None:
+            return pd.DataFrame()
+        mask = (data['trade_date'] >= pd.Timestamp(start)) & (data['trade_date'] <= pd.Timestamp(end))
+        # Callers add helper columns to the frames they get, so hand out a copy
+        return data[mask].reset_index(drop=True).copy()
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.total_bytes = 0
+
+    @staticmethod
+    def _merge(ranges: List[DateRange]) -> List[DateRange]:
+        merged: List[DateRange] = []
+        for start, end in sorted(ranges):
+            if merged and start <= merged[-1][1] + timedelta(days=1):
+                merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+            else:
+                merged.append((start, end))
+        return merged
+
+    def _evict(self):
+        # Keep the most recently used stock even if it alone exceeds the budget
+        while self.total_bytes > self.max_bytes and len(self._entries) > 1:
+            stock_code, entry = self._entries.popitem(last=False)
+            self.total_bytes -= entry['bytes']
+            self.stats['evictions'] += 1
+            logger.debug(f"Evicted {stock_code} from range cache")
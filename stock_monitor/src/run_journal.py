@@ -0,0 +1,141 @@
+import json
+import shutil
+import threading
+import pandas as pd
+import logging
+from datetime import datetime
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from json_encoding import json_default
+
+logger = logging.getLogger(__name__)
+
+
+class RunJournal:
+    """Append-only checkpoint journal of one watchlist run.
+
+    Every fetched stock is written to `journal_frames/<code>.csv` and logged
+    as `fetched`; every analyzed chunk is logged as `analyzed` with its alerts
+    and latest indicators, after which its frames are deleted. A stock whose
+    fetch failed is logged as `failed` and the run is then not marked
+    finished, so --resume fetches it again. Sending an
+    email is logged as `notified` with the alerts (stock and bar) it covered and a
+    completed run as `finished`. A resumed run replays the journal, so
+    finished stocks are neither refetched nor re-analyzed and alerts that
+    already went out are not sent again. Runs are keyed by the latest
+    closed trading session, so a journal from an earlier session is never
+    resumed. (Alerts sent by an earlier, finished run of the same session
+    are tracked by SentAlerts, which covers every run mode.)
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.frames_dir = self.path.parent / 'journal_frames'
+        self._lock = threading.Lock()
+
+        self.fetched = set()
+        self.analyzed = set()
+        self.alerts: List[Dict] = []
+        self.indicators: List[Dict] = []
+        self.notified = set()
+        # Stocks whose fetch failed in this attempt
+        self.failed = set()
+
+    def _append(self, event: Dict):
+        line = json.dumps(event, ensure_ascii=False, default=json_default)
+        with self._lock:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(line + '\n')
+                f.flush()
+
+    def _read(self) -> List[Dict]:
+        events = []
+        with open(self.path, encoding='utf-8') as f:
+            for line in f:
+                try:
+                    events.append(json.loads(line))
+                except json.JSONDecodeError:
+                    # A line cut short by the crash; everything before it is intact
+                    break
+        return events
+
+    def start(self, stock_codes: List[str], resume: bool = False, session: Optional[str] = None) -> bool:
+        """Begin a run; returns True if an interrupted run with the same stocks was resumed"""
+        run_key = session or datetime.now().strftime('%Y-%m-%d')
+        events = self._read() if self.path.exists() else []
+        header = events[0] if events else {}
+        same_session = header.get('session') == run_key
+
+        if resume and events:
+            if events[-1].get('event') == 'finished':
+                logger.info("Last run finished, nothing to resume")
+            elif not same_session or header.get('codes') != sorted(stock_codes):
+                logger.info("Journal belongs to a different run, starting fresh")
+            else:
+                self._replay(events)
+                logger.info(f"Resuming run: {len(self.analyzed)} stocks already analyzed, "
+                            f"{len(self.fetched - self.analyzed)} fetched but not analyzed, "
+                            f"{len(self.alerts)} pending alerts")
+                return True
+
+        if self.frames_dir.exists():
+            shutil.rmtree(self.frames_dir)
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self.path.unlink(missing_ok=True)
+        self._append({'event': 'start', 'session': run_key, 'codes': sorted(stock_codes)})
+        return False
+
+    def _replay(self, events: List[Dict]):
+        for event in events:
+            kind = event.get('event')
+            if kind == 'fetched':
+                self.fetched.add(event['code'])
+            elif kind == 'analyzed':
+                self.analyzed.update(event['codes'])
+                self.alerts.extend(event['alerts'])
+                self.indicators.extend(event['indicators'])
+            elif kind == 'notified':
+                self.notified.update(event['alerts'])
+
+    def record_fetched(self, stock_code: str, df: pd.DataFrame):
+        self.frames_dir.mkdir(parents=True, exist_ok=True)
+        df.to_csv(self.frames_dir / f'{stock_code}.csv', index=False)
+        self._append({'event': 'fetched', 'code': stock_code})
+        with self._lock:
+            self.fetched.add(stock_code)
+
+    def record_failed(self, stock_code: str, error: str):
+        self._append({'event': 'failed', 'code': stock_code, 'error': error})
+        with self._lock:
+            self.failed.add(stock_code)
+
+    def load_fetched(self, stock_code: str) -> Optional[pd.DataFrame]:
+        """Frame fetched before the interruption, if it was not analyzed yet"""
+        frame_file = self.frames_dir / f'{stock_code}.csv'
+        if stock_code not in self.fetched or not frame_file.exists():
+            return None
+        return pd.read_csv(frame_file, parse_dates=['trade_date'])
+
+    def record_analyzed(self, stock_codes: List[str], alerts: List[Dict], latest: pd.DataFrame):
+        indicators = latest.reset_index().to_dict('records')
+        self._append({'event': 'analyzed', 'codes': list(stock_codes), 'alerts': alerts, 'indicators': indicators})
+        for stock_code in stock_codes:
+            (self.frames_dir / f'{stock_code}.csv').unlink(missing_ok=True)
+
+    def restored_indicators(self) -> pd.DataFrame:
+        """Indicators of the stocks analyzed before the interruption"""
+        if not self.indicators:
+            return pd.DataFrame()
+        latest = pd.DataFrame(self.indicators).set_index('ts_code')
+        latest['trade_date'] = pd.to_datetime(latest['trade_date'])
+        return latest
+
+    def record_notified(self, alert_keys: List[str]):
+        self.notified.update(alert_keys)
+        self._append({'event': 'notified', 'alerts': list(alert_keys)})
+
+    def finish(self):
+        self._append({'event': 'finished'})
+        if self.frames_dir.exists():
+            shutil.rmtree(self.frames_dir)
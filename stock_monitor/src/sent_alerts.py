@@ -0,0 +1,59 @@
+import json
+import os
+import logging
+from pathlib import Path
+from typing import Dict, List, Set
+
+logger = logging.getLogger(__name__)
+
+
+def alert_key(alert: Dict) -> str:
+    """An alert is identified by its stock and the bar that triggered it"""
+    return f"{alert['stock_code']}:{alert['trade_date']}"
+
+
+class SentAlerts:
+    """Alerts that already went out, per run scope and trading session.
+
+    A scope is what a run covers ('watchlist', 'all:SSE:主板', ...). A re-run
+    for a session that was already notified (a manual workflow_dispatch, a
+    retried scheduled job) only sends alerts that are new, whichever mode
+    produced them; the first run of the next session sends everything again.
+    Alerts are keyed by stock and bar, so a stock that alerts again on a bar
+    published after the earlier run is sent again.
+    """
+
+    def __init__(self, path: str):
+        self.path = Path(path)
+        self.entries: Dict[str, Dict] = self._load()
+
+    def _load(self) -> Dict[str, Dict]:
+        if not self.path.exists():
+            return {}
+        try:
+            with open(self.path, encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, json.JSONDecodeError) as e:
+            logger.warning(f"Ignoring unreadable sent-alerts file {self.path}: {e}")
+            return {}
+
+    def keys(self, scope: str, session: str) -> Set[str]:
+        entry = self.entries.get(scope, {})
+        return set(entry.get('alerts', [])) if entry.get('session') == session else set()
+
+    def unsent(self, scope: str, session: str, alerts: List[Dict]) -> List[Dict]:
+        sent = self.keys(scope, session)
+        return [alert for alert in alerts if alert_key(alert) not in sent]
+
+    def add(self, scope: str, session: str, alerts: List[Dict]):
+        keys = self.keys(scope, session) | {alert_key(alert) for alert in alerts}
+        self.entries[scope] = {'session': session, 'alerts': sorted(keys)}
+        self._save()
+
+    def _save(self):
+        """Write atomically so a crash never leaves half a file"""
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        tmp_path = self.path.with_suffix('.tmp')
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.entries, f, ensure_ascii=False)
+        os.replace(tmp_path, self.path)
@@ -0,0 +1,132 @@
+import json
+import os
+import shutil
+import zlib
+from datetime import datetime
+from pathlib import Path
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from json_encoding import json_default
+
+logger = logging.getLogger(__name__)
+
+
+def parse_shard(spec: str) -> Tuple[int, int]:
+    """'2/4' -> (2, 4); shards are numbered 1..N"""
+    try:
+        index, count = (int(part) for part in spec.split('/'))
+    except ValueError:
+        raise ValueError(f"Shard must look like i/N, got {spec!r}")
+    if count < 1 or not 1 <= index <= count:
+        raise ValueError(f"Shard index must be between 1 and {count}, got {spec!r}")
+    return index, count
+
+
+def shard_of(stock_code: str, count: int) -> int:
+    """Shard (1..count) of a stock; CRC32 of the code, so every process and machine agrees"""
+    return zlib.crc32(stock_code.encode('utf-8')) % count + 1
+
+
+def select_shard(stock_codes: List[str], index: int, count: int) -> List[str]:
+    """The stocks of one shard, in their original order"""
+    return [code for code in stock_codes if shard_of(code, count) == index]
+
+
+class ShardStore:
+    """Partial results of sharded runs, and their merge.
+
+    Each sharded run gets its own subdirectory `<session>-of-<N>/`, keyed by
+    the latest closed session and the shard count, so results of an earlier
+    day or of a run with a different N never mix into a merge; writing a
+    shard removes the directories of earlier sessions. Shard i writes
+    `shard-i.indicators.csv` (latest indicators of its stocks),
+    `shard-i.closes.csv` (trailing closes of its alerted stocks, for
+    correlation grouping) and finally `shard-i.json` with its alerts and their
+    positions in the universe. The JSON is written last and atomically, so
+    its presence marks a complete shard; a merge refuses to run until all N
+    are there and they analyzed the same trade date.
+    """
+
+    def __init__(self, directory: str):
+        self.directory = Path(directory)
+
+    def run_dir(self, session: str, count: int) -> Path:
+        return self.directory / f"{session}-of-{count}"
+
+    def write(self, index: int, count: int, session: str, alerts: List[Dict], positions: Dict[str, int],
+              indicators: Optional[pd.DataFrame], closes: Optional[pd.DataFrame], meta: Optional[Dict] = None):
+        run_dir = self.run_dir(session, count)
+        run_dir.mkdir(parents=True, exist_ok=True)
+        self._remove_older_runs(session)
+        indicators = indicators if indicators is not None else pd.DataFrame()
+        indicators.to_csv(run_dir / f'shard-{index}.indicators.csv', index_label='ts_code')
+        closes = closes if closes is not None else pd.DataFrame()
+        closes.to_csv(run_dir / f'shard-{index}.closes.csv', index_label='trade_date')
+
+        record = dict(meta or {}, shard=index, count=count, finished=datetime.now().isoformat(timespec='seconds'),
+                      stocks=len(indicators), alerts=alerts, positions=positions)
+        path = run_dir / f'shard-{index}.json'
+        tmp = path.with_suffix('.json.tmp')
+        with open(tmp, 'w', encoding='utf-8') as f:
+            json.dump(record, f, ensure_ascii=False, default=json_default)
+        os.replace(tmp, path)
+        logger.info(f"Shard {index}/{count}: {len(alerts)} alerts for {len(indicators)} stocks written to {path}")
+
+    def _runs(self) -> List[Path]:
+        return [path for path in self.directory.glob('*-of-*') if path.is_dir()]
+
+    def _remove_older_runs(self, session: str):
+        for path in self._runs():
+            if path.name.split('-of-')[0] < session:
+                shutil.rmtree(path, ignore_errors=True)
+
+    def latest_run(self) -> Path:
+        """Directory of the newest session's run; with several shard counts, the one written last"""
+        runs = self._runs()
+        if not runs:
+            raise FileNotFoundError(f"No shard results in {self.directory}")
+        newest = max(path.name.split('-of-')[0] for path in runs)
+        runs = [path for path in runs if path.name.split('-of-')[0] == newest]
+        return max(runs, key=lambda path: max((f.stat().st_mtime for f in path.iterdir()), default=0))
+
+    def load(self, run_dir: Optional[Path] = None) -> Tuple[List[Dict], pd.DataFrame, pd.DataFrame, List[Dict]]:
+        """Merged (alerts in universe order, indicators, trailing closes, shard metadata) of one run"""
+        run_dir = Path(run_dir) if run_dir is not None else self.latest_run()
+        count = int(run_dir.name.split('-of-')[1])
+        records = []
+        for path in sorted(run_dir.glob('shard-*.json')):
+            with open(path, encoding='utf-8') as f:
+                records.append(json.load(f))
+        if not records:
+            raise FileNotFoundError(f"No shard results in {run_dir}")
+
+        missing = sorted(set(range(1, count + 1)) - {record['shard'] for record in records})
+        if missing:
+            raise ValueError(f"Missing shard results {missing} of {count} in {run_dir}")
+        sessions = {record.get('session') for record in records}
+        if len(sessions) > 1:
+            raise ValueError(f"Shards analyzed different sessions {sorted(map(str, sessions))} in {run_dir}; "
+                             f"re-run the shards before merging")
+
+        positions = {code: pos for record in records for code, pos in record['positions'].items()}
+        alerts = sorted((alert for record in records for alert in record['alerts']),
+                        key=lambda alert: positions.get(alert['stock_code'], len(positions)))
+
+        indicator_frames, close_frames = [], []
+        for record in records:
+            indicators = pd.read_csv(run_dir / f"shard-{record['shard']}.indicators.csv", index_col='ts_code')
+            if not indicators.empty:
+                indicators['trade_date'] = pd.to_datetime(indicators['trade_date'])
+                indicator_frames.append(indicators)
+            closes = pd.read_csv(run_dir / f"shard-{record['shard']}.closes.csv",
+                                 index_col='trade_date', parse_dates=['trade_date'])
+            if not closes.empty:
+                close_frames.append(closes)
+
+        indicators = pd.concat(indicator_frames) if indicator_frames else pd.DataFrame()
+        closes = pd.concat(close_frames, axis=1).sort_index() if close_frames else pd.DataFrame()
+        logger.info(f"Merged {count} shards from {run_dir.name}: {len(alerts)} alerts for {len(indicators)} stocks")
+        return alerts, indicators, closes, records
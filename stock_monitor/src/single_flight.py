@@ -0,0 +1,72 @@
+import asyncio
+import threading
+import logging
+from concurrent.futures import Future
+from typing import Any, Callable, Dict, Hashable
+
+logger = logging.getLogger(__name__)
+
+
+class SingleFlight:
+    """Coalesce identical in-flight calls so one execution serves every waiter.
+
+    The first caller for a key (the leader) runs the function; callers that
+    arrive with the same key while it is running wait for the leader's result
+    instead of calling again. Thread callers use `do`, asyncio callers use
+    `do_async`; both share one in-flight table, so a coroutine can piggyback
+    on a request started by a worker thread and vice versa. Exceptions are
+    propagated to every waiter and nothing is cached after completion.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._in_flight: Dict[Hashable, Future] = {}
+        self.stats = {'calls': 0, 'executions': 0, 'coalesced': 0}
+
+    def _join(self, key: Hashable):
+        """Return (future, is_leader) for key"""
+        with self._lock:
+            self.stats['calls'] += 1
+            future = self._in_flight.get(key)
+            if future is not None:
+                self.stats['coalesced'] += 1
+                return future, False
+            future = Future()
+            self._in_flight[key] = future
+            self.stats['executions'] += 1
+            return future, True
+
+    def _finish(self, key: Hashable, future: Future, fn: Callable[[], Any]):
+        try:
+            result = fn()
+        except BaseException as e:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            future.set_exception(e)
+        else:
+            with self._lock:
+                self._in_flight.pop(key, None)
+            future.set_result(result)
+
+    def do(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Run fn() for key, or wait for the identical call already running"""
+        future, is_leader = self._join(key)
+        if is_leader:
+            self._finish(key, future, fn)
+        else:
+            logger.debug(f"Coalesced request {key}")
+        return future.result()
+
+    async def do_async(self, key: Hashable, fn: Callable[[], Any]) -> Any:
+        """Async variant: the leader runs the blocking fn() in the default executor"""
+        future, is_leader = self._join(key)
+        if is_leader:
+            loop = asyncio.get_running_loop()
+            await loop.run_in_executor(None, self._finish, key, future, fn)
+        else:
+            logger.debug(f"Coalesced request {key}")
+        return await asyncio.wrap_future(future)
+
+    def in_flight(self) -> int:
+        with self._lock:
+            return len(self._in_flight)
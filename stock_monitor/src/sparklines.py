@@ -0,0 +1,184 @@
+import shutil
+import threading
+from pathlib import Path
+import logging
+from typing import Dict, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+MA_WINDOW = 100
+BB_WINDOW = 20
+
+
+def _rolling_sums(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Trailing-window count, sum and sum of squares along axis 1 (NaN counts as missing)"""
+    valid = np.isfinite(values)
+    filled = np.where(valid, values, 0.0)
+    zeros = np.zeros((len(values), 1))
+
+    def trailing(a):
+        c = np.concatenate([zeros, np.cumsum(a, axis=1)], axis=1)
+        out = np.full(values.shape, np.nan)
+        out[:, window - 1:] = c[:, window:] - c[:, :-window]
+        return out
+
+    return trailing(valid.astype(float)), trailing(filled), trailing(filled * filled)
+
+
+def rolling_mean_std(values: np.ndarray, window: int) -> Tuple[np.ndarray, np.ndarray]:
+    """Trailing mean and sample std of each row; NaN until `window` bars are in"""
+    count, total, squares = _rolling_sums(values, window)
+    full = count == window
+    mean = np.where(full, total / window, np.nan)
+    var = np.where(full, (squares - total * total / window) / (window - 1), np.nan)
+    return mean, np.sqrt(np.clip(var, 0, None))
+
+
+class SparklineRenderer:
+    """Small inline SVG charts of close, MA100 and Bollinger bands over the last `window` bars.
+
+    A batch of stocks is rendered at once: their closes are laid out as one
+    (stocks x bars) array, the moving averages and bands come from cumulative
+    sums along the bar axis and every chart is scaled in the same NumPy pass,
+    leaving only the SVG text per stock. Charts are cached in memory and in
+    `<cache_dir>/<trade_date>/<ts_code>.svg`, keyed by stock and latest bar,
+    so re-rendering a stock for another email or a later resend is free.
+    """
+
+    def __init__(self, cache_dir: Optional[str] = None, window: int = 60, width: int = 240, height: int = 60,
+                 keep_dates: int = 5):
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        self.window = window
+        self.width = width
+        self.height = height
+        self.keep_dates = keep_dates
+        self._cache: Dict[Tuple[str, str], str] = {}
+        self._lock = threading.Lock()
+        self.stats = {'rendered': 0, 'cached': 0}
+
+    def series(self, panel: pd.DataFrame, stock_codes: List[str]) -> Tuple[pd.Index, Dict[str, np.ndarray]]:
+        """Close, MA100 and Bollinger bands of the last `window` bars, one row per stock"""
+        history = self.window + MA_WINDOW - 1
+        rows = panel[panel['ts_code'].isin(stock_codes)].sort_values(['ts_code', 'trade_date'], kind='stable')
+        rows = rows.groupby('ts_code', sort=False).tail(history)
+        position, codes = pd.factorize(rows['ts_code'])
+
+        # Right-aligned by bar, so a short history or a suspension never misaligns stocks
+        closes = np.full((len(codes), history), np.nan)
+        from_end = rows.groupby('ts_code', sort=False).cumcount(ascending=False).to_numpy()
+        closes[position, history - 1 - from_end] = rows['close'].to_numpy(dtype=float)
+
+        ma100, _ = rolling_mean_std(closes, MA_WINDOW)
+        middle, std = rolling_mean_std(closes, BB_WINDOW)
+        tail = slice(history - self.window, history)
+        return codes, {'close': closes[:, tail], 'MA100': ma100[:, tail],
+                       'BB_Upper': (middle + 2 * std)[:, tail], 'BB_Lower': (middle - 2 * std)[:, tail]}
+
+    @staticmethod
+    def _points(xs: np.ndarray, ys: np.ndarray) -> str:
+        keep = np.isfinite(ys)
+        pairs = np.column_stack([xs[keep], ys[keep]]).ravel().tolist()
+        return ("%.1f,%.1f " * int(keep.sum()) % tuple(pairs)).rstrip()
+
+    def _svg(self, xs: np.ndarray, ys: Dict[str, np.ndarray]) -> str:
+        close, ma100, upper, lower = ys['close'], ys['MA100'], ys['BB_Upper'], ys['BB_Lower']
+        band = np.isfinite(upper) & np.isfinite(lower)
+        parts = [f'<svg xmlns="http://www.w3.org/2000/svg" width="{self.width}" height="{self.height}" '
+                 f'viewBox="0 0 {self.width} {self.height}" class="sparkline">']
+        if band.any():
+            outline = self._points(xs[band], upper[band]) + " " + self._points(xs[band][::-1], lower[band][::-1])
+            parts.append(f'<polygon points="{outline}" fill="#e3f2fd" stroke="#90caf9" stroke-width="0.5"/>')
+        if np.isfinite(ma100).any():
+            parts.append(f'<polyline points="{self._points(xs, ma100)}" fill="none" stroke="#ff9800" '
+                         f'stroke-width="1" stroke-dasharray="3,2"/>')
+        parts.append(f'<polyline points="{self._points(xs, close)}" fill="none" stroke="#d32f2f" stroke-width="1.5"/>')
+        last = np.flatnonzero(np.isfinite(close))
+        if len(last):
+            parts.append(f'<circle cx="{xs[last[-1]]:.1f}" cy="{close[last[-1]]:.1f}" r="2" fill="#d32f2f"/>')
+        parts.append('</svg>')
+        return "".join(parts)
+
+    def _render_batch(self, values: Dict[str, np.ndarray]) -> List[str]:
+        pad = 2.0
+        stacked = np.stack([values['close'], values['MA100'], values['BB_Upper'], values['BB_Lower']])
+        with np.errstate(all='ignore'):
+            lo = np.nanmin(stacked, axis=(0, 2))
+            hi = np.nanmax(stacked, axis=(0, 2))
+        span = np.where(hi > lo, hi - lo, 1.0)
+        # Every stock scaled to the chart height in one pass (flat series sit in the middle)
+        offset = np.where(hi > lo, 0.0, (self.height - 2 * pad) / 2)
+        scale = (self.height - 2 * pad) / span
+        ys = {name: self.height - pad - offset[:, None] - (arr - lo[:, None]) * scale[:, None]
+              for name, arr in values.items()}
+        xs = np.linspace(pad, self.width - pad, self.window)
+        return [self._svg(xs, {name: arr[i] for name, arr in ys.items()}) for i in range(len(lo))]
+
+    def _path(self, stock_code: str, trade_date: str) -> Optional[Path]:
+        return self.cache_dir / trade_date.replace('-', '') / f"{stock_code}.svg" if self.cache_dir else None
+
+    def cached(self, stock_code: str, trade_date: str) -> Optional[str]:
+        """The chart of a stock as of `trade_date` ('YYYY-MM-DD'), if it was rendered before"""
+        key = (stock_code, trade_date)
+        with self._lock:
+            if key in self._cache:
+                return self._cache[key]
+        path = self._path(stock_code, trade_date)
+        if path is None or not path.exists():
+            return None
+        svg = path.read_text(encoding='utf-8')
+        with self._lock:
+            self._cache[key] = svg
+        return svg
+
+    def render(self, panel: pd.DataFrame, stock_codes: List[str]) -> Dict[str, str]:
+        """Charts for the given stocks as of their latest bar in `panel`; only uncached ones are drawn"""
+        rows = panel[panel['ts_code'].isin(stock_codes)]
+        if rows.empty:
+            return {}
+        last_dates = rows.groupby('ts_code')['trade_date'].max().dt.strftime('%Y-%m-%d')
+
+        charts, missing = {}, []
+        for stock_code, trade_date in last_dates.items():
+            svg = self.cached(stock_code, trade_date)
+            if svg is None:
+                missing.append(stock_code)
+            else:
+                charts[stock_code] = svg
+        self.stats['cached'] += len(charts)
+
+        if missing:
+            codes, values = self.series(rows, missing)
+            for stock_code, svg in zip(codes, self._render_batch(values)):
+                trade_date = last_dates[stock_code]
+                charts[stock_code] = svg
+                with self._lock:
+                    self._cache[(stock_code, trade_date)] = svg
+                self._store(stock_code, trade_date, svg)
+            self.stats['rendered'] += len(missing)
+            if self.cache_dir is not None:
+                self._prune()
+            logger.info(f"Rendered {len(missing)} sparklines ({len(charts) - len(missing)} cached)")
+        return charts
+
+    def _store(self, stock_code: str, trade_date: str, svg: str):
+        path = self._path(stock_code, trade_date)
+        if path is None:
+            return
+        try:
+            path.parent.mkdir(parents=True, exist_ok=True)
+            tmp = path.with_suffix('.tmp')
+            tmp.write_text(svg, encoding='utf-8')
+            tmp.replace(path)
+        except OSError as e:
+            logger.warning(f"Could not cache sparkline for {stock_code}: {e}")
+
+    def _prune(self):
+        """Keep the charts of the latest `keep_dates` trade dates on disk"""
+        if not self.cache_dir.exists():
+            return
+        dates = sorted(p for p in self.cache_dir.iterdir() if p.is_dir())
+        for old in dates[:-self.keep_dates]:
+            shutil.rmtree(old, ignore_errors=True)
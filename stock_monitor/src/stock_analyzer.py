@@ -1,16 +1,104 @@
+import hashlib
 import pandas as pd
 import numpy as np
 from typing import Dict, List, Tuple, Optional
 from datetime import datetime
 import logging
 
+from timeframe_resampler import TimeframeResampler
+
 logger = logging.getLogger(__name__)
 
 
 class StockAnalyzer:
+    # Numeric per-stock state produced by latest_indicators()
+    INDICATOR_COLUMNS = ['close', 'MA100', 'MTR', 'BB_Middle', 'BB_Upper', 'BB_Lower', 'baseline_price']
+    # Per-industry aggregates produced by sector_summary()
+    SECTOR_COLUMNS = ['stocks', 'under_ma100', 'median_drawdown', 'alerts',
+                      'baseline_drop', 'mtr_drop', 'boll_drop']
+    ALERT_RULES = ['baseline_drop', 'mtr_drop', 'boll_drop']
+
     def __init__(self):
         self.ma_periods = [5, 10, 20]
         self.baseline_date = '2025-09-30'  # 9/30 baseline for 20% drop check
+        # Per-stock baseline_date / baseline_price overrides indexed by ts_code (None: 9/30 for all)
+        self.baselines: Optional[pd.DataFrame] = None
+        self.timeframes = TimeframeResampler()  # weekly/monthly bars derived from daily data
+
+    def rule_parameters(self) -> Dict:
+        """Everything besides the bars that decides a stock's alerts, for memoization"""
+        baselines = None
+        if self.baselines is not None:
+            baselines = hashlib.sha1(self.baselines.sort_index().to_csv().encode('utf-8')).hexdigest()
+        return {
+            'baseline_date': self.baseline_date,
+            'baselines': baselines,
+            'baseline_drop_pct': 20,
+            'ma_period': 100,
+            'mtr_period': 4,
+            'bb_period': 20,
+            'bb_std': 2,
+            'boll_drop_pct': 5,
+        }
+
+    @staticmethod
+    def build_panel(stock_data: Dict[str, pd.DataFrame]) -> pd.DataFrame:
+        """Stack per-stock daily frames into one long (ts_code, trade_date) panel"""
+        frames = [df.assign(ts_code=code) for code, df in stock_data.items() if df is not None and not df.empty]
+        if not frames:
+            return pd.DataFrame(columns=['ts_code', 'trade_date', 'open', 'high', 'low', 'close'])
+        return pd.concat(frames, ignore_index=True)
+
+    def set_baselines(self, baselines: Optional[pd.DataFrame]):
+        """Per-stock baselines: a frame indexed by ts_code with `baseline_date` and/or `baseline_price`.
+
+        A stock with a price uses it directly; one with only a date uses its
+        close on that date; stocks not listed keep the 9/30 baseline.
+        """
+        self.baselines = baselines if baselines is not None and not baselines.empty else None
+
+    def resolve_baselines(self, panel: pd.DataFrame) -> pd.DataFrame:
+        """Baseline date and close of every stock in the panel, in one pass over the date axis.
+
+        Each bar is compared with its own stock's baseline date and the last
+        close on or before it is taken, so a date that fell on a weekend or
+        holiday resolves to the preceding session. Stocks without a bar on or
+        before their date get NaN. A given baseline price is a raw price; on
+        an adjusted panel (with `price_scale`) it is rescaled by the factor
+        of the stock's baseline bar so it compares with the adjusted closes.
+        """
+        positions, codes = pd.factorize(panel['ts_code'])
+        codes = pd.Index(codes, name='ts_code')
+        baselines = pd.DataFrame(index=codes)
+        baselines['baseline_date'] = pd.Timestamp(self.baseline_date)
+        baselines['baseline_price'] = np.nan
+        if self.baselines is not None:
+            overrides = self.baselines.reindex(codes)
+            if 'baseline_date' in overrides:
+                baselines['baseline_date'] = pd.to_datetime(overrides['baseline_date']).fillna(
+                    baselines['baseline_date'])
+            if 'baseline_price' in overrides:
+                baselines['baseline_price'] = overrides['baseline_price']
+
+        # Each bar against its own stock's date, then the latest eligible bar per stock
+        eligible = panel['trade_date'].values <= baselines['baseline_date'].values[positions]
+        last_rows = panel.loc[eligible, ['ts_code', 'trade_date']].groupby('ts_code', sort=False)['trade_date'].idxmax()
+        closes = panel.loc[last_rows.values, 'close'].set_axis(last_rows.index)
+        if 'price_scale' in panel.columns:
+            scale = panel.loc[last_rows.values, 'price_scale'].set_axis(last_rows.index)
+            baselines['baseline_price'] = baselines['baseline_price'] * scale.reindex(codes).fillna(1.0)
+
+        baselines['baseline_price'] = baselines['baseline_price'].fillna(closes.reindex(codes))
+        baselines['baseline_date'] = baselines['baseline_date'].dt.strftime('%Y-%m-%d')
+        return baselines
+
+    def invalidate(self, stock_codes: List[str]):
+        """Drop cached indicator state for stocks whose price history changed"""
+        self.timeframes.invalidate(stock_codes)
+
+    def get_timeframe_value(self, stock_code: str, ref: str) -> Optional[float]:
+        """Look up a multi-timeframe value such as 'W:MA20' or 'M:close'"""
+        return self.timeframes.get_value(ref, stock_code)
     
     def calculate_moving_averages(self, df: pd.DataFrame) -> pd.DataFrame:
         df = df.copy()
@@ -45,27 +133,27 @@ class StockAnalyzer:
 
         return breaches
 
-    def check_baseline_drop(self, df: pd.DataFrame) -> Optional[Dict]:
-        """Check if current price dropped 20% from 9/30 baseline"""
+    def check_baseline_drop(self, df: pd.DataFrame, stock_code: Optional[str] = None) -> Optional[Dict]:
+        """Check if current price dropped 20% from the stock's baseline (9/30 unless overridden)"""
         if df.empty:
             return None
 
-        # Find 9/30 price
-        df['trade_date_str'] = df['trade_date'].dt.strftime('%Y-%m-%d')
-        baseline_row = df[df['trade_date_str'] == self.baseline_date]
+        if stock_code is None:
+            stock_code = df['ts_code'].iloc[0] if 'ts_code' in df.columns else ''
+        baseline = self.resolve_baselines(df.assign(ts_code=stock_code)).iloc[0]
 
-        if baseline_row.empty:
-            logger.debug(f"No data found for baseline date {self.baseline_date}")
+        if pd.isna(baseline['baseline_price']):
+            logger.debug(f"No data found for baseline date {baseline['baseline_date']}")
             return None
 
-        baseline_price = baseline_row.iloc[0]['close']
+        baseline_price = baseline['baseline_price']
         latest_price = df.iloc[-1]['close']
 
         drop_pct = ((latest_price - baseline_price) / baseline_price) * 100
 
         if drop_pct <= -20:
             return {
-                'baseline_date': self.baseline_date,
+                'baseline_date': baseline['baseline_date'],
                 'baseline_price': baseline_price,
                 'current_price': latest_price,
                 'drop_percentage': drop_pct
@@ -169,8 +257,11 @@ class StockAnalyzer:
             return None
 
         # Check only the 3 new alert conditions
-        baseline_drop = self.check_baseline_drop(df)
+        baseline_drop = self.check_baseline_drop(df, stock_code)
         mtr_drop = self.check_mtr_drop(df)
+        if mtr_drop:
+            # The rule approximates the 20-week MA with MA100; report the weekly one alongside
+            mtr_drop['weekly_ma20'] = self.get_timeframe_value(stock_code, 'W:MA20')
         boll_drop = self.check_boll_drop(df)
 
         # If no alerts triggered, return None
@@ -192,10 +283,222 @@ class StockAnalyzer:
     
     def analyze_multiple_stocks(self, stock_data: Dict[str, pd.DataFrame]) -> List[Dict]:
         alerts = []
+
+        panel = self.build_panel(stock_data)
+        if not panel.empty:
+            self.timeframes.refresh(panel)
         
         for stock_code, df in stock_data.items():
             analysis = self.analyze_stock(stock_code, df)
             if analysis:
                 alerts.append(analysis)
         
-        return alerts
\ No newline at end of file
+        return alerts
+
+    def latest_indicators(self, panel: pd.DataFrame) -> pd.DataFrame:
+        """Indicator values on each stock's latest bar, computed over the whole panel at once.
+
+        Returns one row per ts_code with the latest and previous close, MA100,
+        MTR, Bollinger bands, bar count and the baseline date and close.
+        """
+        panel = panel.sort_values(['ts_code', 'trade_date'], kind='stable', ignore_index=True)
+        bar_counts = panel.groupby('ts_code', sort=False)['close'].size()
+
+        # Only the trailing windows matter for the latest-bar rules
+        tail = panel.groupby('ts_code', sort=False).tail(101).reset_index(drop=True)
+
+        def rolling(column: pd.Series, window: int, func: str) -> pd.Series:
+            result = getattr(column.groupby(tail['ts_code'], sort=False).rolling(window), func)()
+            return result.reset_index(level=0, drop=True).sort_index()
+
+        tail['MA100'] = rolling(tail['close'], 100, 'mean')
+        prev_close = tail.groupby('ts_code', sort=False)['close'].shift(1)
+        tr = np.fmax(tail['high'] - tail['low'],
+                     np.fmax((tail['high'] - prev_close).abs(), (tail['low'] - prev_close).abs()))
+        tail['MTR'] = rolling(tr, 4, 'mean')
+        tail['BB_Middle'] = rolling(tail['close'], 20, 'mean')
+        bb_std = rolling(tail['close'], 20, 'std')
+        tail['BB_Upper'] = tail['BB_Middle'] + bb_std * 2
+        tail['BB_Lower'] = tail['BB_Middle'] - bb_std * 2
+
+        grouped = tail.groupby('ts_code', sort=False)
+        latest = grouped.tail(1).set_index('ts_code')
+        prev = grouped.nth(-2).set_index('ts_code').reindex(latest.index)
+
+        # Baseline close per stock, looked up once for the whole panel
+        baselines = self.resolve_baselines(panel).reindex(latest.index)
+        missing = baselines.index[baselines['baseline_price'].isna()]
+        if len(missing):
+            example = missing[0]
+            logger.warning(f"{len(missing)} stocks have no bar on or before their baseline date "
+                           f"(e.g. {example}: {baselines.loc[example, 'baseline_date']}), "
+                           f"skipping the baseline rule for them")
+
+        indicators = latest[['trade_date', 'close', 'MA100', 'MTR', 'BB_Middle', 'BB_Upper', 'BB_Lower']].copy()
+        indicators['prev_close'] = prev['close']
+        indicators['prev_BB_Upper'] = prev['BB_Upper']
+        indicators['bars'] = bar_counts.reindex(latest.index)
+        indicators['baseline_date'] = baselines['baseline_date']
+        indicators['baseline_price'] = baselines['baseline_price']
+        return indicators
+
+    def analyze_panel(self, panel: pd.DataFrame) -> List[Dict]:
+        """Batch path: evaluate all three alert rules over a long panel in one vectorized pass.
+
+        Produces the same alerts as `analyze_multiple_stocks`, but with group-wise
+        rolling windows instead of a per-stock loop, which matters for full-market runs.
+        """
+        if panel.empty:
+            return []
+
+        self.timeframes.refresh(panel)
+        alerts = self.evaluate_indicators(self.latest_indicators(panel))
+
+        logger.info(f"Batch analysis of {panel['ts_code'].nunique()} stocks found {len(alerts)} alerts")
+        return alerts
+
+    def evaluate_indicators(self, latest: pd.DataFrame) -> List[Dict]:
+        """Apply the three alert rules to the output of `latest_indicators`"""
+        counts = latest['bars']
+
+        baseline_price = latest['baseline_price']
+        baseline_drop = (latest['close'] - baseline_price) / baseline_price * 100
+        baseline_hit = baseline_drop <= -20
+
+        price_drop = latest['prev_close'] - latest['close']
+        mtr_hit = ((counts >= 100) & latest['MA100'].notna() & (latest['close'] >= latest['MA100'])
+                   & latest['prev_close'].notna() & latest['MTR'].notna() & (price_drop >= latest['MTR']))
+
+        boll_drop = (latest['close'] - latest['prev_close']) / latest['prev_close'] * 100
+        boll_hit = ((counts >= 21) & latest['prev_BB_Upper'].notna() & (latest['prev_close'] > latest['prev_BB_Upper'])
+                    & (boll_drop <= -5))
+
+        alerts = []
+        triggered = latest.index[baseline_hit | mtr_hit | boll_hit]
+        for stock_code in triggered:
+            row = latest.loc[stock_code]
+            alerts.append({
+                'stock_code': stock_code,
+                'close_price': row['close'],
+                'trade_date': row['trade_date'].strftime('%Y-%m-%d'),
+                'baseline_drop_alert': {
+                    'baseline_date': row['baseline_date'],
+                    'baseline_price': baseline_price[stock_code],
+                    'current_price': row['close'],
+                    'drop_percentage': baseline_drop[stock_code]
+                } if baseline_hit[stock_code] else None,
+                'mtr_drop_alert': {
+                    'ma100_value': row['MA100'],
+                    'current_price': row['close'],
+                    'previous_close': row['prev_close'],
+                    'price_drop': price_drop[stock_code],
+                    'mtr_value': row['MTR'],
+                    'weekly_ma20': self.get_timeframe_value(stock_code, 'W:MA20')
+                } if mtr_hit[stock_code] else None,
+                'boll_drop_alert': {
+                    'previous_close': row['prev_close'],
+                    'previous_bb_upper': row['prev_BB_Upper'],
+                    'current_close': row['close'],
+                    'current_bb_upper': row['BB_Upper'],
+                    'drop_percentage': boll_drop[stock_code]
+                } if boll_hit[stock_code] else None
+            })
+
+        return alerts
+
+    def sector_summary(self, latest: pd.DataFrame, industries: pd.Series, alerts: List[Dict]) -> pd.DataFrame:
+        """Per-industry breadth over the latest indicators, reduced in a single group-by.
+
+        Returns one row per industry with the number of stocks, the share
+        closing under MA100, the median % change from each stock's baseline
+        and the alert counts (total and per rule), worst sectors first.
+        Stocks without an industry are grouped as '未知'.
+        """
+        if latest is None or latest.empty:
+            return pd.DataFrame(columns=self.SECTOR_COLUMNS, index=pd.Index([], name='industry'))
+
+        flags = pd.DataFrame([{'ts_code': alert['stock_code'],
+                               **{rule: bool(alert.get(f'{rule}_alert')) for rule in self.ALERT_RULES}}
+                              for alert in alerts], columns=['ts_code'] + self.ALERT_RULES)
+        flags = flags.drop_duplicates('ts_code').set_index('ts_code').reindex(latest.index, fill_value=False)
+
+        stocks = pd.DataFrame({
+            'industry': industries.reindex(latest.index).fillna('未知') if industries is not None else '未知',
+            'under_ma100': (latest['close'] < latest['MA100']).astype(float).where(latest['MA100'].notna()),
+            'drawdown': (latest['close'] / latest['baseline_price'] - 1) * 100,
+            'alerted': flags.any(axis=1).astype(int),
+        }, index=latest.index)
+        stocks[self.ALERT_RULES] = flags.astype(int)
+
+        sectors = stocks.groupby('industry').agg(
+            stocks=('drawdown', 'size'),
+            under_ma100=('under_ma100', 'mean'),
+            median_drawdown=('drawdown', 'median'),
+            alerts=('alerted', 'sum'),
+            baseline_drop=('baseline_drop', 'sum'),
+            mtr_drop=('mtr_drop', 'sum'),
+            boll_drop=('boll_drop', 'sum'),
+        )
+        return sectors.sort_values(['alerts', 'under_ma100'], ascending=False, kind='stable')
+
+    @staticmethod
+    def trailing_closes(panel: pd.DataFrame, stock_codes: List[str], window: int = 60) -> pd.DataFrame:
+        """Last `window` + 1 closes of the given stocks as a (trade_date x ts_code) frame"""
+        rows = panel[panel['ts_code'].isin(stock_codes)]
+        if rows.empty:
+            return pd.DataFrame()
+        rows = rows.sort_values(['ts_code', 'trade_date'], kind='stable').groupby('ts_code').tail(window + 1)
+        return rows.pivot(index='trade_date', columns='ts_code', values='close')
+
+    @staticmethod
+    def return_correlation(closes: pd.DataFrame, min_overlap: int = 20) -> np.ndarray:
+        """Pairwise rank correlation of daily log returns, as one matrix product over all stocks.
+
+        Ranks keep a single shared crash day (the day the alerts fired) from
+        making every pair look correlated. Ranked returns are standardized per
+        stock with missing days (suspensions) zeroed out, so `Z.T @ Z` divided
+        by the pairwise overlap gives every correlation at once. Pairs sharing
+        fewer than `min_overlap` days get 0.
+        """
+        returns = np.log(closes).diff().iloc[1:].rank().to_numpy(dtype=float)
+        observed = np.isfinite(returns)
+        counts = observed.sum(axis=0)
+
+        mean = np.where(observed, returns, 0.0).sum(axis=0) / np.maximum(counts, 1)
+        centered = np.where(observed, returns - mean, 0.0)
+        std = np.sqrt((centered ** 2).sum(axis=0) / np.maximum(counts - 1, 1))
+        z = np.divide(centered, std, out=np.zeros_like(centered), where=std > 0)
+
+        present = observed.astype(float)
+        overlap = present.T @ present
+        corr = (z.T @ z) / np.maximum(overlap - 1, 1)
+        corr[overlap < min_overlap] = 0.0
+        np.fill_diagonal(corr, 1.0)
+        return np.clip(corr, -1.0, 1.0)
+
+    def cluster_alerts(self, closes: pd.DataFrame, threshold: float = 0.6) -> List[List[str]]:
+        """Group stocks whose trailing returns move together, largest group first.
+
+        The most connected stock not yet assigned leads a cluster and takes
+        every unassigned stock correlated with it at `threshold` or more,
+        so each member tracks its leader closely. Stocks with no partner end
+        up as single-stock clusters at the end.
+        """
+        if closes.empty:
+            return []
+        codes = np.asarray(closes.columns)
+        corr = self.return_correlation(closes)
+
+        linked = corr >= threshold
+        unassigned = np.ones(len(codes), dtype=bool)
+        clusters = []
+        for leader in np.argsort(-linked.sum(axis=1), kind='stable'):
+            if not unassigned[leader]:
+                continue
+            members = np.flatnonzero(unassigned & linked[leader])
+            members = members[np.argsort(-corr[leader, members], kind='stable')]
+            unassigned[members] = False
+            clusters.append(codes[members].tolist())
+
+        clusters.sort(key=len, reverse=True)
+        return clusters
@@ -1,30 +1,37 @@
 import logging
+import os
 import sys
-from datetime import datetime
-import schedule
 import time
+from datetime import datetime, timedelta
 from pathlib import Path
 
 from config_manager import ConfigManager
-from stock_reader import StockReader
-from tushare_client import TushareClient
-from stock_analyzer import StockAnalyzer
-from email_notifier import EmailNotifier
-
-log_dir = Path(__file__).parent.parent / 'logs'
-log_dir.mkdir(exist_ok=True)
-
-logging.basicConfig(
-    level=logging.INFO,
-    format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
-    handlers=[
-        logging.FileHandler(log_dir / f'stock_monitor_{datetime.now().strftime("%Y%m%d")}.log'),
-        logging.StreamHandler(sys.stdout)
-    ]
-)
+
+# Heavy dependencies (tushare, pandas, numpy, schedule, smtplib) are imported
+# lazily by the components that need them, so a subcommand such as
+# --test-email only pays for what it uses.
 
 logger = logging.getLogger(__name__)
 
+# Calendar days of daily bars a run needs at least: about 165 sessions, enough for MA100 over all
+# 60 bars of an alert's sparkline (and the 20-week MA); more when a baseline date is older
+HISTORY_DAYS = 250
+
+
+def setup_logging():
+    """Configure file and console logging (called from main, not at import)"""
+    log_dir = Path(os.environ.get('STOCK_MONITOR_LOG_DIR') or Path(__file__).parent.parent / 'logs')
+    log_dir.mkdir(parents=True, exist_ok=True)
+
+    logging.basicConfig(
+        level=logging.INFO,
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s',
+        handlers=[
+            logging.FileHandler(log_dir / f'stock_monitor_{datetime.now().strftime("%Y%m%d")}.log'),
+            logging.StreamHandler(sys.stdout)
+        ]
+    )
+
 
 class StockMonitor:
     def __init__(self, config_path: str = None):
@@ -32,63 +39,790 @@ class StockMonitor:
         
         try:
             self.config = ConfigManager(config_path)
+
+            # Components are created on first use
+            self._stock_reader = None
+            self._tushare_client = None
+            self._analyzer = None
+            self._email_notifier = None
+            self._notifier = None
+            self._outbox_sender = None
+            self._sparklines = None
+            self._price_adjuster = None
+            self._daily_bar_cache = None
+            self._universe_loader = None
+            self._watchlist_set = None
+            self._snapshot = None
+            self._journal = None
+            # Alerts sent per run scope and the latest closed session, set at the start of each run
+            self._sent_alerts = None
+            self._session = None
+            # Trailing closes of alerted stocks from the streaming pipeline
+            self._alert_closes = []
+            # (index, count) while running one shard of the universe, and the universe order of its stocks
+            self._shard = None
+            self._universe_positions = {}
+
+            # Adjusted daily panel, per-stock latest indicators and industry roll-up from the most recent run
+            self.panel = None
+            self.indicators = None
+            self.sectors = None
+            
+            logger.info("Stock Monitor initialized successfully")
             
-            self.stock_reader = StockReader(self.config.stock_list_path)
-            self.tushare_client = TushareClient(self.config.tushare_api_key)
-            self.analyzer = StockAnalyzer()
-            self.email_notifier = EmailNotifier(
+        except Exception as e:
+            logger.error(f"Failed to initialize Stock Monitor: {e}")
+            raise
+
+    @property
+    def stock_reader(self):
+        if self._stock_reader is None:
+            from stock_reader import StockReader
+            self._stock_reader = StockReader(self.config.stock_list_path)
+        return self._stock_reader
+
+    @property
+    def watchlist_set(self):
+        if self._watchlist_set is None:
+            from watchlists import WatchlistSet
+            self._watchlist_set = WatchlistSet(self.config.watchlists)
+        return self._watchlist_set
+
+    @property
+    def tushare_client(self):
+        if self._tushare_client is None:
+            from quota_ledger import QuotaLedger
+            from tushare_client import TushareClient
+            quota = self.config.quota_config
+            self._tushare_client = TushareClient(
+                self.config.tushare_api_key,
+                transport=self.config.tushare_transport,
+                api_url=self.config.tushare_api_url,
+                quota=QuotaLedger(self.config.tushare_api_key, quota['ledger_path'],
+                                  quota['per_minute'], quota['per_day'], quota['max_wait'])
+            )
+        return self._tushare_client
+
+    @property
+    def analyzer(self):
+        if self._analyzer is None:
+            from stock_analyzer import StockAnalyzer
+            self._analyzer = StockAnalyzer()
+        return self._analyzer
+
+    @property
+    def price_adjuster(self):
+        if self._price_adjuster is None:
+            from price_adjuster import PriceAdjuster
+            self._price_adjuster = PriceAdjuster(self.tushare_client, self.config.cache_dir)
+        return self._price_adjuster
+
+    @property
+    def daily_bar_cache(self):
+        if self._daily_bar_cache is None:
+            from daily_bar_cache import DailyBarCache
+            self._daily_bar_cache = DailyBarCache(self.tushare_client, self.config.cache_dir)
+        return self._daily_bar_cache
+
+    @property
+    def universe_loader(self):
+        if self._universe_loader is None:
+            from universe_loader import UniverseLoader
+            self._universe_loader = UniverseLoader(self.tushare_client, self.config.cache_dir)
+        return self._universe_loader
+
+    @property
+    def email_notifier(self):
+        if self._email_notifier is None:
+            from email_notifier import EmailNotifier
+            self._email_notifier = EmailNotifier(
                 smtp_server=self.config.smtp_server,
                 smtp_port=self.config.smtp_port,
                 from_email=self.config.from_email,
                 password=self.config.email_password,
                 receivers=self.config.receivers,
-                use_tls=self.config.use_tls
+                use_tls=self.config.use_tls,
+                timeout=self.config.email_timeout
             )
-            
-            logger.info("Stock Monitor initialized successfully")
-            
-        except Exception as e:
-            logger.error(f"Failed to initialize Stock Monitor: {e}")
-            raise
+        return self._email_notifier
+
+    @property
+    def notifier(self):
+        """Sends each alert message to every configured channel concurrently"""
+        if self._notifier is None:
+            from notification_dispatcher import NotificationDispatcher
+            email = self.email_notifier if any(
+                spec['type'] == 'email' for spec in self.config.notification_channels) else None
+            self._notifier = NotificationDispatcher.from_config(self.config.notification_channels, email)
+        return self._notifier
+
+    @property
+    def outbox_sender(self):
+        """Alert messages are committed to a durable outbox and delivered in the background"""
+        if self._outbox_sender is None:
+            from notification_outbox import NotificationOutbox, OutboxSender
+            outbox = NotificationOutbox(self.config.outbox_config['path'],
+                                        max_attempts=self.config.outbox_config['max_attempts'])
+            self._outbox_sender = OutboxSender(outbox, self.notifier)
+        return self._outbox_sender
+
+    @property
+    def sparklines(self):
+        if self._sparklines is None:
+            from sparklines import SparklineRenderer
+            self._sparklines = SparklineRenderer(Path(self.config.cache_dir) / 'sparklines')
+        return self._sparklines
+
+    def wait_for_notifications(self, timeout: float = None) -> bool:
+        """Block until the background sender has made its delivery attempts"""
+        if self._outbox_sender is None:
+            return True
+        return self._outbox_sender.join(timeout)
     
-    def run_analysis(self):
+    def run_analysis(self, universe: str = 'watchlist', exchange: str = None, board: str = None,
+                     notify: bool = True, resume: bool = False, deadline: str = None):
         logger.info(f"Starting stock analysis at {datetime.now()}")
+        self.panel = None
+        self.indicators = None
+        self.sectors = None
+        self._journal = None
+        self._alert_closes = []
         
         try:
-            stock_codes = self.stock_reader.read_stock_codes()
-            logger.info(f"Monitoring {len(stock_codes)} stocks")
+            from sent_alerts import SentAlerts, alert_key
+            self._sent_alerts = SentAlerts(Path(self.config.cache_dir) / 'sent_alerts.json')
+            self._session = self.tushare_client.get_latest_closed_session(refresh=True)
 
-            # Fetch 150 days to ensure we have enough data for 20-week MA and baseline date
-            stock_data = self.tushare_client.get_multiple_stocks_data(stock_codes, days=150)
-            logger.info(f"Retrieved data for {len(stock_data)} stocks")
-            
-            alerts = self.analyzer.analyze_multiple_stocks(stock_data)
+            if notify:
+                self._resend_pending()
 
-            if alerts:
-                logger.warning(f"Found {len(alerts)} stocks with alerts")
-                success = self.email_notifier.send_alert(alerts)
-                if success:
-                    logger.info("Alert email sent successfully")
-                else:
-                    logger.error("Failed to send alert email")
+            if universe == 'all':
+                if deadline or self.config.deadline:
+                    logger.warning("Deadline applies to watchlist runs only, ignoring it")
+                alerts = self._analyze_market(exchange, board)
+            else:
+                deadline_at = self._deadline_timestamp(deadline or self.config.deadline)
+                on_partial = self._send_partial_alerts if notify else None
+                alerts = self._analyze_watchlist(resume, deadline_at, on_partial)
+
+            self.sectors = self._summarize_sectors(alerts, universe)
+
+            # A shard's results are exported once, by the merge
+            if self.config.export_dir and self._shard is None:
+                self._export_results(alerts)
+
+            # Alerts already sent for the same bar (by an earlier run of this session, a partial
+            # email, or before an interruption) are not sent again, in every mode
+            scope = self._alert_scope(universe, exchange, board)
+            unsent = self._sent_alerts.unsent(scope, self._session_key(), alerts)
+            if self._journal is not None:
+                unsent = [alert for alert in unsent if alert_key(alert) not in self._journal.notified]
+
+            if alerts and not notify:
+                logger.info(f"Found {len(alerts)} stocks with alerts (notification skipped)")
+            elif alerts and not unsent:
+                logger.info(f"Alerts for {len(alerts)} stocks were already sent")
+            elif alerts:
+                logger.warning(f"Found {len(alerts)} stocks with alerts ({len(unsent)} not sent yet)")
+                label = "补充结果" if len(unsent) < len(alerts) else None
+                self._send_alerts(self._cluster_alerts(unsent), universe, label=label)
+                self._record_sent(scope, unsent)
             else:
                 logger.info("No alerts detected")
+
+            if self._journal is not None:
+                if self._journal.failed:
+                    # Left unfinished so --resume fetches them again
+                    logger.warning(f"Fetching failed for {len(self._journal.failed)} stocks, "
+                                   f"run again with --resume to retry them")
+                else:
+                    self._journal.finish()
+                self._journal = None
             
+            if self._tushare_client is not None:
+                logger.info(f"API usage: {self._tushare_client.metrics}")
+
             logger.info("Analysis completed successfully")
+            return alerts
             
         except Exception as e:
             logger.error(f"Error during analysis: {e}")
             raise
     
+    def _send_alerts(self, alerts, universe: str, label: str = None, note: str = None):
+        """One message per watchlist with its own stocks, rules and receivers, queued in the outbox"""
+        if universe == 'all':
+            batches = [(None, None, alerts)]
+        else:
+            routed = self.watchlist_set.route(alerts)
+            named = self.watchlist_set.names != ['default']
+            batches = [(name if named else None, self.watchlist_set.receivers(name), routed[name])
+                       for name in self.watchlist_set.names if routed[name]]
+
+        from notification_dispatcher import build_message
+
+        for name, receivers, list_alerts in batches:
+            list_alerts = self._with_sparklines(list_alerts)
+            message = build_message(list_alerts, receivers=receivers, watchlist_name=name,
+                                    label=label, note=note, sectors=self.sectors)
+            message_id = self.outbox_sender.submit(message)
+            list_tag = f" for watchlist {name}" if name else ""
+            logger.info(f"Alerts queued as outbox message {message_id}{list_tag}")
+
+    def _with_sparklines(self, alerts):
+        """Copies of the alerts carrying their cached chart (rendered while the bars were in memory)"""
+        return [dict(alert, sparkline=alert.get('sparkline')
+                     or self.sparklines.cached(alert['stock_code'], alert['trade_date']))
+                for alert in alerts]
+
+    def _resend_pending(self):
+        """Start delivering messages an earlier run could not send"""
+        import os
+
+        if not os.path.exists(self.config.outbox_config['path']):
+            return
+        pending = self.outbox_sender.outbox.pending()
+        if pending:
+            logger.info(f"Re-sending undelivered messages from earlier runs: {pending}")
+            self.outbox_sender.wake()
+
+    def _summarize_sectors(self, alerts, universe: str):
+        """Industry roll-up of the run (share under MA100, median drawdown, alert counts)"""
+        latest = self.latest_indicators()
+        if latest is None or latest.empty:
+            return None
+        try:
+            if universe == 'all':
+                industries = self.universe_loader.industries()
+            else:
+                industries = self.watchlist_set.load_info().get('industry')
+        except Exception as e:
+            logger.warning(f"Industry data unavailable, skipping sector summary: {e}")
+            return None
+        if industries is None:
+            return None
+        return self.analyzer.sector_summary(latest, industries, alerts)
+
+    def _cluster_alerts(self, alerts):
+        """Alerts grouped by trailing return correlation; each gets its `cluster` number (None if alone)"""
+        if len(alerts) < 2:
+            return alerts
+        codes = [alert['stock_code'] for alert in alerts]
+        clusters = self.analyzer.cluster_alerts(self._alert_close_frame(codes))
+        rank, cluster_of = {}, {}
+        numbered = 0
+        for members in clusters:
+            if len(members) > 1:
+                numbered += 1
+            for code in members:
+                rank[code] = len(rank)
+                cluster_of[code] = numbered if len(members) > 1 else None
+        logger.info(f"{len(alerts)} alerts form {numbered} correlated groups")
+
+        # Stocks without return history (e.g. restored from the memo) keep their order at the end
+        ordered = sorted(range(len(alerts)), key=lambda i: (rank.get(codes[i], len(rank)), i))
+        return [dict(alerts[i], cluster=cluster_of.get(codes[i])) for i in ordered]
+
+    def _alert_close_frame(self, stock_codes):
+        """Trailing closes of the given alerted stocks as a (trade_date x ts_code) frame"""
+        import pandas as pd
+
+        if self.panel is not None and not self.panel.empty:
+            return self.analyzer.trailing_closes(self.panel, stock_codes)
+        frames = [df for df in self._alert_closes if not df.empty]
+        if not frames:
+            return pd.DataFrame()
+        closes = pd.concat(frames, axis=1).sort_index()
+        closes = closes.loc[:, ~closes.columns.duplicated()]
+        wanted = set(stock_codes)
+        return closes[[code for code in closes.columns if code in wanted]]
+
+    def _send_partial_alerts(self, alerts, done: int, total: int, quota_exceeded: bool = False):
+        """Alerts found before the deadline (or before the API quota ran out), labelled as partial"""
+        if not alerts:
+            logger.info(f"Stopped early after {done}/{total} stocks, no alerts so far")
+            return
+        alerts = self._cluster_alerts(alerts)
+        if quota_exceeded:
+            note = (f"接口配额已用完，本邮件仅包含已分析的 {done}/{total} 只股票的警报。"
+                    f"配额恢复后用 --resume 继续，新的警报将以补充邮件发送。")
+        else:
+            note = (f"截止时间已到，本邮件仅包含已分析的 {done}/{total} 只股票的警报。"
+                    f"其余股票分析完成后，新的警报将以补充邮件发送。")
+        self._send_alerts(alerts, 'watchlist', label=f"部分结果 {done}/{total}", note=note)
+        self._record_sent('watchlist', alerts)
+
+    @staticmethod
+    def _alert_scope(universe: str, exchange: str = None, board: str = None) -> str:
+        """Which stocks a run covers, for telling its sent alerts apart from other kinds of run"""
+        if universe == 'all':
+            return f"all:{exchange or '*'}:{board or '*'}"
+        return universe
+
+    def _session_key(self) -> str:
+        """Latest closed session of this run, or today's date when the trade calendar is unavailable"""
+        return self._session or datetime.now().strftime('%Y%m%d')
+
+    def _record_sent(self, scope: str, alerts):
+        from sent_alerts import alert_key
+
+        self._sent_alerts.add(scope, self._session_key(), alerts)
+        if self._journal is not None:
+            self._journal.record_notified([alert_key(alert) for alert in alerts])
+
+    @staticmethod
+    def _deadline_timestamp(deadline: str):
+        """Epoch seconds of today's 'HH:MM' deadline; None if unset or already past"""
+        if not deadline:
+            return None
+        hour, minute = (int(part) for part in deadline.split(':'))
+        deadline_at = datetime.now().replace(hour=hour, minute=minute, second=0, microsecond=0).timestamp()
+        if deadline_at <= time.time():
+            logger.warning(f"Deadline {deadline} already passed, running without one")
+            return None
+        return deadline_at
+
+    def _analyze_watchlist(self, resume: bool = False, deadline: float = None, on_partial=None):
+        # Overlapping watchlists are fetched and analyzed once
+        stock_codes = self._select_shard(self.watchlist_set.load())
+        logger.info(f"Monitoring {len(stock_codes)} stocks")
+        self._apply_baselines()
+
+        if not self.config.snapshot_path:
+            return self._analyze_streaming(stock_codes, resume, deadline, on_partial)
+        if resume or deadline is not None:
+            logger.warning("Snapshot runs analyze every stock in one pass, ignoring --resume and the deadline")
+
+        days = self._history_days(self._baseline_dates(stock_codes).min()) if stock_codes else HISTORY_DAYS
+        panel = self._load_snapshot_panel(self._window_trade_dates(days), stock_codes)
+        stock_data = {code: df.reset_index(drop=True) for code, df in panel.groupby('ts_code', sort=False)}
+        logger.info(f"Retrieved data for {len(stock_data)} stocks")
+
+        # Adjust for splits/dividends so corporate actions do not look like drops
+        adjustment = self.config.price_adjustment
+        if adjustment != 'none':
+            stock_data, changed = self.price_adjuster.adjust_stock_data(stock_data, adjustment)
+            if changed:
+                self.analyzer.invalidate(changed)
+
+        alerts = self.analyzer.analyze_multiple_stocks(stock_data)
+        self.panel = self.analyzer.build_panel(stock_data)
+        self.sparklines.render(self.panel, [alert['stock_code'] for alert in alerts])
+        if self._snapshot is not None:
+            self._save_indicator_state()
+        return alerts
+
+    def _apply_baselines(self):
+        """Per-stock baselines from the watchlist CSV (自选时间/自选价格) when configured"""
+        source = self.config.baseline_source
+        columns = {'watch_date': 'baseline_date'}
+        if source == 'watch_price':
+            columns['watch_price'] = 'baseline_price'
+        elif source != 'watch_date':
+            self.analyzer.set_baselines(None)
+            return
+
+        info = self.watchlist_set.load_info()
+        columns = {column: name for column, name in columns.items() if column in info.columns}
+        if not columns:
+            logger.warning(f"Watchlist has no 自选时间/自选价格 columns, using the {self.analyzer.baseline_date} baseline")
+            self.analyzer.set_baselines(None)
+            return
+
+        baselines = info[list(columns)].rename(columns=columns)
+        self.analyzer.set_baselines(baselines)
+        logger.info(f"Per-stock baselines ({source}) for {int(baselines.notna().any(axis=1).sum())} stocks")
+
+    def _analyze_streaming(self, stock_codes, resume: bool = False, deadline: float = None, on_partial=None):
+        """Per-stock fetch where each stock is analyzed as soon as its data arrives.
+
+        Progress is checkpointed to a journal so an interrupted run can be
+        continued with --resume without refetching or re-analyzing. Results
+        are memoized per stock, so stocks whose bars did not change (or that
+        already include the latest closed session) are not analyzed again.
+        With a deadline, stocks closest to triggering go first; whatever is
+        done when it passes is handed to `on_partial` and the rest is finished.
+        """
+        import pandas as pd
+        from analysis_memo import AnalysisMemo
+        from analysis_pipeline import AnalysisPipeline
+        from quota_ledger import QuotaExceeded
+        from run_journal import RunJournal
+
+        client = self.tushare_client
+        adjustment = self.config.price_adjustment
+        session = self._session
+
+        journal = RunJournal(self._state_dir() / 'run_journal.jsonl')
+        journal.start(stock_codes, resume, session)
+        self._journal = journal
+
+        memo = AnalysisMemo(self._state_dir() / 'analysis_memo.json',
+                            dict(self.analyzer.rule_parameters(), price_adjustment=adjustment))
+        # Stocks whose stored bars already include the session need no request at all
+        reused = memo.complete([code for code in stock_codes if code not in journal.analyzed], session)
+        fingerprints = {}
+        # Enough history for the indicators and each stock's own baseline date
+        history_days = {code: self._history_days(date) for code, date in self._baseline_dates(stock_codes).items()}
+
+        def fetch(stock_code):
+            df = journal.load_fetched(stock_code)
+            fetched = df is None
+            if fetched:
+                df = client.get_stock_data(stock_code, days=history_days[stock_code])
+            if df is None or df.empty:
+                return None
+
+            fingerprints[stock_code] = memo.fingerprint(df)
+            if memo.matches(stock_code, fingerprints[stock_code][0]):
+                # Same bars and rules as last time: reuse that result
+                reused.append(stock_code)
+                return None
+            if fetched:
+                journal.record_fetched(stock_code, df)
+            return df
+
+        def adjust(chunk):
+            # Adjust for splits/dividends so corporate actions do not look like drops
+            adjusted, changed = self.price_adjuster.adjust_stock_data(chunk, adjustment)
+            if changed:
+                self.analyzer.invalidate(changed)
+            return adjusted
+
+        def on_chunk(codes, chunk_alerts, latest):
+            journal.record_analyzed(codes, chunk_alerts, latest)
+            memo.store(codes, chunk_alerts, latest, fingerprints)
+
+        def merged(alerts, frames):
+            # Combine fresh results with memoized ones and those from before an interruption
+            memo_alerts, memo_latest = memo.results(reused)
+            order = {code: i for i, code in enumerate(stock_codes)}
+            alerts = sorted(journal.alerts + memo_alerts + alerts,
+                            key=lambda alert: order.get(alert['stock_code'], len(order)))
+            frames = [df for df in [journal.restored_indicators(), memo_latest] + frames if not df.empty]
+            return alerts, pd.concat(frames) if frames else pd.DataFrame()
+
+        pipeline = AnalysisPipeline(
+            fetch,
+            self.analyzer,
+            adjust if adjustment != 'none' else None,
+            on_chunk=on_chunk,
+            on_failed=journal.record_failed,
+            sparklines=self.sparklines,
+            **self.config.pipeline_config
+        )
+        self._alert_closes = pipeline.alert_closes
+        skipped = journal.analyzed | set(reused)
+        remaining = [code for code in stock_codes if code not in skipped]
+        if deadline is not None:
+            from symbol_priority import prioritize
+            remaining = prioritize(remaining, self._previous_indicators(), self.watchlist_set.load_info())
+
+        def stop_for_quota(partial_alerts):
+            # Send what is known now; the journal stays open so --resume picks up the rest
+            memo.save()
+            done = len(stock_codes) - len(pipeline.unfinished)
+            if on_partial is not None:
+                on_partial(partial_alerts, done, len(stock_codes), quota_exceeded=True)
+            raise QuotaExceeded(f"{pipeline.quota_exceeded}; {len(pipeline.unfinished)} stocks left, "
+                                f"run again with --resume once the quota resets")
+
+        alerts, latest = pipeline.run(remaining, deadline)
+        frames = [latest]
+
+        if pipeline.quota_exceeded is not None:
+            stop_for_quota(merged(alerts, frames)[0])
+
+        if pipeline.unfinished:
+            # Send what is known now, then finish the rest for a follow-up email
+            done = len(stock_codes) - len(pipeline.unfinished)
+            logger.warning(f"Deadline reached with {len(pipeline.unfinished)} stocks left")
+            if on_partial is not None:
+                on_partial(merged(alerts, frames)[0], done, len(stock_codes))
+            rest_alerts, rest_latest = pipeline.run(pipeline.unfinished)
+            if pipeline.quota_exceeded is not None:
+                # The deadline email already covered the earlier alerts
+                stop_for_quota(rest_alerts)
+            alerts = alerts + rest_alerts
+            frames.append(rest_latest)
+
+        memo.save()
+        logger.info(f"Analysis memo: {memo.stats['session_hits']} stocks final for session {session}, "
+                    f"{memo.stats['fingerprint_hits']} unchanged, {memo.stats['misses']} analyzed")
+
+        alerts, self.indicators = merged(alerts, frames)
+        self._remember_indicators()
+        return alerts
+
+    def _state_dir(self) -> Path:
+        """Where the run journal, analysis memo and saved indicators live; each shard keeps its own"""
+        if self._shard is None:
+            return Path(self.config.cache_dir)
+        index, count = self._shard
+        return Path(self.config.cache_dir) / 'shard_state' / f'shard-{index}-of-{count}'
+
+    def _select_shard(self, stock_codes):
+        """The stocks of the shard being run (all of them outside a sharded run)"""
+        if self._shard is None:
+            return stock_codes
+        from sharding import select_shard
+
+        index, count = self._shard
+        selected = select_shard(stock_codes, index, count)
+        self._universe_positions = {code: i for i, code in enumerate(stock_codes)}
+        logger.info(f"Shard {index}/{count}: {len(selected)} of {len(stock_codes)} stocks")
+        return selected
+
+    def run_shard(self, index: int, count: int, universe: str = 'watchlist', exchange: str = None,
+                  board: str = None, shard_dir: str = None):
+        """Analyze shard `index` of `count` (by hash of ts_code) and write its partial results for merge_shards"""
+        from sharding import ShardStore
+
+        self._shard = (index, count)
+        try:
+            alerts = self.run_analysis(universe, exchange, board, notify=False)
+            codes = [alert['stock_code'] for alert in alerts]
+            latest = self.latest_indicators()
+            session = (latest['trade_date'].max().strftime('%Y%m%d')
+                       if latest is not None and not latest.empty else None)
+            ShardStore(shard_dir or self.config.shard_dir).write(
+                index, count, self._session_key(),
+                alerts=self._with_sparklines(alerts),
+                positions={code: self._universe_positions.get(code) for code in codes},
+                indicators=latest,
+                closes=self._alert_close_frame(codes),
+                meta={'universe': universe, 'exchange': exchange, 'board': board, 'session': session})
+        finally:
+            self._shard = None
+        return alerts
+
+    def merge_shards(self, shard_dir: str = None, notify: bool = True):
+        """Combine every shard's results of the latest run into one email and one export"""
+        from sent_alerts import SentAlerts
+        from sharding import ShardStore
+
+        store = ShardStore(shard_dir or self.config.shard_dir)
+        run_dir = store.latest_run()
+        alerts, indicators, closes, records = store.load(run_dir)
+        universe = records[0].get('universe', 'watchlist')
+        if universe == 'watchlist':
+            self.watchlist_set.load()  # routing needs each list's members
+        self.panel = None
+        self.indicators = indicators
+        self._alert_closes = [closes]
+        self._journal = None
+
+        if notify:
+            self._resend_pending()
+        self.sectors = self._summarize_sectors(alerts, universe)
+        if self.config.export_dir:
+            self._export_results(alerts)
+
+        # A repeated --merge (or an unsharded run of the same session) does not send them again
+        self._sent_alerts = SentAlerts(Path(self.config.cache_dir) / 'sent_alerts.json')
+        self._session = run_dir.name.split('-of-')[0]
+        scope = self._alert_scope(universe, records[0].get('exchange'), records[0].get('board'))
+        unsent = self._sent_alerts.unsent(scope, self._session, alerts)
+
+        if alerts and notify and not unsent:
+            logger.info(f"Alerts for {len(alerts)} stocks were already sent")
+        elif alerts and notify:
+            logger.warning(f"Found {len(alerts)} stocks with alerts across {len(records)} shards "
+                           f"({len(unsent)} not sent yet)")
+            label = "补充结果" if len(unsent) < len(alerts) else None
+            self._send_alerts(self._cluster_alerts(unsent), universe, label=label)
+            self._record_sent(scope, unsent)
+        elif not alerts:
+            logger.info("No alerts detected")
+        return alerts
+
+    def _previous_indicators(self):
+        """Indicators saved by the last watchlist run, used to order the next one"""
+        import pandas as pd
+
+        path = self._state_dir() / 'indicators_latest.csv'
+        if not path.exists():
+            return None
+        return pd.read_csv(path, index_col='ts_code', parse_dates=['trade_date'])
+
+    def _remember_indicators(self):
+        """Merge this run's indicators into the saved ones (newest row per stock wins)"""
+        import pandas as pd
+
+        if self.indicators is None or self.indicators.empty:
+            return
+        previous = self._previous_indicators()
+        merged = self.indicators if previous is None else pd.concat([previous, self.indicators])
+        merged = merged[~merged.index.duplicated(keep='last')]
+        self._state_dir().mkdir(parents=True, exist_ok=True)
+        merged.to_csv(self._state_dir() / 'indicators_latest.csv', index_label='ts_code')
+
+    def latest_indicators(self):
+        """Per-stock indicators on the latest bar from the most recent run"""
+        if self.indicators is None and self.panel is not None and not self.panel.empty:
+            self.indicators = self.analyzer.latest_indicators(self.panel)
+        return self.indicators
+
+    def _analyze_market(self, exchange: str = None, board: str = None):
+        """Full-market scan: one request per trade date instead of one per stock"""
+        stock_codes = self._select_shard(self.universe_loader.load(exchange, board))
+        logger.info(f"Monitoring {len(stock_codes)} stocks (full market)")
+        self.analyzer.set_baselines(None)
+
+        trade_dates = self._window_trade_dates(self._history_days(self.analyzer.baseline_date))
+        if self.config.snapshot_path:
+            panel = self._load_snapshot_panel(trade_dates, stock_codes)
+        else:
+            panel = self.daily_bar_cache.get_panel(trade_dates, stock_codes)
+        logger.info(f"Retrieved {len(panel)} bars for {panel['ts_code'].nunique()} stocks")
+
+        adjustment = self.config.price_adjustment
+        if adjustment != 'none':
+            panel, changed = self.price_adjuster.adjust_panel(panel, adjustment)
+            if changed:
+                self.analyzer.invalidate(changed)
+
+        # Drop the columns the rules never read (vol, amount, pct_chg, ...) and keep the
+        # exact float64 prices: a float32 copy could flip a threshold comparison
+        keep = [c for c in ('ts_code', 'trade_date', 'open', 'high', 'low', 'close', 'price_scale')
+                if c in panel.columns]
+        self.panel = panel[keep]
+        del panel
+        logger.info(f"Price panel: {len(self.panel)} bars, "
+                    f"{self.panel.memory_usage(index=False, deep=True).sum() / 1024 / 1024:.1f} MB")
+
+        alerts = self.analyzer.analyze_panel(self.panel)
+        self.sparklines.render(self.panel, [alert['stock_code'] for alert in alerts])
+        if self._snapshot is not None:
+            self._save_indicator_state()
+        return alerts
+
+    def _export_results(self, alerts):
+        """Append this run's alerts and indicator snapshot to the Parquet datasets"""
+        try:
+            from parquet_exporter import ParquetExporter
+            ParquetExporter(self.config.export_dir).export(alerts, self.latest_indicators())
+        except ImportError:
+            logger.warning("Parquet export needs pyarrow (pip install pyarrow); skipping")
+        except Exception as e:
+            logger.error(f"Error exporting results: {e}")
+
+    @staticmethod
+    def _history_days(baseline_date) -> int:
+        """Calendar days to fetch: HISTORY_DAYS, or back to `baseline_date` if that is older"""
+        import pandas as pd
+
+        # A couple of weeks more so a date in a holiday still has a bar on or before it
+        return max(HISTORY_DAYS, (pd.Timestamp.now().normalize() - pd.Timestamp(baseline_date)).days + 15)
+
+    def _baseline_dates(self, stock_codes):
+        """Each stock's baseline date: its watch date when per-stock baselines are set, else the default"""
+        import pandas as pd
+
+        default = pd.Timestamp(self.analyzer.baseline_date)
+        dates = pd.Series(default, index=pd.Index(stock_codes, dtype=object))
+        baselines = self.analyzer.baselines
+        if baselines is not None and 'baseline_date' in baselines:
+            dates = pd.to_datetime(baselines['baseline_date']).reindex(dates.index).fillna(default)
+        return dates
+
+    def _window_trade_dates(self, days: int = HISTORY_DAYS):
+        end_date = datetime.now()
+        return self.tushare_client.get_trade_dates(
+            (end_date - timedelta(days=days)).strftime('%Y%m%d'),
+            end_date.strftime('%Y%m%d')
+        )
+
+    def _load_snapshot_panel(self, trade_dates, stock_codes):
+        """Read the window from the memory-mapped snapshot, fetching only the days it lacks.
+
+        New sessions are appended; sessions before its first day (a baseline
+        older than the window it was created with) are prepended.
+        """
+        from panel_snapshot import PanelSnapshot
+        from price_panel import PricePanel
+
+        path = Path(self.config.snapshot_path)
+        if self._snapshot is None and path.exists():
+            self._snapshot = PanelSnapshot.open(path, writable=True)
+            logger.info(f"Opened panel snapshot {path} ({len(self._snapshot.codes)} stocks, "
+                        f"{self._snapshot.n_dates} days)")
+
+        if self._snapshot is None:
+            prices = PricePanel.from_frame(self.daily_bar_cache.get_panel(trade_dates))
+            prices.log_memory_report()
+            self._snapshot = PanelSnapshot.create(path, prices)
+        else:
+            stored = self._snapshot.dates
+            last_date = stored[-1].astype(object).strftime('%Y%m%d') if len(stored) else ''
+            missing = [d for d in trade_dates if d > last_date]
+            if missing:
+                self._snapshot = self._snapshot.append(self.daily_bar_cache.get_panel(missing))
+            first_date = stored[0].astype(object).strftime('%Y%m%d') if len(stored) else ''
+            older = [d for d in trade_dates if d < first_date]
+            if older:
+                self._snapshot = self._snapshot.prepend(self.daily_bar_cache.get_panel(older))
+
+        return self._snapshot.to_frame(stock_codes, start_date=trade_dates[0] if trade_dates else None)
+
+    def _save_indicator_state(self):
+        indicators = self.latest_indicators()[self.analyzer.INDICATOR_COLUMNS]
+        self._snapshot = self._snapshot.write_indicators(indicators)
+
+    def diagnose(self, universe: str = 'watchlist'):
+        """Data-health report over the cached panel; makes no API calls.
+
+        Reads the panel snapshot or the per-date bar cache. A watchlist run
+        without a snapshot fetches each stock's history and keeps none of it
+        on disk, so there is nothing to diagnose and this fails saying so.
+        """
+        from daily_bar_cache import DailyBarCache
+        from data_diagnostics import DataDiagnostics
+
+        stock_codes = self.watchlist_set.load() if universe == 'watchlist' else None
+        if universe == 'watchlist':
+            self._apply_baselines()
+        start = time.time()
+
+        snapshot_path = self.config.snapshot_path
+        if snapshot_path and Path(snapshot_path).exists():
+            from panel_snapshot import PanelSnapshot
+            snapshot = PanelSnapshot.open(snapshot_path)
+            panel = snapshot.to_frame(stock_codes)
+            calendar = snapshot.dates
+            snapshot.close()
+        else:
+            # No client: the cache can only read what is already on disk
+            cache = DailyBarCache(None, self.config.cache_dir)
+            trade_dates = cache.cached_dates()
+            panel = cache.get_panel(trade_dates, stock_codes, cached_only=True)
+            calendar = [datetime.strptime(d, '%Y%m%d') for d in trade_dates]
+        loaded = time.time()
+        if not len(calendar):
+            raise RuntimeError("No cached bars to diagnose: watchlist runs keep no per-date cache. Set "
+                               "snapshot_path in the config, or run --universe all, then diagnose again")
+
+        diagnostics = DataDiagnostics(self.analyzer.baseline_date)
+        baselines = self.analyzer.resolve_baselines(panel)['baseline_date'] if not panel.empty else None
+        report = diagnostics.check(panel, calendar, stock_codes, baselines)
+        summary = diagnostics.summarize(report, calendar)
+        logger.info(f"Diagnosed {len(report)} stocks in {time.time() - loaded:.3f}s "
+                    f"(cache load {loaded - start:.3f}s)")
+
+        print(diagnostics.format_report(report, summary))
+        return report
+
     def test_email(self):
         logger.info("Sending test email")
         return self.email_notifier.send_test_email()
     
-    def schedule_daily_run(self):
+    def schedule_daily_run(self, **run_options):
+        import schedule
+
         run_time = self.config.run_time
         logger.info(f"Scheduling daily run at {run_time}")
         
-        schedule.every().day.at(run_time).do(self.run_analysis)
+        schedule.every().day.at(run_time).do(self.run_analysis, **run_options)
         
         logger.info("Scheduler started. Press Ctrl+C to stop.")
         
@@ -111,9 +845,27 @@ def main():
     parser.add_argument('--config', type=str, help='Path to config file')
     parser.add_argument('--run-once', action='store_true', help='Run analysis once and exit')
     parser.add_argument('--test-email', action='store_true', help='Send test email')
+    parser.add_argument('--diagnose', action='store_true', help='Check cached data health (no API calls)')
+    parser.add_argument('--resume', action='store_true', help='Run once, continuing an interrupted run from its journal')
     parser.add_argument('--schedule', action='store_true', help='Run on schedule')
+    parser.add_argument('--daemon', action='store_true', help='Keep data hot in memory and serve a local query API')
+    parser.add_argument('--port', type=int, default=8765, help='With --daemon: local HTTP port')
+    parser.add_argument('--socket', type=str, help='With --daemon: serve on this Unix socket instead of a port')
+    parser.add_argument('--universe', choices=['watchlist', 'all'], default='watchlist',
+                        help='Analyze the CSV watchlist or every listed A-share')
+    parser.add_argument('--exchange', type=str, help='With --universe all: SSE/SZSE/BSE (or SH/SZ/BJ)')
+    parser.add_argument('--board', type=str, help='With --universe all: main/chinext/star/bse/cdr')
+    parser.add_argument('--deadline', type=str, help='HH:MM: send a partial email at this time, then finish the rest')
+    parser.add_argument('--shard', type=str, help='i/N: analyze only shard i of N (by hash of ts_code) and save its results')
+    parser.add_argument('--merge', action='store_true', help='Combine the saved shard results into one email and export')
+    parser.add_argument('--shard-dir', type=str, help='With --shard/--merge: directory of shard results')
     
     args = parser.parse_args()
+
+    setup_logging()
+
+    run_options = {'universe': args.universe, 'exchange': args.exchange, 'board': args.board,
+                   'deadline': args.deadline}
     
     try:
         monitor = StockMonitor(args.config)
@@ -124,13 +876,27 @@ def main():
                 print("Test email sent successfully")
             else:
                 print("Failed to send test email")
-        elif args.run_once:
-            monitor.run_analysis()
+        elif args.diagnose:
+            monitor.diagnose(args.universe)
+        elif args.shard:
+            from sharding import parse_shard
+            index, count = parse_shard(args.shard)
+            monitor.run_shard(index, count, args.universe, args.exchange, args.board, args.shard_dir)
+        elif args.merge:
+            monitor.merge_shards(args.shard_dir)
+        elif args.run_once or args.resume:
+            monitor.run_analysis(resume=args.resume, **run_options)
         elif args.schedule:
-            monitor.schedule_daily_run()
+            monitor.schedule_daily_run(**run_options)
+        elif args.daemon:
+            from monitor_daemon import MonitorDaemon
+            MonitorDaemon(monitor, port=args.port, socket_path=args.socket, run_options=run_options).serve_forever()
         else:
-            print("Please specify --run-once, --test-email, or --schedule")
+            print("Please specify --run-once, --test-email, --diagnose, --shard, --merge, --schedule, or --daemon")
             parser.print_help()
+
+        # One-shot commands exit here; let the background sender finish first
+        monitor.wait_for_notifications()
     
     except Exception as e:
         logger.error(f"Fatal error: {e}")
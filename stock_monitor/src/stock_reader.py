@@ -6,6 +6,17 @@ logger = logging.getLogger(__name__)
 
 
 class StockReader:
+    # Optional columns of the exported watchlist CSV and their names in read_stock_info()
+    INFO_COLUMNS = {
+        '名称': 'name',
+        '最新': 'latest_price',
+        '所属行业': 'industry',
+        '总市值': 'market_cap',
+        '流通市值': 'float_market_cap',
+        '自选时间': 'watch_date',
+        '自选价格': 'watch_price',
+    }
+
     def __init__(self, csv_path: str):
         self.csv_path = csv_path
     
@@ -13,22 +24,7 @@ class StockReader:
         try:
             df = pd.read_csv(self.csv_path, encoding='utf-8-sig')
             
-            if 'code' in df.columns:
-                stock_codes = df['code'].tolist()
-            elif 'stock_code' in df.columns:
-                stock_codes = df['stock_code'].tolist()
-            elif '股票代码' in df.columns:
-                stock_codes = df['股票代码'].tolist()
-            elif '代码' in df.columns:
-                stock_codes = df['代码'].tolist()
-            else:
-                stock_codes = df.iloc[:, 1].tolist()
-            
-            stock_codes = [str(code).strip() for code in stock_codes if pd.notna(code)]
-            
-            stock_codes = [code.replace('=', '').replace('"', '').strip() for code in stock_codes]
-            
-            stock_codes = [self._format_stock_code(code) for code in stock_codes]
+            stock_codes = [self._clean_code(code) for code in self._code_column(df) if pd.notna(code)]
             
             # Remove duplicates while preserving order
             seen = set()
@@ -51,6 +47,48 @@ class StockReader:
             logger.error(f"Error reading CSV file: {e}")
             raise
     
+    def read_stock_info(self) -> pd.DataFrame:
+        """Extra per-stock CSV columns (name, industry, market cap, ...) indexed by ts_code"""
+        df = pd.read_csv(self.csv_path, encoding='utf-8-sig')
+        codes = self._code_column(df)
+        df = df[codes.notna()]
+
+        info = pd.DataFrame(index=pd.Index([self._clean_code(code) for code in codes.dropna()], name='ts_code'))
+        for column, name in self.INFO_COLUMNS.items():
+            if column not in df.columns:
+                continue
+            values = df[column].astype(str).str.strip().where(df[column].notna()).values
+            if name in ('latest_price', 'watch_price'):
+                values = pd.to_numeric(values, errors='coerce')
+            elif name in ('market_cap', 'float_market_cap'):
+                values = [self._parse_amount(v) for v in values]
+            elif name == 'watch_date':
+                values = pd.to_datetime(values, errors='coerce')
+            info[name] = values
+
+        return info[~info.index.duplicated()]
+
+    def _code_column(self, df: pd.DataFrame) -> pd.Series:
+        for column in ('code', 'stock_code', '股票代码', '代码'):
+            if column in df.columns:
+                return df[column]
+        return df.iloc[:, 1]
+
+    def _clean_code(self, code) -> str:
+        return self._format_stock_code(str(code).strip().replace('=', '').replace('"', '').strip())
+
+    @staticmethod
+    def _parse_amount(value) -> float:
+        """Parse amounts such as '730.7亿' or '8037万' into yuan"""
+        if not isinstance(value, str) or not value:
+            return float('nan')
+        units = {'亿': 1e8, '万': 1e4}
+        multiplier = units.get(value[-1], 1)
+        try:
+            return float(value.rstrip('亿万')) * multiplier
+        except ValueError:
+            return float('nan')
+
     def _format_stock_code(self, code: str) -> str:
         code = str(code).strip()
         
@@ -0,0 +1,46 @@
+import numpy as np
+import pandas as pd
+import logging
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+def trigger_distance(indicators: pd.DataFrame, baseline_drop: float = 0.20, boll_drop: float = 0.05) -> pd.Series:
+    """Fraction the close must still fall before any alert rule fires (0 = already there).
+
+    Uses the indicators of the previous run: the baseline rule fires below
+    80% of the baseline close; the MTR rule needs a one-MTR drop that keeps
+    the close above MA100; the Bollinger rule needs a 5% drop from a close
+    above the upper band. NaN when no rule can be estimated.
+    """
+    close = indicators['close']
+
+    baseline = (close - indicators['baseline_price'] * (1 - baseline_drop)) / close
+    mtr = (indicators['MTR'] / close).where(close - indicators['MTR'] >= indicators['MA100'])
+    boll = pd.Series(np.where(close > indicators['BB_Upper'], boll_drop, np.nan), index=indicators.index)
+
+    return pd.concat([baseline, mtr, boll], axis=1).min(axis=1).clip(lower=0)
+
+
+def prioritize(stock_codes: List[str], indicators: Optional[pd.DataFrame] = None,
+               info: Optional[pd.DataFrame] = None) -> List[str]:
+    """Order stocks closest-to-trigger first, then by market cap (largest first).
+
+    Stocks without previous indicators follow those with a known distance;
+    stocks without a market cap keep their watchlist order at the end.
+    """
+    order = pd.DataFrame({'position': np.arange(len(stock_codes))}, index=pd.Index(stock_codes, name='ts_code'))
+    order['distance'] = np.nan
+    order['market_cap'] = np.nan
+
+    if indicators is not None and not indicators.empty:
+        order['distance'] = trigger_distance(indicators).reindex(order.index)
+    if info is not None and 'market_cap' in info.columns:
+        order['market_cap'] = info['market_cap'][~info.index.duplicated()].reindex(order.index)
+
+    order = order.sort_values(['distance', 'market_cap', 'position'], ascending=[True, False, True],
+                              na_position='last', kind='stable')
+    known = int(order['distance'].notna().sum())
+    logger.info(f"Prioritized {len(order)} stocks ({known} by distance to trigger)")
+    return order.index.tolist()
@@ -0,0 +1,177 @@
+import re
+import pandas as pd
+import numpy as np
+import logging
+from typing import Dict, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class TimeframeResampler:
+    """Derive weekly and monthly OHLCV bars from the daily panel.
+
+    The panel is a long DataFrame with one row per (ts_code, trade_date), as
+    returned by `StockAnalyzer.build_panel`. Bars are built with a single
+    group-by over the whole panel and then updated in place as new daily rows
+    arrive, so rules can reference `W:MA20` or `M:close` without calling
+    `pro.weekly` / `pro.monthly`.
+
+    The bars are not persisted. They only cover the daily window a run has
+    fetched anyway, so a one-shot run rebuilds them with a single group-by
+    over data already in memory, which is cheaper than reading a copy back
+    and cannot go stale after a price adjustment. Incremental updates pay
+    off in the daemon, whose analyzer keeps the bars across refreshes.
+    """
+
+    # Weeks end on Friday (A-share trading week), months on calendar month end
+    TIMEFRAMES = {'W': 'W-FRI', 'M': 'M'}
+    BAR_COLUMNS = ['trade_date', 'open', 'high', 'low', 'close', 'vol', 'amount']
+
+    def __init__(self):
+        # timeframe -> DataFrame indexed by (ts_code, period)
+        self.bars: Dict[str, pd.DataFrame] = {}
+
+    def _period_key(self, dates: pd.Series, timeframe: str) -> pd.Series:
+        return dates.dt.to_period(self.TIMEFRAMES[timeframe])
+
+    def _resample(self, daily: pd.DataFrame, timeframe: str) -> pd.DataFrame:
+        daily = daily.sort_values(['ts_code', 'trade_date'])
+        keys = [daily['ts_code'], self._period_key(daily['trade_date'], timeframe).rename('period')]
+        grouped = daily.groupby(keys, sort=True)
+
+        bars = grouped.agg(
+            trade_date=('trade_date', 'last'),
+            open=('open', 'first'),
+            high=('high', 'max'),
+            low=('low', 'min'),
+            close=('close', 'last'),
+        )
+        for column in ('vol', 'amount'):
+            bars[column] = grouped[column].sum() if column in daily.columns else np.nan
+
+        return bars[self.BAR_COLUMNS]
+
+    def build(self, daily: pd.DataFrame):
+        """Build all timeframes from scratch from a daily panel"""
+        for timeframe in self.TIMEFRAMES:
+            self.bars[timeframe] = self._resample(daily, timeframe)
+        logger.debug(f"Built {', '.join(f'{tf}={len(b)}' for tf, b in self.bars.items())} bars")
+
+    def update(self, day: pd.DataFrame):
+        """Fold the daily rows of one or more new sessions into the existing bars.
+
+        Rows already reflected in the bars (trade_date not newer than the
+        stock's latest bar) are ignored, so repeated updates are harmless.
+        """
+        if not self.bars:
+            self.build(day)
+            return
+
+        # Keep only sessions newer than each stock's latest bar; when a refresh passes the
+        # whole window that is usually just the latest day, so the loop below stays short
+        latest_dates = self.bars['W'].groupby(level='ts_code')['trade_date'].max()
+        known = day['ts_code'].map(latest_dates)
+        day = day[known.isna() | (day['trade_date'] > known)]
+
+        for trade_date, rows in day.sort_values('trade_date').groupby('trade_date', sort=True):
+            for timeframe in self.TIMEFRAMES:
+                self._update_timeframe(timeframe, rows)
+
+    def _update_timeframe(self, timeframe: str, rows: pd.DataFrame):
+        bars = self.bars[timeframe]
+        rows = rows.set_index(pd.MultiIndex.from_arrays(
+            [rows['ts_code'], self._period_key(rows['trade_date'], timeframe)],
+            names=['ts_code', 'period']
+        ))
+
+        # Drop rows that are not newer than the stock's latest bar
+        latest_dates = bars.groupby(level='ts_code')['trade_date'].max()
+        known = rows['ts_code'].map(latest_dates)
+        rows = rows[known.isna() | (rows['trade_date'] > known)]
+        if rows.empty:
+            return
+
+        in_progress = rows.index.isin(bars.index)
+
+        # Extend bars whose period is still open
+        current = rows[in_progress]
+        if not current.empty:
+            idx = current.index
+            bars.loc[idx, 'high'] = np.maximum(bars.loc[idx, 'high'].values, current['high'].values)
+            bars.loc[idx, 'low'] = np.minimum(bars.loc[idx, 'low'].values, current['low'].values)
+            bars.loc[idx, 'close'] = current['close'].values
+            bars.loc[idx, 'trade_date'] = current['trade_date'].values
+            for column in ('vol', 'amount'):
+                if column in current.columns:
+                    bars.loc[idx, column] = bars.loc[idx, column].values + current[column].values
+
+        # Open new bars for stocks entering a new period
+        opened = rows[~in_progress]
+        if not opened.empty:
+            new_bars = opened.reindex(columns=self.BAR_COLUMNS)
+            bars = pd.concat([bars, new_bars]).sort_index()
+
+        self.bars[timeframe] = bars
+
+    def refresh(self, daily: pd.DataFrame):
+        """Bring the bars up to date with a daily panel, rebuilding only what is new"""
+        if not self.bars:
+            self.build(daily)
+            return
+
+        known_codes = self.bars['W'].index.get_level_values('ts_code').unique()
+        new_codes = ~daily['ts_code'].isin(known_codes)
+        if new_codes.any():
+            for timeframe in self.TIMEFRAMES:
+                added = self._resample(daily[new_codes], timeframe)
+                self.bars[timeframe] = pd.concat([self.bars[timeframe], added]).sort_index()
+
+        self.update(daily[~new_codes])
+
+    def invalidate(self, stock_codes):
+        """Drop the derived bars of the given stocks so they are rebuilt on next refresh"""
+        for timeframe, bars in self.bars.items():
+            self.bars[timeframe] = bars.drop(index=list(stock_codes), level='ts_code', errors='ignore')
+
+    def get_bars(self, timeframe: str, stock_code: str) -> Optional[pd.DataFrame]:
+        bars = self.bars.get(timeframe)
+        if bars is None or stock_code not in bars.index.get_level_values('ts_code'):
+            return None
+        return bars.xs(stock_code, level='ts_code')
+
+    @staticmethod
+    def _parse_ref(ref: str):
+        match = re.fullmatch(r'([WM]):(MA(\d+)|open|high|low|close|vol|amount)', ref)
+        if not match:
+            raise ValueError(f"Unsupported timeframe reference: {ref}")
+        period = match.group(3)
+        return match.group(1), match.group(2), int(period) if period else None
+
+    def get_values(self, ref: str) -> pd.Series:
+        """Latest value of a reference such as `W:MA20` or `M:close` for every stock"""
+        timeframe, field, period = self._parse_ref(ref)
+        bars = self.bars.get(timeframe)
+        if bars is None:
+            return pd.Series(dtype=float)
+
+        if period is None:
+            return bars.groupby(level='ts_code')[field].last()
+
+        window = bars.groupby(level='ts_code').tail(period).groupby(level='ts_code')['close']
+        return window.mean().where(window.count() >= period)
+
+    def get_value(self, ref: str, stock_code: str) -> Optional[float]:
+        """Latest value of a reference for one stock, reading only that stock's bars"""
+        timeframe, field, period = self._parse_ref(ref)
+        bars = self.get_bars(timeframe, stock_code)
+        if bars is None or bars.empty:
+            return None
+
+        if period is None:
+            value = bars[field].iloc[-1]
+        else:
+            closes = bars['close'].tail(period)
+            value = closes.mean() if closes.count() >= period else None
+        if value is None or pd.isna(value):
+            return None
+        return float(value)
@@ -1,64 +1,230 @@
-import tushare as ts
 import pandas as pd
 from datetime import datetime, timedelta
 import logging
 from typing import Dict, Optional, List
 
+from quota_ledger import QuotaExceeded, QuotaLedger
+from range_cache import RangeCache
+from single_flight import SingleFlight
+
 logger = logging.getLogger(__name__)
 
 
 class TushareClient:
-    def __init__(self, api_key: str):
-        ts.set_token(api_key)
-        self.pro = ts.pro_api()
+    def __init__(self, api_key: str, cache_max_bytes: int = 64 * 1024 * 1024,
+                 transport: str = 'sdk', api_url: Optional[str] = None,
+                 quota: Optional[QuotaLedger] = None):
+        if transport == 'http':
+            from pro_transport import ProTransport
+            self.pro = ProTransport(api_key, api_url)
+        else:
+            import tushare as ts
+            ts.set_token(api_key)
+            self.pro = ts.pro_api()
         self.daily_request_count = 0
+        # Per-minute/per-day quota shared with every process using this token
+        self.quota = quota or QuotaLedger(api_key)
+        self.cache = RangeCache(cache_max_bytes)
+        # Identical concurrent requests share one API call
+        self.single_flight = SingleFlight()
+        # (day, close time, after close) -> latest closed session (None if the calendar failed),
+        # so the calendar is read once per run
+        self._closed_session = (None, None)
+
+    @property
+    def metrics(self) -> Dict[str, int]:
+        return {
+            'requests': self.daily_request_count,
+            'coalesced': self.single_flight.stats['coalesced'],
+            'cache_hits': self.cache.stats['hits'],
+            'cache_partial_hits': self.cache.stats['partial_hits'],
+            'cache_misses': self.cache.stats['misses'],
+        }
         
     def get_stock_data(self, stock_code: str, days: int = 30) -> Optional[pd.DataFrame]:
-        try:
+        """Daily bars of the last `days` calendar days; None if there are none.
+
+        A failed request raises instead of returning None, so callers can
+        tell a stock without data from one that has to be fetched again.
+        """
+        start, end = self._window(days)
+        df = self.single_flight.do(('daily', stock_code, start, end),
+                                   lambda: self._fetch_stock_data(stock_code, start, end))
+        # Each waiter gets its own frame since callers add helper columns
+        return df.copy() if df is not None else None
+
+    async def get_stock_data_async(self, stock_code: str, days: int = 30) -> Optional[pd.DataFrame]:
+        start, end = self._window(days)
+        df = await self.single_flight.do_async(('daily', stock_code, start, end),
+                                               lambda: self._fetch_stock_data(stock_code, start, end))
+        return df.copy() if df is not None else None
+
+    def _window(self, days: int):
+        """Calendar range of the last `days` days, ending at the latest closed session"""
+        today = datetime.now().date()
+        end = today
+        session = self.get_latest_closed_session()
+        if session is not None:
+            # Days after it cannot have bars yet; requesting them would repeat on every call
+            end = min(end, datetime.strptime(session, '%Y%m%d').date())
+        return today - timedelta(days=days), end
+
+    def _fetch_stock_data(self, stock_code: str, start, end) -> Optional[pd.DataFrame]:
+        # Only fetch the parts of the window that are not cached yet
+        for gap_start, gap_end in self.cache.missing(stock_code, start, end):
             self._rate_limit()
-            
-            end_date = datetime.now().strftime('%Y%m%d')
-            start_date = (datetime.now() - timedelta(days=days)).strftime('%Y%m%d')
-            
+
             df = self.pro.daily(
                 ts_code=stock_code,
-                start_date=start_date,
-                end_date=end_date
+                start_date=gap_start.strftime('%Y%m%d'),
+                end_date=gap_end.strftime('%Y%m%d')
             )
-            
-            if df.empty:
-                logger.warning(f"No data found for stock {stock_code}")
-                return None
-            
-            df['trade_date'] = pd.to_datetime(df['trade_date'])
-            df = df.sort_values('trade_date')
-            
-            return df
-            
-        except Exception as e:
-            logger.error(f"Error fetching data for {stock_code}: {e}")
+            if df is not None and not df.empty:
+                df['trade_date'] = pd.to_datetime(df['trade_date'])
+
+            # The session's bar may not be published yet right after the close;
+            # only treat that day as fetched once it has actually been returned
+            if gap_end == end and (df is None or df.empty or df['trade_date'].max().date() < end):
+                gap_end = end - timedelta(days=1)
+            if gap_start <= gap_end:
+                self.cache.add(stock_code, gap_start, gap_end, df)
+
+        df = self.cache.get(stock_code, start, end)
+        if df is None:
+            df = self.cache.get(stock_code, start, end - timedelta(days=1))
+
+        if df is None or df.empty:
+            logger.warning(f"No data found for stock {stock_code}")
             return None
-    
+
+        df = df.sort_values('trade_date')
+
+        return df
+
     def get_multiple_stocks_data(self, stock_codes: List[str], days: int = 30) -> Dict[str, pd.DataFrame]:
         stock_data = {}
 
         for stock_code in stock_codes:
             logger.info(f"Fetching data for {stock_code}")
-            data = self.get_stock_data(stock_code, days)
+            try:
+                data = self.get_stock_data(stock_code, days)
+            except QuotaExceeded:
+                raise
+            except Exception as e:
+                logger.error(f"Error fetching data for {stock_code}: {e}")
+                continue
             if data is not None:
                 stock_data[stock_code] = data
-            # No delay needed - 500 requests/minute quota
+            # No delay needed - the quota ledger paces requests
 
         return stock_data
     
+    def get_daily_by_date(self, trade_date: str) -> Optional[pd.DataFrame]:
+        """Fetch daily bars of every listed stock for one trade date (YYYYMMDD)"""
+        return self.single_flight.do(('daily_by_date', trade_date), lambda: self._fetch_daily_by_date(trade_date))
+
+    def _fetch_daily_by_date(self, trade_date: str) -> Optional[pd.DataFrame]:
+        try:
+            self._rate_limit()
+
+            df = self.pro.daily(trade_date=trade_date)
+
+            if df is None or df.empty:
+                logger.warning(f"No daily data found for {trade_date}")
+                return None
+
+            return df
+
+        except QuotaExceeded:
+            # Out of quota: fail the run instead of carrying on with missing data
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching daily data for {trade_date}: {e}")
+            return None
+
+    def get_stock_basic(self) -> Optional[pd.DataFrame]:
+        """Fetch the list of all currently listed stocks"""
+        try:
+            self._rate_limit()
+
+            df = self.pro.stock_basic(
+                exchange='',
+                list_status='L',
+                fields='ts_code,symbol,name,area,industry,market,exchange,list_date'
+            )
+
+            if df is None or df.empty:
+                logger.warning("No stock_basic data returned")
+                return None
+
+            return df
+
+        except QuotaExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching stock_basic: {e}")
+            return None
+
+    def get_trade_dates(self, start_date: str, end_date: str) -> List[str]:
+        """Open SSE trading days between start_date and end_date (YYYYMMDD), ascending"""
+        try:
+            self._rate_limit()
+            df = self.pro.trade_cal(exchange='SSE', start_date=start_date, end_date=end_date)
+            return sorted(df[df['is_open'] == 1]['cal_date'].astype(str).tolist())
+
+        except QuotaExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error getting trade calendar: {e}")
+            return []
+
+    def get_latest_closed_session(self, close_time: str = '15:00', refresh: bool = False) -> Optional[str]:
+        """Latest trade date (YYYYMMDD) whose session has closed; None if the calendar is unavailable.
+
+        The answer, a failed read included, is kept until the day or the close
+        state changes, so fetch windows never ask again; `refresh` reads the
+        calendar anew, as the monitor does once at the start of each run.
+        """
+        now = datetime.now()
+        today = now.strftime('%Y%m%d')
+        key = (today, close_time, now.strftime('%H:%M') >= close_time)
+        if self._closed_session[0] == key and not refresh:
+            return self._closed_session[1]
+
+        trade_dates = self.single_flight.do(
+            ('trade_cal', today), lambda: self.get_trade_dates((now - timedelta(days=20)).strftime('%Y%m%d'), today))
+        if trade_dates and trade_dates[-1] == today and not key[2]:
+            trade_dates = trade_dates[:-1]
+        session = trade_dates[-1] if trade_dates else None
+        self._closed_session = (key, session)
+        return session
+
+    def get_adj_factor_by_date(self, trade_date: str) -> Optional[pd.DataFrame]:
+        """Fetch adjustment factors of every stock for one trade date (YYYYMMDD)"""
+        return self.single_flight.do(('adj_factor', trade_date), lambda: self._fetch_adj_factor_by_date(trade_date))
+
+    def _fetch_adj_factor_by_date(self, trade_date: str) -> Optional[pd.DataFrame]:
+        try:
+            self._rate_limit()
+
+            df = self.pro.adj_factor(ts_code='', trade_date=trade_date)
+
+            if df is None or df.empty:
+                logger.warning(f"No adjustment factors found for {trade_date}")
+                return None
+
+            return df[['ts_code', 'trade_date', 'adj_factor']]
+
+        except QuotaExceeded:
+            raise
+        except Exception as e:
+            logger.error(f"Error fetching adjustment factors for {trade_date}: {e}")
+            return None
+    
     def _rate_limit(self):
-        # 500 requests/minute quota - no delay needed for typical usage
+        # Blocks until the shared ledger has a free slot, raising QuotaExceeded after quota.max_wait
+        self.quota.wait_for_slot(self.quota.max_wait)
         self.daily_request_count += 1
-
-        if self.daily_request_count >= 500:
-            logger.warning("Approaching per-minute request limit")
-        elif self.daily_request_count >= 2000:
-            logger.warning("Approaching daily request limit")
     
     def get_latest_trading_day(self) -> str:
         try:
@@ -74,6 +240,8 @@ class TushareClient:
                 return trading_days.iloc[-1]
             return datetime.now().strftime('%Y%m%d')
             
+        except QuotaExceeded:
+            raise
         except Exception as e:
             logger.error(f"Error getting latest trading day: {e}")
             return datetime.now().strftime('%Y%m%d')
\ No newline at end of file
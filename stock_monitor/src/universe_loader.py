@@ -0,0 +1,76 @@
+import pandas as pd
+import logging
+import time
+from pathlib import Path
+from typing import List, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class UniverseLoader:
+    """Symbol universe for full-market runs, from a locally cached `stock_basic` snapshot"""
+
+    # Accepted spellings for --exchange and --board, mapped to stock_basic values
+    EXCHANGES = {
+        'SSE': 'SSE', 'SH': 'SSE',
+        'SZSE': 'SZSE', 'SZ': 'SZSE',
+        'BSE': 'BSE', 'BJ': 'BSE',
+    }
+    BOARDS = {
+        'main': '主板', '主板': '主板',
+        'chinext': '创业板', 'gem': '创业板', '创业板': '创业板',
+        'star': '科创板', '科创板': '科创板',
+        'bse': '北交所', '北交所': '北交所',
+        'cdr': 'CDR', 'CDR': 'CDR',
+    }
+
+    def __init__(self, tushare_client, cache_dir: str, max_age_days: int = 7):
+        self.tushare_client = tushare_client
+        self.snapshot_path = Path(cache_dir) / 'stock_basic.csv'
+        self.max_age_days = max_age_days
+
+    def _snapshot_is_fresh(self) -> bool:
+        if not self.snapshot_path.exists():
+            return False
+        age_days = (time.time() - self.snapshot_path.stat().st_mtime) / 86400
+        return age_days < self.max_age_days
+
+    def load_snapshot(self, refresh: bool = False) -> pd.DataFrame:
+        if not refresh and self._snapshot_is_fresh():
+            return pd.read_csv(self.snapshot_path, dtype={'symbol': str, 'list_date': str})
+
+        df = self.tushare_client.get_stock_basic()
+        if df is None:
+            if self.snapshot_path.exists():
+                logger.warning("Could not refresh stock_basic, using stale snapshot")
+                return pd.read_csv(self.snapshot_path, dtype={'symbol': str, 'list_date': str})
+            raise RuntimeError("No stock_basic snapshot available")
+
+        self.snapshot_path.parent.mkdir(parents=True, exist_ok=True)
+        df.to_csv(self.snapshot_path, index=False)
+        logger.info(f"Refreshed stock_basic snapshot with {len(df)} stocks")
+        return df
+
+    def load(self, exchange: Optional[str] = None, board: Optional[str] = None) -> List[str]:
+        """ts_codes of listed stocks, optionally filtered by exchange and board"""
+        df = self.load_snapshot()
+
+        if exchange:
+            if exchange not in self.EXCHANGES:
+                raise ValueError(f"Unknown exchange: {exchange}")
+            df = df[df['exchange'] == self.EXCHANGES[exchange]]
+
+        if board:
+            if board not in self.BOARDS:
+                raise ValueError(f"Unknown board: {board}")
+            df = df[df['market'] == self.BOARDS[board]]
+
+        stock_codes = df['ts_code'].tolist()
+        logger.info(f"Universe contains {len(stock_codes)} stocks"
+                    f"{f' on {exchange}' if exchange else ''}{f' ({board})' if board else ''}")
+        return stock_codes
+
+    def industries(self) -> pd.Series:
+        """Industry of every listed stock, indexed by ts_code"""
+        df = self.load_snapshot()
+        return df.set_index('ts_code')['industry']
@@ -0,0 +1,75 @@
+import logging
+import pandas as pd
+from typing import Dict, List, Optional
+
+from stock_reader import StockReader
+
+logger = logging.getLogger(__name__)
+
+RULES = ('baseline_drop', 'mtr_drop', 'boll_drop')
+
+
+class WatchlistSet:
+    """Several named watchlists, each with its own receivers and enabled rules.
+
+    The union of all lists is fetched and analyzed once; `route` then splits
+    the resulting alerts back per list, keeping only the rules that list
+    subscribed to, so the cost scales with unique symbols rather than lists.
+    """
+
+    def __init__(self, watchlists: Dict[str, Dict]):
+        self.watchlists = watchlists
+        self.codes: Dict[str, List[str]] = {}
+
+    @property
+    def names(self) -> List[str]:
+        return list(self.watchlists)
+
+    def paths(self) -> List[str]:
+        return [spec['stock_list_path'] for spec in self.watchlists.values()]
+
+    def receivers(self, name: str) -> List[str]:
+        return self.watchlists[name]['receivers']
+
+    def rules(self, name: str) -> List[str]:
+        return self.watchlists[name].get('rules') or list(RULES)
+
+    def load(self) -> List[str]:
+        """Read every list's CSV and return the union of codes (first-seen order)"""
+        union = {}
+        for name, spec in self.watchlists.items():
+            self.codes[name] = StockReader(spec['stock_list_path']).read_stock_codes()
+            union.update(dict.fromkeys(self.codes[name]))
+
+        total = sum(len(codes) for codes in self.codes.values())
+        logger.info(f"{len(self.watchlists)} watchlists: {total} entries, {len(union)} unique stocks")
+        return list(union)
+
+    def load_info(self) -> pd.DataFrame:
+        """Per-stock CSV details (name, industry, market cap, ...) across all lists"""
+        frames = [StockReader(spec['stock_list_path']).read_stock_info() for spec in self.watchlists.values()]
+        frames = [df for df in frames if not df.empty]
+        if not frames:
+            return pd.DataFrame()
+        info = pd.concat(frames)
+        return info[~info.index.duplicated()]
+
+    def route(self, alerts: List[Dict]) -> Dict[str, List[Dict]]:
+        """Alerts per watchlist, limited to its stocks and enabled rules, in the order given"""
+        routed = {}
+        for name in self.watchlists:
+            rules = self.rules(name)
+            members = set(self.codes.get(name, []))
+            filtered = (self._filter_rules(alert, rules) for alert in alerts if alert['stock_code'] in members)
+            routed[name] = [alert for alert in filtered if alert]
+        return routed
+
+    @staticmethod
+    def _filter_rules(alert: Dict, rules: List[str]) -> Optional[Dict]:
+        filtered = dict(alert)
+        for rule in RULES:
+            if rule not in rules:
+                filtered[f'{rule}_alert'] = None
+        if not any(filtered[f'{rule}_alert'] for rule in RULES):
+            return None
+        return filtered
@@ -0,0 +1,100 @@
+#!/usr/bin/env python3
+"""Test return-correlation clustering of alerted stocks"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+import pandas as pd
+
+from email_notifier import EmailNotifier
+from stock_analyzer import StockAnalyzer
+from testkit import DATES, FakeClient, check, make_monitor, run_tests, write_config
+
+def factor_closes(groups: int, per_group: int, loners: int, seed: int = 0) -> pd.DataFrame:
+    """Stocks driven by one of `groups` common factors, plus unrelated ones"""
+    rng = np.random.default_rng(seed)
+    n_days = 61
+    factors = rng.normal(0, 0.02, (groups, n_days))
+    series = {}
+    for g in range(groups):
+        for i in range(per_group):
+            series[f'G{g}_{i:03d}'] = factors[g] + rng.normal(0, 0.006, n_days)
+    for i in range(loners):
+        series[f'L_{i:03d}'] = rng.normal(0, 0.02, n_days)
+    returns = pd.DataFrame(series, index=DATES[-n_days:])
+    return 10 * np.exp(returns.cumsum())
+
+
+def test_correlation_matrix():
+    closes = factor_closes(2, 5, 3)
+    expected = np.log(closes).diff().corr(method='spearman').to_numpy()
+    corr = StockAnalyzer.return_correlation(closes)
+
+    gappy = closes.copy()
+    gappy.iloc[10:20, 0] = np.nan  # suspended for two weeks
+    gappy_corr = StockAnalyzer.return_correlation(gappy)
+    assert all([
+        check("matrix product matches Spearman correlation on complete data", np.allclose(corr, expected)),
+        check("suspensions tolerated", np.isfinite(gappy_corr).all() and gappy_corr[0, 1] > 0.8),
+    ])
+
+
+def test_clusters_recovered():
+    closes = factor_closes(4, 100, 100, seed=1)
+    start = time.time()
+    clusters = StockAnalyzer().cluster_alerts(closes)
+    elapsed = time.time() - start
+
+    groups = [c for c in clusters if len(c) > 1]
+    pure = all(len({code.split('_')[0] for code in c}) == 1 for c in groups)
+    sizes = sorted(len(c) for c in groups if c[0].startswith('G'))
+    assert all([
+        check(f"{len(closes.columns)} alerts clustered in {elapsed * 1000:.0f}ms", elapsed < 2),
+        check(f"four factor groups recovered intact {sizes}", pure and sizes == [100, 100, 100, 100]),
+        check("unrelated stocks left on their own", sum(len(c) == 1 for c in clusters) >= 90),
+        check("largest groups first", [len(c) for c in clusters] == sorted(map(len, clusters), reverse=True)),
+    ])
+
+
+def test_email_grouped_by_cluster():
+    # Two sectors sell off together; the watchlist interleaves them
+    rng = np.random.default_rng(3)
+    factors = rng.normal(0, 0.02, (2, len(DATES)))
+    codes = [f'{600000 + i}.SH' for i in range(8)]
+
+    def bars(stock_code):
+        i = codes.index(stock_code)
+        noise = np.random.default_rng(i).normal(0, 0.004, len(DATES))
+        close = 10 * np.exp(np.cumsum(factors[i % 2] + noise))
+        close[-1] = close[-2] * 0.5  # everything crashes today
+        return pd.DataFrame({'ts_code': stock_code, 'trade_date': DATES, 'open': close,
+                             'high': close * 1.01, 'low': close * 0.99, 'close': close})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, codes, pipeline={"chunk_size": 3, "queue_size": 3, "workers": 2})
+        monitor = make_monitor(tmp, FakeClient(bars=bars))
+        returned = monitor.run_analysis()
+        monitor.wait_for_notifications()
+
+        calls = monitor._email_notifier.calls
+        emailed = calls[0]['alerts'] if calls else []
+        order = [a['stock_code'] for a in emailed]
+        groups = [a['cluster'] for a in emailed]
+        body = EmailNotifier('smtp.example.com', 587, 'me@example.com', 'x', [])._format_alert_body(emailed)
+        assert all([
+            check(f"email groups correlated names together {order}",
+                  sorted(order) == codes and groups == [1, 1, 1, 1, 2, 2, 2, 2]
+                  and len({codes.index(c) % 2 for c in order[:4]}) == 1),
+            check("email body labels each group", body.count('相关性分组') == 2),
+            check("returned alerts keep watchlist order", [a['stock_code'] for a in returned] == codes),
+        ])
+
+
+if __name__ == "__main__":
+    run_tests("alert clustering", test_correlation_matrix, test_clusters_recovered, test_email_grouped_by_cluster)
@@ -0,0 +1,85 @@
+#!/usr/bin/env python3
+"""Test idempotent re-runs and per-stock analysis memoization"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import pandas as pd
+
+from testkit import DATES, FakeClient, check, flat_bars, make_monitor, run_tests, write_config
+
+CODES = [f'{600000 + i}.SH' for i in range(20)]
+CRASHING = {'600002.SH', '600011.SH'}  # close 30% below the 9/30 baseline
+
+
+def session_client(session: str, extra_bar=()) -> FakeClient:
+    """Client whose calendar says `session`; stocks in `extra_bar` already have the 10/20 bar"""
+    def bars(stock_code):
+        dates = DATES.append(pd.DatetimeIndex(['2025-10-20'])) if stock_code in extra_bar else DATES
+        return flat_bars(stock_code, stock_code in CRASHING, dates)
+    return FakeClient(session=session, bars=bars)
+
+
+def make_memo_monitor(tmp: Path, client: FakeClient):
+    """Monitor that records which stocks it actually evaluates"""
+    monitor = make_monitor(tmp, client)
+    monitor.analyzed = []
+    evaluate = monitor.analyzer.evaluate_indicators
+
+    def counting_evaluate(latest):
+        monitor.analyzed.extend(latest.index)
+        return evaluate(latest)
+
+    monitor.analyzer.evaluate_indicators = counting_evaluate
+    return monitor
+
+
+def test_same_session_rerun():
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, CODES)
+
+        first = make_memo_monitor(tmp, session_client('20251017'))
+        first_alerts = first.run_analysis()
+        first.wait_for_notifications()
+        results.append(check("first run fetches and analyzes everything",
+                             sorted(first.analyzed) == CODES and sorted(first._tushare_client.fetched) == CODES))
+
+        # Re-run on the same session: nothing fetched, analyzed or emailed
+        second = make_memo_monitor(tmp, session_client('20251017'))
+        start = time.time()
+        second_alerts = second.run_analysis()
+        second.wait_for_notifications()
+        elapsed = time.time() - start
+        results.append(check(f"same-session re-run makes no requests ({elapsed:.2f}s)",
+                             second._tushare_client.fetched == [] and second.analyzed == []))
+        results.append(check("same alerts as the first run",
+                             [a['stock_code'] for a in second_alerts] == [a['stock_code'] for a in first_alerts]
+                             and [a['stock_code'] for a in first_alerts] == sorted(CRASHING)))
+        results.append(check("duplicate email skipped",
+                             first._email_notifier.sent == [sorted(CRASHING)] and second._email_notifier.sent == []))
+        results.append(check("indicators restored for every stock", sorted(second.latest_indicators().index) == CODES))
+
+        # Next session: only the stock whose bars changed is analyzed again
+        third = make_memo_monitor(tmp, session_client('20251020', extra_bar=['600002.SH']))
+        third.run_analysis()
+        third.wait_for_notifications()
+        results.append(check(f"unchanged stocks reuse their result (analyzed {third.analyzed})",
+                             sorted(third._tushare_client.fetched) == CODES and third.analyzed == ['600002.SH']))
+        results.append(check("new session emails its alerts again", third._email_notifier.sent == [sorted(CRASHING)]))
+
+        # Changing a rule parameter invalidates the memo
+        fourth = make_memo_monitor(tmp, session_client('20251020', extra_bar=['600002.SH']))
+        fourth.analyzer.baseline_date = '2025-09-29'
+        fourth.run_analysis(notify=False)
+        results.append(check("rule change re-analyzes everything", sorted(fourth.analyzed) == CODES))
+    assert all(results)
+
+
+if __name__ == "__main__":
+    run_tests("analysis memo", test_same_session_rerun)
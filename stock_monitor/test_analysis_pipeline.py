@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""Test the streaming fetch -> analyze pipeline"""
+
+import sys
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+import pandas as pd
+
+from analysis_pipeline import AnalysisPipeline
+from stock_analyzer import StockAnalyzer
+from testkit import check, run_tests
+
+DATES = pd.bdate_range(end='2025-10-17', periods=130)
+
+
+def make_stock(stock_code: str, seed: int) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    close = 20 * np.exp(np.cumsum(rng.normal(0, 0.05, len(DATES))))
+    return pd.DataFrame({'ts_code': stock_code, 'trade_date': DATES, 'open': close,
+                         'high': close * 1.03, 'low': close * 0.96, 'close': close})
+
+
+def test_same_alerts_as_batch_run():
+    codes = [f'{i:06d}.SZ' for i in range(200)]
+    data = {code: make_stock(code, i) for i, code in enumerate(codes)}
+
+    expected = StockAnalyzer().analyze_multiple_stocks(data)
+    alerts, indicators = AnalysisPipeline(lambda code: data[code].copy(), StockAnalyzer(),
+                                          workers=4, queue_size=8, chunk_size=16).run(codes)
+
+    def key(alert_list):
+        return [(a['stock_code'], bool(a['baseline_drop_alert']), bool(a['mtr_drop_alert']),
+                 bool(a['boll_drop_alert'])) for a in alert_list]
+
+    assert all([
+        check(f"pipeline finds the same {len(expected)} alerts as analyze_multiple_stocks",
+              len(expected) > 0 and key(alerts) == key(expected)),
+        check("latest indicators kept for every stock", sorted(indicators.index) == codes),
+    ])
+
+
+def test_bounded_buffer_and_overlap():
+    results = []
+    for n in (100, 400):
+        codes = [f'{i:06d}.SH' for i in range(n)]
+        pipeline = AnalysisPipeline(lambda code: make_stock(code, 0), StockAnalyzer(),
+                                    workers=8, queue_size=8, chunk_size=8)
+        pipeline.run(codes)
+        results.append(pipeline.stats['peak_buffered'])
+    bounded = check(f"peak buffered frames flat as universe grows {results}", max(results) <= 8 + 8)
+
+    # 40 stocks x 50ms network wait: serial would take 2s
+    def slow_fetch(code):
+        time.sleep(0.05)
+        return make_stock(code, 1)
+
+    start = time.time()
+    AnalysisPipeline(slow_fetch, StockAnalyzer(), workers=8).run([f'{i:06d}.SZ' for i in range(40)])
+    elapsed = time.time() - start
+    overlapped = check(f"fetch waits overlap ({elapsed:.2f}s for 2s of serial waiting)", elapsed < 1.5)
+    assert bounded and overlapped
+
+
+def test_failed_fetches_are_skipped():
+    def flaky_fetch(code):
+        if code.endswith('1.SZ'):
+            raise ConnectionError("network blip")
+        if code.endswith('2.SZ'):
+            return None
+        return make_stock(code, 2)
+
+    codes = [f'{i:06d}.SZ' for i in range(10)]
+    pipeline = AnalysisPipeline(flaky_fetch, StockAnalyzer(), workers=3)
+    _, indicators = pipeline.run(codes)
+    assert check("errors and empty results skipped, others analyzed",
+                 pipeline.stats['analyzed'] == 8 and '000001.SZ' not in indicators.index)
+
+
+if __name__ == "__main__":
+    run_tests("pipeline", test_same_alerts_as_batch_run, test_bounded_buffer_and_overlap, test_failed_fetches_are_skipped)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+"""Test per-stock baselines from the watchlist's 自选时间/自选价格 columns"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+import pandas as pd
+
+from price_adjuster import PriceAdjuster
+from stock_analyzer import StockAnalyzer
+from testkit import FakeClient, FakeMarketClient, check, make_monitor, run_tests, write_config
+
+DATES = pd.bdate_range(end='2025-10-17', periods=120)
+
+
+def make_stock(stock_code: str, start: float, end: float) -> pd.DataFrame:
+    """Linear path from `start` to `end` so the close on any date is easy to predict"""
+    close = np.linspace(start, end, len(DATES))
+    return pd.DataFrame({'ts_code': stock_code, 'trade_date': DATES, 'open': close,
+                         'high': close * 1.001, 'low': close * 0.999, 'close': close})
+
+
+def test_resolve_baselines():
+    data = {code: make_stock(code, 10 + i, 20 + i) for i, code in enumerate(['A', 'B', 'C', 'D'])}
+    panel = StockAnalyzer.build_panel(data)
+    close_on = panel.set_index(['ts_code', 'trade_date'])['close']
+
+    analyzer = StockAnalyzer()
+    analyzer.set_baselines(pd.DataFrame({
+        'baseline_date': pd.to_datetime(['2025-09-06', '2025-09-08', None, '2020-01-01']),
+        'baseline_price': [np.nan, 12.5, np.nan, np.nan],
+    }, index=pd.Index(['A', 'B', 'C', 'D'], name='ts_code')))
+    baselines = analyzer.resolve_baselines(panel)
+
+    assert all([
+        check("weekend watch date resolves to the preceding Friday's close",
+              baselines.loc['A', 'baseline_price'] == close_on[('A', pd.Timestamp('2025-09-05'))]
+              and baselines.loc['A', 'baseline_date'] == '2025-09-06'),
+        check("watch price used as given", baselines.loc['B', 'baseline_price'] == 12.5),
+        check("no watch date falls back to 9/30",
+              baselines.loc['C', 'baseline_price'] == close_on[('C', pd.Timestamp('2025-09-30'))]
+              and baselines.loc['C', 'baseline_date'] == '2025-09-30'),
+        check("date before the fetched window has no baseline", np.isnan(baselines.loc['D', 'baseline_price'])),
+    ])
+
+
+def test_batch_matches_per_stock():
+    rng = np.random.default_rng(7)
+    codes = [f'{i:06d}.SZ' for i in range(300)]
+    data = {code: make_stock(code, 20, 20 * rng.uniform(0.5, 1.5)) for code in codes}
+    watch_dates = pd.to_datetime(rng.choice(pd.date_range('2025-06-01', '2025-10-10'), len(codes)))
+    baselines = pd.DataFrame({'baseline_date': watch_dates}, index=pd.Index(codes, name='ts_code'))
+
+    analyzer = StockAnalyzer()
+    analyzer.set_baselines(baselines)
+    expected = analyzer.analyze_multiple_stocks(data)
+    alerts = analyzer.analyze_panel(analyzer.build_panel(data))
+
+    def key(alert_list):
+        return [(a['stock_code'], a['baseline_drop_alert']['baseline_date'],
+                 round(a['baseline_drop_alert']['baseline_price'], 6))
+                for a in alert_list if a['baseline_drop_alert']]
+
+    assert check(f"vectorized lookup matches per-stock check for {len(key(expected))} alerts",
+                 len(key(expected)) > 0 and key(alerts) == key(expected))
+
+
+def test_watchlist_columns_end_to_end():
+    def bars(stock_code):
+        # Flat at 10 until mid-September, then 13 after a rally, closing at 9.5 today
+        close = np.where(DATES < '2025-09-15', 10.0, 13.0)
+        close[-1] = 9.5
+        return pd.DataFrame({'ts_code': stock_code, 'trade_date': DATES, 'open': close,
+                             'high': close * 1.01, 'low': close * 0.99, 'close': close})
+
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        stocks = ("代码,名称,自选时间,自选价格\n"
+                  "600000,浦发银行,2025-09-01,10.00\n"
+                  "600001,测试一,2025-09-20,13.00\n"
+                  "600002,测试二,,\n")
+        for source, expected in (('fixed', ['600000.SH', '600001.SH', '600002.SH']),
+                                 ('watch_date', ['600001.SH', '600002.SH']),
+                                 ('watch_price', ['600001.SH', '600002.SH'])):
+            write_config(tmp, stocks, cache_dir=str(tmp / 'cache' / source), baseline_source=source)
+            monitor = make_monitor(tmp, FakeClient(bars=bars))
+            alerts = monitor.run_analysis(notify=False)
+            baseline_alerts = [a['stock_code'] for a in alerts if a['baseline_drop_alert']]
+            results.append(check(f"baseline_source={source}: baseline alerts {baseline_alerts}",
+                                 baseline_alerts == expected))
+    assert all(results)
+
+
+def test_watch_price_after_split():
+    # 2:1 split on 10/01: raw closes halve, the factor doubles
+    raw = np.where(DATES < '2025-10-01', 20.0, 10.0)
+    panel = pd.DataFrame({'ts_code': 'A', 'trade_date': DATES, 'open': raw, 'high': raw, 'low': raw, 'close': raw})
+    panel.loc[panel.index[-1], 'close'] = 9.5
+    factors = pd.DataFrame({'ts_code': 'A', 'trade_date': DATES.strftime('%Y%m%d'),
+                            'adj_factor': np.where(DATES < '2025-10-01', 1.0, 2.0)})
+    watch = pd.DataFrame({'baseline_date': pd.to_datetime(['2025-09-10']), 'baseline_price': [20.0]},
+                         index=pd.Index(['A'], name='ts_code'))
+
+    results = []
+    for how, expected in (('qfq', 10.0), ('hfq', 20.0)):
+        adjusted = PriceAdjuster(None, '.').adjust(panel, factors, how)
+        analyzer = StockAnalyzer()
+        analyzer.set_baselines(watch)
+        baseline = analyzer.resolve_baselines(adjusted).loc['A', 'baseline_price']
+        alerts = analyzer.analyze_panel(adjusted)
+        results.append(check(f"{how}: raw watch price 20 rescaled to {baseline}, no false 20% drop",
+                             np.isclose(baseline, expected) and not any(a['baseline_drop_alert'] for a in alerts)))
+    assert all(results)
+
+
+class WindowClient(FakeClient):
+    """Serves only the last `days` calendar days of a long history, like the real API"""
+
+    def __init__(self, bars):
+        super().__init__(bars=bars)
+        self.days = []
+
+    def get_stock_data(self, stock_code, days=30):
+        self.days.append(days)
+        df = super().get_stock_data(stock_code, days)
+        return df[df['trade_date'] >= pd.Timestamp.now().normalize() - pd.Timedelta(days=days)]
+
+
+def test_fetch_reaches_watch_date():
+    dates = pd.bdate_range(end=pd.Timestamp.now().normalize() - pd.Timedelta(days=1), periods=400)
+    watch_date = dates[-300]
+
+    def bars(stock_code):
+        # 13 around the watch date, 10 for the last 200 sessions: 23% below the watch-date close
+        close = np.where(dates < dates[-200], 13.0, 10.0)
+        return pd.DataFrame({'ts_code': stock_code, 'trade_date': dates, 'open': close,
+                             'high': close, 'low': close, 'close': close})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, f"代码,名称,自选时间\n600000,浦发银行,{watch_date:%Y-%m-%d}\n", baseline_source='watch_date')
+        monitor = make_monitor(tmp, WindowClient(bars))
+        alerts = monitor.run_analysis(notify=False)
+        assert all([
+            check(f"fetch window sized from the watch date ({monitor._tushare_client.days} days)",
+                  monitor._tushare_client.days[0] >= (pd.Timestamp.now() - watch_date).days),
+            check("baseline alert from a watch date older than the default window",
+                  [a['stock_code'] for a in alerts if a['baseline_drop_alert']] == ['600000.SH']),
+        ])
+
+
+class StepClient(FakeMarketClient):
+    """Closes at 13 until 200 sessions ago and at 10 since"""
+
+    def get_daily_by_date(self, trade_date):
+        day = super().get_daily_by_date(trade_date)
+        if day is not None and pd.Timestamp(trade_date) < self.dates[-200]:
+            day[['open', 'high', 'low', 'close']] = 13.0
+        return day
+
+
+def test_snapshot_reaches_watch_date():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        client = StepClient(['600000.SH'], periods=600)
+        watch_date = client.dates[-500]
+        stocks = f"代码,名称,自选时间\n600000,浦发银行,{watch_date:%Y-%m-%d}\n"
+        snapshot_path = str(tmp / 'cache' / 'panel.snap')
+        # The snapshot is created for the default baseline, then a watch date before its first day is set
+        write_config(tmp, stocks, snapshot_path=snapshot_path)
+        make_monitor(tmp, client).run_analysis(notify=False)
+        write_config(tmp, stocks, snapshot_path=snapshot_path, baseline_source='watch_date')
+        monitor = make_monitor(tmp, client)
+        alerts = monitor.run_analysis(notify=False)
+        assert all([
+            check("snapshot extended back to the watch date",
+                  monitor._snapshot.dates[0] <= watch_date.to_datetime64().astype('datetime64[D]')),
+            check("baseline alert from a watch date older than the snapshot",
+                  [a['stock_code'] for a in alerts if a['baseline_drop_alert']] == ['600000.SH']),
+        ])
+
+
+if __name__ == "__main__":
+    run_tests("baseline", test_resolve_baselines, test_batch_matches_per_stock, test_watchlist_columns_end_to_end,
+              test_watch_price_after_split, test_fetch_reaches_watch_date, test_snapshot_reaches_watch_date)
@@ -0,0 +1,57 @@
+#!/usr/bin/env python3
+"""Test the per-trade-date daily bar cache: hits, misses and unpublished sessions"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import pandas as pd
+
+from daily_bar_cache import DailyBarCache
+from testkit import FakeMarketClient, check, run_tests
+
+CODES = ['600000.SH', '000001.SZ', '300001.SZ']
+
+
+def daily_requests(client: FakeMarketClient):
+    return [date for api, date in client.requests if api == 'daily']
+
+
+def test_hits_and_misses():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = FakeMarketClient(CODES, periods=10)
+        dates = client.dates.strftime('%Y%m%d').tolist()
+
+        first = DailyBarCache(client, tmp).get_panel(dates[:6])
+        first_requests = daily_requests(client)
+        # One new session on the next run
+        second = DailyBarCache(client, tmp).get_panel(dates[:7], stock_codes=['000001.SZ'])
+        cached = DailyBarCache(client, tmp).get_panel(dates, cached_only=True)
+        assert all([
+            check("each missing date fetched once", first_requests == dates[:6]),
+            check("only the new date is fetched afterwards", daily_requests(client) == dates[:7]),
+            check("panel covers every stock and date", len(first) == 6 * len(CODES)
+                  and first['trade_date'].dtype.kind == 'M'),
+            check("stock filter applied", set(second['ts_code']) == {'000001.SZ'} and len(second) == 7),
+            check("cached_only reads disk and fetches nothing",
+                  len(cached) == 7 * len(CODES) and daily_requests(client) == dates[:7]),
+        ])
+
+
+def test_unpublished_session():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = FakeMarketClient(CODES, periods=5)
+        today = (client.dates[-1] + pd.offsets.BDay()).strftime('%Y%m%d')
+        cache = DailyBarCache(client, tmp)
+        cache.get_panel([today])
+        cache.get_panel([today])
+        assert all([
+            check("a date without data is not cached", today not in cache.cached_dates()),
+            check("and is requested again next time", daily_requests(client) == [today, today]),
+        ])
+
+
+if __name__ == "__main__":
+    run_tests("daily bar cache", test_hits_and_misses, test_unpublished_session)
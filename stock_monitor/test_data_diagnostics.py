@@ -0,0 +1,133 @@
+#!/usr/bin/env python3
+"""Test data-health diagnostics on a cached panel"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+import pandas as pd
+
+from data_diagnostics import DataDiagnostics
+from stock_monitor import StockMonitor
+from testkit import check, run_tests, write_config
+
+CALENDAR = pd.bdate_range(end='2025-10-17', periods=120)
+
+
+def make_panel(codes):
+    n = len(CALENDAR)
+    return pd.DataFrame({
+        'ts_code': np.repeat(codes, n),
+        'trade_date': np.tile(CALENDAR, len(codes)),
+        'close': 10.0, 'open': 10.0, 'high': 10.5, 'low': 9.5
+    })
+
+
+def problem_panel():
+    panel = make_panel(['000001.SZ', '600000.SH', '300001.SZ', '688001.SH'])
+    suspended = (panel['ts_code'] == '600000.SH') & panel['trade_date'].isin(CALENDAR[50:55])
+    stale = (panel['ts_code'] == '300001.SZ') & (panel['trade_date'] > CALENDAR[-3])
+    new_listing = (panel['ts_code'] == '688001.SH') & (panel['trade_date'] < CALENDAR[-10])
+    return panel[~(suspended | stale | new_listing)].reset_index(drop=True)
+
+
+def test_checks():
+    diagnostics = DataDiagnostics('2025-09-30')
+    report = diagnostics.check(problem_panel(), CALENDAR, ['000001.SZ', '600000.SH', '300001.SZ', '688001.SH', '830001.BJ'])
+    summary = diagnostics.summarize(report, CALENDAR)
+
+    assert all([
+        check("healthy stock has full history", report.loc['000001.SZ', ['bars', 'gap_days', 'sessions_behind']].tolist() == [120, 0, 0]),
+        check("suspension shows up as calendar gaps", report.loc['600000.SH', 'gap_days'] == 5),
+        check("stale last date counted in sessions", report.loc['300001.SZ', 'sessions_behind'] == 2),
+        check("new listing lacks baseline and MA100 history",
+              not report.loc['688001.SH', 'has_baseline'] and not report.loc['688001.SH', 'mtr_drop_ready']
+              and not report.loc['688001.SH', 'boll_drop_ready']),
+        check("stock without cached bars reported", report.loc['830001.BJ', 'bars'] == 0),
+        check("summary counts", (summary['no_data'], summary['stale'], summary['with_gaps'], summary['missing_baseline'])
+              == (1, 1, 1, 2)),
+    ])
+
+
+def test_baseline_on_holiday():
+    # 10/04 is a Saturday: the baseline rule uses the Friday close
+    diagnostics = DataDiagnostics('2025-10-04')
+    report = diagnostics.check(problem_panel(), CALENDAR)
+    summary = diagnostics.summarize(report, CALENDAR)
+    assert all([
+        check("bar on or before a holiday baseline counts", report.loc['000001.SZ', 'has_baseline']),
+        check("only the new listing misses it", summary['missing_baseline'] == 1),
+    ])
+
+
+def test_speed():
+    codes = [f'{i:06d}.SZ' for i in range(5000)]
+    panel = make_panel(codes)
+    start = time.time()
+    diagnostics = DataDiagnostics('2025-09-30')
+    report = diagnostics.check(panel, CALENDAR, codes)
+    diagnostics.summarize(report, CALENDAR)
+    elapsed = time.time() - start
+    assert check(f"5000 stocks x {len(CALENDAR)} sessions checked in {elapsed:.3f}s", elapsed < 1 and len(report) == 5000)
+
+
+def write_daily_cache(tmp: Path):
+    daily_dir = tmp / 'cache' / 'daily'
+    daily_dir.mkdir(parents=True)
+    for trade_date, day in problem_panel().groupby('trade_date'):
+        day.assign(trade_date=trade_date.strftime('%Y%m%d')).to_csv(daily_dir / f"{trade_date:%Y%m%d}.csv", index=False)
+
+
+def test_monitor_makes_no_api_calls():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_daily_cache(tmp)
+
+        write_config(tmp, ['000001.SZ', '600000.SH'], email={})
+
+        monitor = StockMonitor(str(tmp / 'config.json'))
+        report = monitor.diagnose('watchlist')
+        assert all([
+            check("watchlist diagnosed from cache", sorted(report.index) == ['000001.SZ', '600000.SH']),
+            check("no API client was created", monitor._tushare_client is None),
+        ])
+
+
+def test_monitor_per_stock_baselines():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_daily_cache(tmp)
+        # The new listing was added after its first bar; 600000 long before the cached calendar
+        write_config(tmp, "代码,名称,自选时间\n688001,新股,2025-10-15\n600000,浦发银行,2024-01-05\n000001.SZ,平安银行,\n",
+                     email={}, baseline_source='watch_date')
+        monitor = StockMonitor(str(tmp / 'config.json'))
+        report = monitor.diagnose('watchlist')
+        summary = DataDiagnostics(monitor.analyzer.baseline_date).summarize(report, CALENDAR)
+        assert all([
+            check("watch date after the first bar has a baseline", report.loc['688001.SH', 'has_baseline']),
+            check("stock without a watch date uses the default", report.loc['000001.SZ', 'baseline_date']
+                  == pd.Timestamp(monitor.analyzer.baseline_date) and report.loc['000001.SZ', 'has_baseline']),
+            check("watch date before the cache is reported, not counted as missing",
+                  (summary['missing_baseline'], summary['baseline_uncached']) == (0, 1)),
+        ])
+
+
+def test_monitor_without_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, ['000001.SZ', '600000.SH'], email={})
+        try:
+            StockMonitor(str(tmp / 'config.json')).diagnose('watchlist')
+            message = ''
+        except RuntimeError as e:
+            message = str(e)
+        assert check(f"no cache to diagnose is an error: {message}", 'snapshot_path' in message)
+
+
+if __name__ == "__main__":
+    run_tests("diagnostics", test_checks, test_baseline_on_holiday, test_speed, test_monitor_makes_no_api_calls,
+              test_monitor_per_stock_baselines, test_monitor_without_cache)
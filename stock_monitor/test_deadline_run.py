@@ -0,0 +1,152 @@
+#!/usr/bin/env python3
+"""Test deadline-aware runs with prioritized symbol ordering"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+import pandas as pd
+
+from quota_ledger import QuotaExceeded
+from symbol_priority import prioritize, trigger_distance
+from testkit import DATES, FakeClient, check, make_monitor, run_tests, write_config
+
+CODES = [f'{600000 + i}.SH' for i in range(8)]
+CRASHING = {'600005.SH', '600001.SH'}  # close 30% below the 9/30 baseline
+MARKET_CAP = ['120亿', '80亿', '15亿', '3000万', '1.2万亿', '50亿', '2000亿', '']
+
+
+def previous_indicators() -> pd.DataFrame:
+    """Last run's indicators: 600005 is 0.8% from the baseline rule, 600003 12%"""
+    return pd.DataFrame({'trade_date': DATES[-2], 'close': 10.0, 'MA100': 9.0, 'MTR': np.nan,
+                         'BB_Upper': 11.0, 'baseline_price': [12.4, 11.0]},
+                        index=pd.Index(['600005.SH', '600003.SH'], name='ts_code'))
+
+
+def write_watchlist(tmp: Path):
+    rows = [f"{code},{cap}" for code, cap in zip(CODES, MARKET_CAP)]
+    write_config(tmp, "股票代码,总市值\n" + "\n".join(rows) + "\n",
+                 pipeline={"workers": 1, "queue_size": 1, "chunk_size": 1})
+
+
+def test_priority_order():
+    info = pd.DataFrame({'market_cap': [1.2e10, 8e9, 1.5e9, 3e7, 1.2e12, 5e9, 2e11, np.nan]},
+                        index=pd.Index(CODES, name='ts_code'))
+    distance = trigger_distance(previous_indicators())
+    ordered = prioritize(CODES, previous_indicators(), info)
+    assert all([
+        check(f"trigger distance from last close {distance.round(3).to_dict()}",
+              np.isclose(distance['600005.SH'], 0.008) and np.isclose(distance['600003.SH'], 0.12)),
+        check(f"closest to trigger first, then by market cap: {ordered}",
+              ordered == ['600005.SH', '600003.SH', '600004.SH', '600006.SH', '600000.SH',
+                          '600001.SH', '600002.SH', '600007.SH']),
+        check("no history keeps watchlist order", prioritize(CODES) == CODES),
+    ])
+
+
+def test_partial_then_follow_up():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_watchlist(tmp)
+        (tmp / 'cache').mkdir()
+        previous_indicators().to_csv(tmp / 'cache' / 'indicators_latest.csv')
+
+        monitor = make_monitor(tmp, FakeClient(CRASHING, delay=0.2))
+        # Sub-minute deadline instead of an 'HH:MM' one
+        deadline_at = time.time() + 0.5
+        monitor._deadline_timestamp = lambda deadline: deadline_at
+
+        alerts = monitor.run_analysis(deadline='23:59')
+        monitor.wait_for_notifications()
+        sent = [(codes, call['label'], call['note'])
+                for codes, call in zip(monitor._email_notifier.sent, monitor._email_notifier.calls)]
+        partial_codes, partial_label, partial_note = sent[0] if sent else ([], None, None)
+        follow_codes, follow_label, _ = sent[1] if len(sent) > 1 else ([], None, None)
+        remembered = pd.read_csv(tmp / 'cache' / 'indicators_latest.csv', index_col='ts_code')
+
+        assert all([
+            check(f"fetched closest-to-trigger stock first: {monitor._tushare_client.fetched[:3]}",
+                  monitor._tushare_client.fetched[:2] == ['600005.SH', '600003.SH']),
+            check(f"partial email at the deadline labelled '{partial_label}'",
+                  partial_codes == ['600005.SH'] and partial_label.startswith("部分结果")
+                  and "截止时间" in partial_note),
+            check(f"follow-up email with the rest labelled '{follow_label}'",
+                  follow_codes == ['600001.SH'] and follow_label == "补充结果"),
+            check("exactly two emails", len(sent) == 2),
+            check("every stock fetched once", sorted(monitor._tushare_client.fetched) == CODES),
+            check("all alerts returned in watchlist order",
+                  [a['stock_code'] for a in alerts] == ['600001.SH', '600005.SH']),
+            check("indicators saved for the next run's ordering", sorted(remembered.index) == CODES),
+        ])
+
+
+class QuotaClient(FakeClient):
+    """Runs out of quota after `allowed` fetches"""
+
+    def __init__(self, allowed: int):
+        super().__init__(CRASHING, delay=0.2)
+        self.allowed = allowed
+
+    def get_stock_data(self, stock_code, days=30):
+        if len(self.fetched) >= self.allowed:
+            raise QuotaExceeded("No API request slot available within 300s")
+        return super().get_stock_data(stock_code, days)
+
+
+def test_quota_runs_out_after_deadline():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_watchlist(tmp)
+        (tmp / 'cache').mkdir()
+        previous_indicators().to_csv(tmp / 'cache' / 'indicators_latest.csv')
+
+        # The deadline passes after two or three stocks, the quota during the follow-up
+        first = make_monitor(tmp, QuotaClient(allowed=5))
+        deadline_at = time.time() + 0.5
+        first._deadline_timestamp = lambda deadline: deadline_at
+        try:
+            first.run_analysis(deadline='23:59')
+            raised = False
+        except QuotaExceeded:
+            raised = True
+        first.wait_for_notifications()
+
+        second = make_monitor(tmp, FakeClient(CRASHING))
+        alerts = second.run_analysis(resume=True)
+        second.wait_for_notifications()
+        assert all([
+            check("quota running out during the follow-up stops the run", raised),
+            check(f"quota email after the deadline one, without repeating it: {first._email_notifier.sent}",
+                  first._email_notifier.sent[0] == ['600005.SH']
+                  and all(call['label'].startswith("部分结果") for call in first._email_notifier.calls)
+                  and "配额" in first._email_notifier.calls[-1]['note']),
+            check(f"--resume fetches only the stocks left: {second._tushare_client.fetched}",
+                  sorted(second._tushare_client.fetched + first._tushare_client.fetched) == CODES),
+            check("every alert sent exactly once",
+                  sorted(sum(first._email_notifier.sent + second._email_notifier.sent, [])) == sorted(CRASHING)),
+            check("--resume returns every alert", [a['stock_code'] for a in alerts] == ['600001.SH', '600005.SH']),
+        ])
+
+
+def test_no_deadline_single_email():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_watchlist(tmp)
+        monitor = make_monitor(tmp, FakeClient(CRASHING))
+        monitor.run_analysis()
+        monitor.wait_for_notifications()
+        assert all([
+            check("one unlabelled email without a deadline",
+                  monitor._email_notifier.sent == [sorted(CRASHING)]
+                  and monitor._email_notifier.calls[0]['label'] is None),
+            check("watchlist order kept without a deadline", monitor._tushare_client.fetched == CODES),
+        ])
+
+
+if __name__ == "__main__":
+    run_tests("deadline run", test_priority_order, test_partial_then_follow_up, test_quota_runs_out_after_deadline,
+              test_no_deadline_single_email)
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""Test the daemon's query API, same-day reloads and startup failures"""
+
+import json
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from pathlib import Path
+from types import SimpleNamespace
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import pandas as pd
+
+from monitor_daemon import MonitorDaemon
+from testkit import check, run_tests
+
+SESSION = '2025-10-17'
+
+
+class FakeMonitor:
+    """StockMonitor stand-in: run_analysis returns the next scripted alert list or raises a scripted exception"""
+
+    def __init__(self, results, watchlist: Path = None):
+        self.results = list(results)
+        self.calls = []
+        self.alerted = []
+        self.config = SimpleNamespace(run_time='15:30')
+        self.watchlist_set = SimpleNamespace(paths=lambda: [str(watchlist)] if watchlist else [])
+
+    def run_analysis(self, notify=True, **options):
+        self.calls.append(notify)
+        result = self.results.pop(0) if len(self.results) > 1 else self.results[0]
+        if isinstance(result, Exception):
+            raise result
+        self.alerted = result
+        return [{'stock_code': code, 'trade_date': SESSION, 'current_price': 7.0} for code in result]
+
+    def latest_indicators(self):
+        codes = ['000001.SZ', '600000.SH', '600519.SH']
+        return pd.DataFrame({'trade_date': pd.Timestamp(SESSION), 'close': [7.0 if c in self.alerted else 10.0
+                                                                           for c in codes],
+                             'MA100': float('nan')}, index=pd.Index(codes, name='ts_code'))
+
+
+def test_queries():
+    daemon = MonitorDaemon(FakeMonitor([['600000.SH']]), port=0)
+    daemon.refresh(notify=False)
+    daemon.start()
+    try:
+        url = f"http://127.0.0.1:{daemon._server.server_address[1]}"
+        with urllib.request.urlopen(f"{url}/analyze?code=600000.SH") as response:
+            analyze = json.loads(response.read())
+        try:
+            urllib.request.urlopen(f"{url}/analyze?code=999999.SZ")
+            status = 200
+        except urllib.error.HTTPError as e:
+            status = e.code
+        _, alerts = daemon.handle_query('/alerts')
+        _, health = daemon.handle_query('/health')
+    finally:
+        daemon.stop()
+    assert all([
+        check("/analyze returns indicators and the alert",
+              analyze['alert']['stock_code'] == '600000.SH' and analyze['indicators']['MA100'] is None),
+        check("unknown stock is a 404", status == 404),
+        check("/alerts defaults to the latest date", alerts['date'] == SESSION and alerts['count'] == 1),
+        check("/health reports the state", health['stocks'] == 3 and health['alerts'] == 1),
+    ])
+
+
+def test_same_day_reload():
+    monitor = FakeMonitor([['600000.SH', '600519.SH'], ['600000.SH'], []])
+    daemon = MonitorDaemon(monitor)
+    daemon.alerts_by_date['2025-10-16'] = {'000001.SZ': {'stock_code': '000001.SZ'}}
+
+    daemon.refresh(notify=False)
+    daemon.refresh(notify=False)
+    _, reloaded = daemon.handle_query(f'/alerts?date={SESSION}')
+    daemon.refresh(notify=False)
+    _, cleared = daemon.handle_query(f'/alerts?date={SESSION}')
+    _, earlier = daemon.handle_query('/alerts?date=2025-10-16')
+    assert all([
+        check("alert that stopped firing is dropped for the date",
+              [a['stock_code'] for a in reloaded['alerts']] == ['600000.SH']),
+        check("a reload without alerts clears the date", cleared['count'] == 0),
+        check("other dates are kept", earlier['count'] == 1),
+    ])
+
+
+def test_startup_failure_is_retried():
+    with tempfile.TemporaryDirectory() as tmp:
+        watchlist = Path(tmp) / 'stocks.csv'
+        watchlist.write_text("股票代码\n600000.SH\n")
+        monitor = FakeMonitor([ConnectionError("api.tushare.pro unreachable"), ['600000.SH']], watchlist)
+        daemon = MonitorDaemon(monitor, port=0, reload_interval=0.01, retry_interval=0)
+        thread = threading.Thread(target=daemon.serve_forever, daemon=True)
+        thread.start()
+
+        deadline = time.time() + 10
+        while daemon.last_refresh is None and time.time() < deadline:
+            time.sleep(0.01)
+        daemon.shutdown()
+        thread.join(timeout=10)
+    assert all([
+        check("daemon survives a failed startup refresh and retries it",
+              len(monitor.calls) >= 2 and daemon.last_refresh is not None and '600000.SH' in daemon.triggers),
+        check("startup refresh sends no email", not any(monitor.calls)),
+        check("shutdown stops the loop and the server", not thread.is_alive() and daemon._server is None),
+    ])
+
+
+if __name__ == "__main__":
+    run_tests("monitor daemon", test_queries, test_same_day_reload, test_startup_failure_is_retried)
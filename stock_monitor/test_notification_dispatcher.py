@@ -0,0 +1,211 @@
+#!/usr/bin/env python3
+"""Test the multi-channel notification dispatcher against local stand-in receivers"""
+
+import json
+import os
+import socket
+import socketserver
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+
+from email_notifier import EmailNotifier
+from notification_dispatcher import EmailChannel, NotificationDispatcher, SocketChannel, WebhookChannel
+from testkit import check, run_tests
+
+ALERTS = [
+    {'stock_code': '600000.SH', 'close_price': np.float64(7.0), 'trade_date': '2025-10-17',
+     'baseline_drop_alert': {'baseline_date': '2025-09-30', 'baseline_price': 10.0,
+                             'current_price': 7.0, 'drop_percentage': -30.0},
+     'mtr_drop_alert': None, 'boll_drop_alert': None},
+    {'stock_code': '300959.SZ', 'close_price': 30.5, 'trade_date': '2025-10-17',
+     'baseline_drop_alert': None, 'mtr_drop_alert': None,
+     'boll_drop_alert': {'previous_close': 33.0, 'previous_bb_upper': 32.0,
+                         'current_close': 30.5, 'drop_percentage': -7.6}},
+]
+
+
+class SMTPStandIn(socketserver.StreamRequestHandler):
+    """Just enough SMTP for smtplib: EHLO, AUTH, MAIL, RCPT, DATA, QUIT"""
+    greeting_delay = 0
+    messages = []
+
+    def reply(self, line: str):
+        self.wfile.write((line + '\r\n').encode())
+
+    def handle(self):
+        time.sleep(self.greeting_delay)
+        self.reply('220 stand-in ESMTP')
+        while True:
+            line = self.rfile.readline().decode().strip()
+            command = line.split(' ')[0].upper()
+            if command == 'EHLO':
+                self.reply('250-stand-in')
+                self.reply('250 AUTH PLAIN LOGIN')
+            elif command == 'AUTH':
+                self.reply('235 2.7.0 Authentication successful')
+            elif command in ('MAIL', 'RCPT', 'RSET', 'NOOP'):
+                self.reply('250 OK')
+            elif command == 'DATA':
+                self.reply('354 End data with <CR><LF>.<CR><LF>')
+                data = []
+                while (line := self.rfile.readline()) not in (b'.\r\n', b''):
+                    data.append(line)
+                SMTPStandIn.messages.append(b''.join(data))
+                self.reply('250 OK queued')
+            elif command == 'QUIT' or not line:
+                self.reply('221 Bye')
+                return
+            else:
+                self.reply('502 Command not implemented')
+
+
+class SlowSMTPStandIn(SMTPStandIn):
+    greeting_delay = 3
+
+
+class WebhookStandIn(BaseHTTPRequestHandler):
+    """Chat-robot webhook; fails the first `fail_first` posts with HTTP 500"""
+    received = []
+    received_at = []
+    fail_first = 0
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        if WebhookStandIn.fail_first > 0:
+            WebhookStandIn.fail_first -= 1
+            self.send_response(500)
+            self.end_headers()
+            return
+        WebhookStandIn.received.append(body)
+        WebhookStandIn.received_at.append(time.time())
+        payload = b'{"errcode": 0, "errmsg": "ok"}'
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+class SocketStandIn(socketserver.StreamRequestHandler):
+    lines = []
+
+    def handle(self):
+        SocketStandIn.lines.append(self.rfile.read().decode('utf-8'))
+
+
+def serve(server):
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def test_every_channel_delivers():
+    SMTPStandIn.messages.clear()
+    WebhookStandIn.received.clear()
+    SocketStandIn.lines.clear()
+    smtp = serve(socketserver.ThreadingTCPServer(('127.0.0.1', 0), SMTPStandIn))
+    webhook = serve(ThreadingHTTPServer(('127.0.0.1', 0), WebhookStandIn))
+
+    with tempfile.TemporaryDirectory() as tmp:
+        socket_path = os.path.join(tmp, 'alerts.sock')
+        unix = serve(socketserver.ThreadingUnixStreamServer(socket_path, SocketStandIn))
+        email = EmailNotifier('127.0.0.1', smtp.server_address[1], 'me@example.com', 'x',
+                              ['me@example.com'], use_tls=False, timeout=2)
+        dispatcher = NotificationDispatcher.from_config([
+            {'type': 'email', 'retries': 0},
+            {'type': 'webhook', 'url': f'http://127.0.0.1:{webhook.server_address[1]}/robot', 'format': 'wecom'},
+            {'type': 'webhook', 'url': f'http://127.0.0.1:{webhook.server_address[1]}/robot', 'format': 'dingtalk'},
+            {'type': 'file', 'path': os.path.join(tmp, 'out', 'alerts.jsonl')},
+            {'type': 'socket', 'path': socket_path},
+        ], email)
+        ok = dispatcher.send_alert(ALERTS, watchlist_name='核心', label='部分结果 3/8', note='截止时间已到')
+        file_record = json.loads(Path(tmp, 'out', 'alerts.jsonl').read_text().splitlines()[0])
+        time.sleep(0.1)
+        unix.shutdown()
+    smtp.shutdown()
+    webhook.shutdown()
+
+    contents = sorted(WebhookStandIn.received, key=lambda body: 'title' in body['markdown'])
+    wecom, dingtalk = (contents + [None, None])[:2]
+    socket_record = json.loads(SocketStandIn.lines[0]) if SocketStandIn.lines else {}
+    assert all([
+        check(f"all channels delivered {dispatcher.last_results}",
+              ok and list(dispatcher.last_results) == ['email', 'webhook', 'webhook2', 'file', 'socket']),
+        check("SMTP stand-in got the HTML email",
+              len(SMTPStandIn.messages) == 1 and b'text/html' in SMTPStandIn.messages[0]),
+        check("WeCom markdown lists each stock and the note",
+              wecom is not None and wecom['msgtype'] == 'markdown'
+              and '600000.SH' in wecom['markdown']['content'] and '较9/30跌30.0%' in wecom['markdown']['content']
+              and '截止时间已到' in wecom['markdown']['content']),
+        check("DingTalk payload has a title with the watchlist and label",
+              dingtalk is not None and '[核心] (部分结果 3/8)' in dingtalk['markdown']['title']),
+        check("file channel appends a JSON line with the alerts",
+              [a['stock_code'] for a in file_record['alerts']] == ['600000.SH', '300959.SZ']
+              and file_record['alerts'][0]['close_price'] == 7.0),
+        check("Unix socket receiver got the same record", socket_record.get('alerts') == file_record['alerts']),
+    ])
+
+
+def test_slow_smtp_does_not_delay_others():
+    WebhookStandIn.received.clear()
+    WebhookStandIn.received_at.clear()
+    slow_smtp = serve(socketserver.ThreadingTCPServer(('127.0.0.1', 0), SlowSMTPStandIn))
+    slow_smtp.daemon_threads = True
+    webhook = serve(ThreadingHTTPServer(('127.0.0.1', 0), WebhookStandIn))
+
+    email = EmailNotifier('127.0.0.1', slow_smtp.server_address[1], 'me@example.com', 'x',
+                          ['me@example.com'], use_tls=False, timeout=0.5)
+    dispatcher = NotificationDispatcher([
+        EmailChannel(email, retries=1, backoff=0.1),
+        WebhookChannel(f'http://127.0.0.1:{webhook.server_address[1]}/robot', timeout=2),
+    ])
+    start = time.time()
+    ok = dispatcher.send_alert(ALERTS)
+    elapsed = time.time() - start
+    webhook_latency = WebhookStandIn.received_at[0] - start if WebhookStandIn.received_at else None
+    slow_smtp.shutdown()
+    webhook.shutdown()
+
+    assert all([
+        check(f"webhook delivered after {webhook_latency:.2f}s despite a stalled SMTP server"
+              if webhook_latency is not None else "webhook delivered", webhook_latency is not None
+              and webhook_latency < 0.5),
+        check(f"SMTP gave up after its own timeout and one retry ({elapsed:.2f}s)", 1.0 < elapsed < 2.5),
+        check(f"failure reported per channel {dispatcher.last_results}",
+              not ok and dispatcher.last_results == {'email': False, 'webhook': True}),
+    ])
+
+
+def test_retry_and_errors():
+    WebhookStandIn.received.clear()
+    WebhookStandIn.fail_first = 2
+    webhook = serve(ThreadingHTTPServer(('127.0.0.1', 0), WebhookStandIn))
+    url = f'http://127.0.0.1:{webhook.server_address[1]}/robot'
+
+    with tempfile.TemporaryDirectory() as tmp:
+        dispatcher = NotificationDispatcher([
+            WebhookChannel(url, retries=2, backoff=0.05),
+            SocketChannel(os.path.join(tmp, 'nobody-listening.sock'), retries=1, backoff=0.05),
+        ])
+        dispatcher.send_alert(ALERTS)
+    webhook.shutdown()
+
+    assert all([
+        check("webhook retried past two server errors",
+              dispatcher.last_results['webhook'] and len(WebhookStandIn.received) == 1),
+        check("missing socket receiver reported as failed", dispatcher.last_results['socket'] is False),
+    ])
+
+
+if __name__ == "__main__":
+    run_tests("notification dispatcher", test_every_channel_delivers, test_slow_smtp_does_not_delay_others, test_retry_and_errors)
@@ -0,0 +1,156 @@
+#!/usr/bin/env python3
+"""Test the durable notification outbox and its background sender"""
+
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import pandas as pd
+
+from notification_dispatcher import Channel, NotificationDispatcher, build_message
+from notification_outbox import NotificationOutbox, OutboxSender
+from testkit import FakeClient, RecordingNotifier, check, make_monitor, run_tests, write_config
+
+CODES = [f'{600000 + i}.SH' for i in range(6)]
+CRASHING = {'600001.SH', '600004.SH'}
+
+
+class CountingChannel(Channel):
+    kind = 'counting'
+
+    def __init__(self, **options):
+        super().__init__(**options)
+        self.delivered = []
+        self._lock = threading.Lock()
+
+    deliver_time = 0.01
+
+    def deliver(self, message):
+        time.sleep(self.deliver_time)
+        with self._lock:
+            self.delivered.append(message['note'])
+
+
+def test_delivery_off_the_analysis_path():
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, "代码,名称,所属行业\n" + "\n".join(f"{c},股票{i},银行" for i, c in enumerate(CODES)),
+                     notifications={"channels": [
+                         {"type": "email", "retries": 1, "backoff": 0.05},
+                         {"type": "file", "path": str(tmp / 'alerts.jsonl')}]})
+
+        # SMTP is down and slow: the run still returns right after the outbox commit
+        first = make_monitor(tmp, FakeClient(CRASHING, session='20251017'), RecordingNotifier(up=False, delay=0.5))
+        start = time.time()
+        first.run_analysis()
+        returned_after = time.time() - start
+        pending_at_return = first.outbox_sender.outbox.pending()
+        first.wait_for_notifications()
+        results.append(check(f"run returned in {returned_after:.2f}s with the message queued {pending_at_return}",
+                             returned_after < 1.0 and pending_at_return.get('email') == 1))
+        results.append(check("file channel delivered while SMTP kept failing",
+                             len((tmp / 'alerts.jsonl').read_text().splitlines()) == 1))
+        results.append(check("undelivered email kept in the outbox", first.outbox_sender.outbox.pending() == {'email': 1}))
+
+        # Next run for the same session has nothing new to send, but re-sends the stuck email
+        smtp = RecordingNotifier()
+        second = make_monitor(tmp, FakeClient(CRASHING, session='20251017'), smtp)
+        second.run_analysis()
+        second.wait_for_notifications()
+        sectors = smtp.calls[0]['sectors'] if smtp.calls else None
+        results.append(check("next run re-sent the stuck email once", smtp.sent == [sorted(CRASHING)]))
+        results.append(check("sector table survives the outbox", isinstance(sectors, pd.DataFrame)
+                             and sectors.loc['银行', 'alerts'] == len(CRASHING)))
+        results.append(check("file channel not sent twice",
+                             len((tmp / 'alerts.jsonl').read_text().splitlines()) == 1))
+        results.append(check("outbox empty", second.outbox_sender.outbox.pending() == {}))
+    assert all(results)
+
+
+def test_concurrent_drains_send_once():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'outbox.sqlite')
+        channel = CountingChannel()
+        dispatcher = NotificationDispatcher([channel])
+        outbox = NotificationOutbox(path)
+        for i in range(50):
+            outbox.enqueue(build_message([{'stock_code': '600000.SH'}], note=f'message {i}'), ['counting'])
+
+        # Two processes' senders draining the same outbox file
+        senders = [OutboxSender(NotificationOutbox(path), dispatcher) for _ in range(2)]
+        threads = [threading.Thread(target=sender.drain) for sender in senders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        assert all([
+            check(f"each of 50 messages delivered exactly once ({len(channel.delivered)} deliveries)",
+                  sorted(channel.delivered) == sorted(f'message {i}' for i in range(50))),
+            check("nothing left pending", outbox.pending() == {}),
+        ])
+
+
+def test_leases_outlive_a_slow_backlog():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'outbox.sqlite')
+        channel = CountingChannel()
+        channel.deliver_time = 0.05
+        outbox = NotificationOutbox(path)
+        for i in range(10):
+            outbox.enqueue(build_message([{'stock_code': '600000.SH'}], note=f'message {i}'), ['counting'])
+
+        # The backlog takes 0.5s to send but a lease is only 0.15s: leases must be per message
+        senders = [OutboxSender(NotificationOutbox(path), NotificationDispatcher([channel]), lease=0.15)
+                   for _ in range(2)]
+        threads = [threading.Thread(target=sender.drain) for sender in senders]
+        for thread in threads:
+            thread.start()
+            time.sleep(0.2)
+        for thread in threads:
+            thread.join()
+
+        assert all([
+            check(f"no message sent twice ({len(channel.delivered)} deliveries)",
+                  channel.delivered == [f'message {i}' for i in range(10)]),
+            check("nothing left pending", outbox.pending() == {}),
+        ])
+
+
+def test_failed_channel_keeps_order():
+    class DownChannel(CountingChannel):
+        kind = 'down'
+        up = False
+
+        def deliver(self, message):
+            if not self.up:
+                raise ConnectionError("connection refused")
+            super().deliver(message)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        down = DownChannel(retries=0)
+        outbox = NotificationOutbox(str(Path(tmp) / 'outbox.sqlite'), max_attempts=3)
+        sender = OutboxSender(outbox, NotificationDispatcher([down]))
+        sender.submit(build_message([{'stock_code': '600000.SH'}], note='partial'))
+        sender.submit(build_message([{'stock_code': '600001.SH'}], note='follow-up'))
+        sender.join()
+        kept = outbox.pending()
+
+        down.up = True
+        sender.wake()
+        sender.join()
+        assert all([
+            check(f"both messages kept while the channel is down {kept}", kept == {'down': 2}),
+            check(f"delivered in submission order once back up {down.delivered}",
+                  down.delivered == ['partial', 'follow-up']),
+        ])
+
+
+if __name__ == "__main__":
+    run_tests("notification outbox", test_delivery_off_the_analysis_path, test_concurrent_drains_send_once,
+              test_leases_outlive_a_slow_backlog, test_failed_channel_keeps_order)
@@ -0,0 +1,163 @@
+#!/usr/bin/env python3
+"""Test the memory-mapped panel snapshot: reopen, in-place appends, crash safety and rewrites"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+import pandas as pd
+
+from panel_snapshot import PanelSnapshot
+from price_panel import PricePanel
+from testkit import check, run_tests
+
+DATES = pd.bdate_range('2025-09-01', periods=20)
+CODES = ['000001.SZ', '600000.SH', '600519.SH']
+
+
+def day_bars(codes, dates) -> pd.DataFrame:
+    """One bar per stock and date; close encodes both so every cell is distinguishable"""
+    rows = [(code, date, int(code[:6]) % 97 + date.dayofyear / 100) for code in codes for date in dates]
+    frame = pd.DataFrame(rows, columns=['ts_code', 'trade_date', 'close'])
+    return frame.assign(open=frame['close'], high=frame['close'] * 1.01, low=frame['close'] * 0.99)
+
+
+def same_prices(frame: pd.DataFrame, expected: pd.DataFrame) -> bool:
+    frame = frame.sort_values(['ts_code', 'trade_date']).reset_index(drop=True)
+    expected = expected.sort_values(['ts_code', 'trade_date']).reset_index(drop=True)
+    return (len(frame) == len(expected)
+            and (frame['ts_code'] == expected['ts_code']).all()
+            and (frame['trade_date'] == expected['trade_date']).all()
+            and np.allclose(frame['close'], expected['close'], rtol=1e-6))
+
+
+def create(tmp: str, codes=CODES, dates=DATES[:-1], capacity=None) -> PanelSnapshot:
+    prices = PricePanel.from_frame(day_bars(codes, dates))
+    return PanelSnapshot.create(Path(tmp) / 'panel.snap', prices, capacity=capacity)
+
+
+def test_create_and_reopen():
+    with tempfile.TemporaryDirectory() as tmp:
+        create(tmp).close()
+        snapshot = PanelSnapshot.open(Path(tmp) / 'panel.snap')
+        frame = snapshot.to_frame()
+        recent = snapshot.to_frame(['600000.SH'], start_date=DATES[15])
+        assert all([
+            check("reopened snapshot has every stock and day",
+                  snapshot.codes == CODES and snapshot.n_dates == len(DATES) - 1),
+            check("prices survive the round trip", same_prices(frame, day_bars(CODES, DATES[:-1]))),
+            check("to_frame(start_date=...) returns only later days of the requested stock",
+                  same_prices(recent, day_bars(['600000.SH'], DATES[15:-1]))),
+        ])
+        snapshot.close()
+
+
+def test_append_in_place():
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = create(tmp)
+        # Already stored days are ignored, only the new session is written
+        appended = snapshot.append(day_bars(CODES, DATES[-3:]))
+        same_object = appended is snapshot
+        appended.close()
+
+        reopened = PanelSnapshot.open(Path(tmp) / 'panel.snap')
+        assert all([
+            check("append without new stocks writes in place", same_object),
+            check("new day committed and visible after reopen",
+                  reopened.n_dates == len(DATES) and same_prices(reopened.to_frame(), day_bars(CODES, DATES))),
+        ])
+        reopened.close()
+
+
+def test_crash_before_commit():
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = create(tmp)
+
+        def crash(n_dates, slot):
+            raise OSError("killed before the commit word was written")
+
+        snapshot._publish = crash
+        try:
+            snapshot.append(day_bars(CODES, DATES[-1:]))
+        except OSError:
+            pass
+        snapshot.close()
+
+        reopened = PanelSnapshot.open(Path(tmp) / 'panel.snap')
+        frame = reopened.to_frame()
+        assert all([
+            check("uncommitted day is not counted", reopened.n_dates == len(DATES) - 1),
+            check("readers never see the partial day",
+                  frame['trade_date'].max() == DATES[-2] and same_prices(frame, day_bars(CODES, DATES[:-1]))),
+        ])
+
+        # The next append overwrites the partial day and commits it
+        reopened.close()
+        snapshot = PanelSnapshot.open(Path(tmp) / 'panel.snap', writable=True)
+        snapshot.append(day_bars(CODES, DATES[-1:])).close()
+        reopened = PanelSnapshot.open(Path(tmp) / 'panel.snap')
+        assert check("retried append commits the day", reopened.n_dates == len(DATES))
+        reopened.close()
+
+
+def test_rewrite_for_new_stock():
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = create(tmp)
+        listed = '688001.SH'
+        # The new stock's frame also covers days the snapshot already has
+        day_panel = pd.concat([day_bars(CODES, DATES[-1:]), day_bars([listed], DATES[-5:])], ignore_index=True)
+        rewritten = snapshot.append(day_panel)
+        new_object = rewritten is not snapshot
+        rewritten.close()
+
+        reopened = PanelSnapshot.open(Path(tmp) / 'panel.snap')
+        new_stock = reopened.to_frame([listed])
+        expected = day_bars([listed], DATES[-5:])
+        assert all([
+            check("a new stock rewrites the file", new_object and reopened.codes == CODES + [listed]),
+            check("existing stocks keep their history",
+                  same_prices(reopened.to_frame(CODES), day_bars(CODES, DATES))),
+            check("new stock's earlier stored days are back-filled", same_prices(new_stock, expected)),
+        ])
+        reopened.close()
+
+
+def test_rewrite_when_capacity_runs_out():
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = create(tmp, dates=DATES[:10], capacity=1)
+        capacity = snapshot.capacity
+        more = pd.bdate_range(DATES[10], periods=capacity)
+        grown = snapshot.append(day_bars(CODES, more))
+        assert all([
+            check("full capacity triggers a rewrite", grown is not snapshot and grown.capacity > capacity),
+            check("all days kept after growing", grown.n_dates == 10 + len(more)),
+        ])
+        grown.close()
+
+
+def test_prepend_older_days():
+    with tempfile.TemporaryDirectory() as tmp:
+        snapshot = create(tmp, dates=DATES[10:])
+        listed = '688001.SH'
+        # Older sessions, one of them for a stock the snapshot does not have yet
+        older = pd.concat([day_bars(CODES, DATES[:10]), day_bars([listed], DATES[8:10])], ignore_index=True)
+        extended = snapshot.prepend(older)
+        unchanged = extended.prepend(day_bars(CODES, DATES[10:12]))
+        assert all([
+            check("older days extend the date axis", extended.n_dates == len(DATES)
+                  and extended.dates[0] == DATES[0].to_datetime64().astype('datetime64[D]')),
+            check("stored and prepended bars both read back",
+                  same_prices(extended.to_frame(CODES), day_bars(CODES, DATES))),
+            check("a stock only in the older days is added",
+                  same_prices(extended.to_frame([listed]), day_bars([listed], DATES[8:10]))),
+            check("days already stored are left alone", unchanged is extended),
+        ])
+        extended.close()
+
+
+if __name__ == "__main__":
+    run_tests("panel snapshot", test_create_and_reopen, test_append_in_place, test_crash_before_commit,
+              test_rewrite_for_new_stock, test_rewrite_when_capacity_runs_out, test_prepend_older_days)
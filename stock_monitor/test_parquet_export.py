@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""Test the partitioned Parquet export of alerts and indicators"""
+
+import sys
+import tempfile
+from datetime import datetime
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+import pandas as pd
+
+from parquet_exporter import ParquetExporter
+from stock_analyzer import StockAnalyzer
+from testkit import check, run_tests
+
+
+def make_panel(end: str) -> pd.DataFrame:
+    dates = pd.bdate_range(end=end, periods=120)
+    frames = []
+    for code, last_close in [('300959.SZ', 10.0), ('600846.SH', 7.0)]:
+        close = np.full(len(dates), 10.0)
+        close[-1] = last_close  # 600846.SH falls 30% below its 9/30 close
+        frames.append(pd.DataFrame({'ts_code': code, 'trade_date': dates, 'open': close,
+                                    'high': close * 1.01, 'low': close * 0.99, 'close': close}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_export_and_scan():
+    import pyarrow.parquet as pq
+
+    analyzer = StockAnalyzer()
+    with tempfile.TemporaryDirectory() as tmp:
+        exporter = ParquetExporter(tmp)
+        for end, run_at in [('2025-10-16', datetime(2025, 10, 16, 15, 30)),
+                            ('2025-10-17', datetime(2025, 10, 17, 15, 30))]:
+            panel = make_panel(end)
+            alerts = analyzer.analyze_panel(panel)
+            written = exporter.export(alerts, analyzer.latest_indicators(panel), run_at=run_at)
+
+        partitions = sorted(p.name for p in (Path(tmp) / 'indicators').iterdir())
+        indicators = pd.read_parquet(Path(tmp) / 'indicators', filters=[('trade_date', '=', '2025-10-17')])
+        alerts = pd.read_parquet(Path(tmp) / 'alerts')
+        row = indicators.set_index('ts_code').loc['600846.SH']
+
+        assert all([
+            check("rows written per run", written == {'alerts': 1, 'indicators': 2}),
+            check("indicators partitioned by trade date",
+                  partitions == ['trade_date=2025-10-16', 'trade_date=2025-10-17']),
+            check("partition filter reads one day", len(indicators) == 2),
+            check("indicator columns exported",
+                  {'MA100', 'MTR', 'BB_Upper', 'BB_Lower', 'baseline_ratio'} <= set(indicators.columns)),
+            check("baseline ratio computed", abs(row['baseline_ratio'] - 0.7) < 1e-9),
+            check("runs append instead of overwrite", len(alerts) == 2 and alerts['baseline_drop'].all()),
+            check("files are zstd compressed",
+                  all(pq.ParquetFile(f).metadata.row_group(0).column(0).compression == 'ZSTD'
+                      for f in (Path(tmp) / 'alerts').rglob('*.parquet'))),
+        ])
+
+
+if __name__ == "__main__":
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        print("pyarrow is not installed; skipping Parquet export tests")
+        sys.exit(0)
+
+    run_tests("Parquet export", test_export_and_scan)
@@ -0,0 +1,124 @@
+#!/usr/bin/env python3
+"""Test forward/backward adjustment across a split and the cached adjustment factors"""
+
+import logging
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+import pandas as pd
+
+from price_adjuster import PriceAdjuster
+from testkit import check, run_tests
+
+DATES = pd.bdate_range('2025-10-06', periods=10)
+SPLIT = 5  # 2-for-1 split before the sixth session
+
+
+def raw_panel() -> pd.DataFrame:
+    """600000.SH trades at 20 and then 10 after the split; 000001.SZ has no corporate action"""
+    split = np.where(np.arange(len(DATES)) < SPLIT, 20.0, 10.0)
+    return pd.concat([
+        pd.DataFrame({'ts_code': '600000.SH', 'trade_date': DATES, 'open': split, 'high': split,
+                      'low': split, 'close': split}),
+        pd.DataFrame({'ts_code': '000001.SZ', 'trade_date': DATES, 'open': 12.0, 'high': 12.0,
+                      'low': 12.0, 'close': 12.0}),
+    ], ignore_index=True)
+
+
+class FactorClient:
+    """Serves adj_factor by date; 600000.SH's factor doubles at the split, the newest date can be left out"""
+
+    def __init__(self, missing=()):
+        self.missing = set(missing)
+        self.requested = []
+
+    def get_adj_factor_by_date(self, trade_date):
+        self.requested.append(trade_date)
+        if trade_date in self.missing:
+            return None
+        after_split = pd.Timestamp(trade_date) >= DATES[SPLIT]
+        return pd.DataFrame({'ts_code': ['600000.SH', '000001.SZ'], 'trade_date': trade_date,
+                             'adj_factor': [2.0 if after_split else 1.0, 1.0]})
+
+
+def closes(panel: pd.DataFrame, code: str) -> np.ndarray:
+    return panel.loc[panel['ts_code'] == code, 'close'].to_numpy()
+
+
+def test_qfq_and_hfq():
+    with tempfile.TemporaryDirectory() as tmp:
+        adjuster = PriceAdjuster(FactorClient(), tmp)
+        qfq, _ = adjuster.adjust_panel(raw_panel(), 'qfq')
+        hfq, _ = adjuster.adjust_panel(raw_panel(), 'hfq')
+        try:
+            adjuster.adjust_panel(raw_panel(), 'none')
+            rejected = False
+        except ValueError:
+            rejected = True
+        split = qfq[qfq['ts_code'] == '600000.SH']
+        assert all([
+            check("qfq scales history to the latest price", np.allclose(closes(qfq, '600000.SH'), 10.0)),
+            check("hfq scales later bars from the first price", np.allclose(closes(hfq, '600000.SH'), 20.0)),
+            check("stock without a corporate action is unchanged",
+                  np.allclose(closes(qfq, '000001.SZ'), 12.0) and np.allclose(closes(hfq, '000001.SZ'), 12.0)),
+            check("price_scale maps raw prices onto the adjusted series",
+                  np.allclose(split['price_scale'].to_numpy()[:SPLIT], 0.5)
+                  and np.allclose(split['price_scale'].to_numpy()[SPLIT:], 1.0)),
+            check("unknown adjustment type is rejected", rejected),
+        ])
+
+
+class Warnings(logging.Handler):
+    def __init__(self):
+        super().__init__(logging.WARNING)
+        self.messages = []
+
+    def emit(self, record):
+        self.messages.append(record.getMessage())
+
+
+def test_missing_factor_is_filled():
+    with tempfile.TemporaryDirectory() as tmp:
+        latest = DATES[-1].strftime('%Y%m%d')
+        client = FactorClient(missing=[latest])
+        adjuster = PriceAdjuster(client, tmp)
+        warnings = Warnings()
+        logging.getLogger('price_adjuster').addHandler(warnings)
+        try:
+            qfq, _ = adjuster.adjust_panel(raw_panel(), 'qfq')
+            # The next chunk of a streaming run covers the same dates
+            adjuster.adjust_panel(raw_panel(), 'qfq')
+        finally:
+            logging.getLogger('price_adjuster').removeHandler(warnings)
+        assert all([
+            check("a session without a factor uses the previous one", np.allclose(closes(qfq, '600000.SH'), 10.0)),
+            check("the empty date is not requested again", client.requested.count(latest) == 1),
+            check(f"filling the latest factor is logged: {warnings.messages[:1]}",
+                  any('2 stocks have no adjustment factor on their latest bar' in m for m in warnings.messages)),
+        ])
+
+
+def test_factor_cache_and_changes():
+    with tempfile.TemporaryDirectory() as tmp:
+        before = raw_panel()[raw_panel()['trade_date'] < DATES[SPLIT]]
+        client = FactorClient()
+        _, first = PriceAdjuster(client, tmp).adjust_panel(before, 'qfq')
+        first_requests = len(client.requested)
+
+        # The next run sees the split; only its new sessions are fetched
+        _, changed = PriceAdjuster(client, tmp).adjust_panel(raw_panel(), 'qfq')
+        _, unchanged = PriceAdjuster(client, tmp).adjust_panel(raw_panel(), 'qfq')
+        assert all([
+            check("first run flags nothing", first == [] and first_requests == SPLIT),
+            check("cached dates are not requested again", len(client.requested) == len(DATES)),
+            check("new factor detected for the split stock only", changed == ['600000.SH']),
+            check("same factors on the next run flag nothing", unchanged == []),
+        ])
+
+
+if __name__ == "__main__":
+    run_tests("price adjuster", test_qfq_and_hfq, test_missing_factor_is_filled, test_factor_cache_and_changes)
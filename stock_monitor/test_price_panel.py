@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""Test the compact PricePanel: round trips and the memory report, and exact prices in market runs"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+import pandas as pd
+
+from price_panel import PricePanel
+from testkit import FakeMarketClient, check, make_monitor, run_tests, write_config
+
+DATES = pd.bdate_range('2025-06-02', periods=30)
+
+
+def bars(codes=('000001.SZ', '600519.SH')) -> pd.DataFrame:
+    """Two-decimal prices such as 12.34 that float32 cannot represent exactly; the second stock starts later"""
+    frames = []
+    for i, code in enumerate(codes):
+        dates = DATES[i * 5:]
+        close = np.round(12.34 + 100 * i + np.arange(len(dates)) * 0.01, 2)
+        frames.append(pd.DataFrame({'ts_code': code, 'trade_date': dates, 'open': close, 'high': np.round(close + 0.25, 2),
+                                    'low': np.round(close - 0.12, 2), 'close': close, 'vol': 1000.0}))
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_round_trip():
+    frame = bars()
+    panel = PricePanel.from_frame(frame)
+    columns = ['ts_code', 'trade_date', 'open', 'high', 'low', 'close']
+    back = panel.to_frame()
+    assert all([
+        check("round trip keeps stocks, dates and OHLC only",
+              list(back.columns) == columns and (back[columns[:2]] == frame[columns[:2]]).all().all()),
+        check("float32 prices are only close", np.allclose(back['close'], frame['close'], rtol=1e-6)
+              and not (back['close'] == frame['close']).all()),
+        check("per-stock access", np.allclose(panel.get('600519.SH'), frame.loc[frame['ts_code'] == '600519.SH', 'close'])
+              and len(panel.get_dates('600519.SH')) == len(DATES) - 5 and panel.get('300001.SZ') is None),
+        check("stock_frame matches the stock's rows",
+              np.allclose(panel.stock_frame('000001.SZ')[columns[2:]], frame.loc[frame['ts_code'] == '000001.SZ', columns[2:]])),
+    ])
+
+
+def test_memory_report():
+    frame = bars()
+    report = PricePanel.from_frame(frame).memory_report()
+    empty = PricePanel.empty()
+    assert all([
+        check(f"panel {report['total']} bytes for {report['bars']} bars",
+              report['bars'] == len(frame) and report['stocks'] == 2
+              and report['total'] == sum(v for k, v in report.items() if k not in ('total', 'stocks', 'bars'))
+              and report['close'] == 4 * len(frame) and report['date_index'] == 2 * len(frame)),
+        check("empty panel", len(empty) == 0 and empty.to_frame().empty),
+    ])
+
+
+class CentsClient(FakeMarketClient):
+    """Full-market bars quoted in cents, such as 12.34"""
+
+    def get_daily_by_date(self, trade_date):
+        day = super().get_daily_by_date(trade_date)
+        if day is not None:
+            day[['open', 'high', 'low', 'close']] = (day[['open', 'high', 'low', 'close']] * 1.234).round(2)
+        return day
+
+
+def test_market_run_keeps_exact_prices():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, [])
+        monitor = make_monitor(tmp, CentsClient(['600000.SH', '000001.SZ']))
+        monitor.run_analysis(notify=False, universe='all')
+        assert check("full-market analysis sees the exact prices and only the columns it uses",
+                     (monitor.panel['close'] == 12.34).all() and 'vol' not in monitor.panel.columns)
+
+
+if __name__ == "__main__":
+    run_tests("price panel", test_round_trip, test_memory_report, test_market_run_keeps_exact_prices)
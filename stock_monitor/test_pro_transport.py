@@ -0,0 +1,125 @@
+#!/usr/bin/env python3
+"""Test the lean HTTP transport against a local stand-in for the Tushare pro API"""
+
+import gzip
+import json
+import sys
+import tempfile
+import threading
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+
+from pro_transport import ProTransport
+from quota_ledger import QuotaLedger
+from tushare_client import TushareClient
+from testkit import check, run_tests
+
+DAILY_FIELDS = ['ts_code', 'trade_date', 'open', 'high', 'low', 'close', 'pre_close', 'vol']
+DAILY_ITEMS = [
+    ['300959.SZ', '20251017', 30.1, 31.0, 29.8, 30.5, 30.0, 12000.0],
+    ['600846.SH', '20251017', 8.2, 8.4, 8.1, 8.3, 8.25, None],
+]
+
+
+class FakeProAPI(BaseHTTPRequestHandler):
+    """Answers POSTs with the same JSON shape as api.tushare.pro"""
+    protocol_version = 'HTTP/1.1'
+    requests_seen = []
+    client_ports = set()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        FakeProAPI.requests_seen.append(body)
+        FakeProAPI.client_ports.add(self.client_address[1])
+
+        if body['token'] != 'test-token':
+            result = {'code': 40101, 'msg': '您的token不对，请确认。', 'data': None}
+        elif body['api_name'] == 'daily':
+            result = {'code': 0, 'msg': '', 'data': {'fields': DAILY_FIELDS, 'items': DAILY_ITEMS, 'has_more': False}}
+        else:
+            result = {'code': 0, 'msg': '', 'data': {'fields': ['ts_code'], 'items': [], 'has_more': False}}
+
+        payload = json.dumps(result, ensure_ascii=False).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        if 'gzip' in self.headers.get('Accept-Encoding', ''):
+            payload = gzip.compress(payload)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+@contextmanager
+def fake_api():
+    """URL of a fresh stand-in server"""
+    FakeProAPI.requests_seen = []
+    FakeProAPI.client_ports = set()
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeProAPI)
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}"
+    finally:
+        server.shutdown()
+
+
+def test_arrays_and_keep_alive():
+    with fake_api() as url:
+        transport = ProTransport('test-token', url)
+        arrays = transport.query_arrays('daily', trade_date='20251017')
+        df = transport.daily(trade_date='20251017')
+        transport.query('stock_basic', list_status='L')
+
+    assert all([
+        check("request carries api_name, token and params",
+              FakeProAPI.requests_seen[0] == {'api_name': 'daily', 'token': 'test-token',
+                                              'params': {'trade_date': '20251017'}, 'fields': ''}),
+        check("numeric columns parsed to float64",
+              arrays['close'].dtype == np.float64 and list(arrays['close']) == [30.5, 8.3]),
+        check("nulls become NaN", np.isnan(arrays['vol'][1])),
+        check("text columns stay as strings", list(arrays['ts_code']) == ['300959.SZ', '600846.SH']),
+        check("pro-style call returns a DataFrame", list(df.columns) == DAILY_FIELDS and len(df) == 2),
+        check("responses were gzip-compressed", transport.stats['compressed_responses'] == 3),
+        check("three requests reuse one connection", len(FakeProAPI.client_ports) == 1),
+    ])
+
+
+def test_errors_and_client():
+    with fake_api() as url, tempfile.TemporaryDirectory() as tmp:
+        results = []
+        quota_path = str(Path(tmp) / 'quota.sqlite')
+
+        try:
+            ProTransport('wrong-token', url).daily(trade_date='20251017')
+            results.append(check("API error code raises", False))
+        except Exception as e:
+            results.append(check("API error code raises", 'token' in str(e)))
+
+        client = TushareClient('test-token', transport='http', api_url=url, quota=QuotaLedger('test-token', quota_path))
+        df = client.get_daily_by_date('20251017')
+        results.append(check("TushareClient works over the lean transport",
+                             df is not None and df.set_index('ts_code').loc['300959.SZ', 'close'] == 30.5))
+
+        bad_client = TushareClient('wrong-token', transport='http', api_url=url,
+                                   quota=QuotaLedger('wrong-token', quota_path))
+        results.append(check("client logs API errors and returns None", bad_client.get_daily_by_date('20251017') is None))
+        try:
+            bad_client.get_stock_data('300959.SZ', days=30)
+            results.append(check("failed per-stock fetch raises instead of looking like no data", False))
+        except Exception as e:
+            results.append(check("failed per-stock fetch raises instead of looking like no data", 'token' in str(e)))
+
+        assert all(results)
+
+
+if __name__ == "__main__":
+    run_tests("transport", test_arrays_and_keep_alive, test_errors_and_client)
@@ -0,0 +1,145 @@
+#!/usr/bin/env python3
+"""Test the cross-process API quota ledger"""
+
+import multiprocessing
+import sqlite3
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from quota_ledger import QuotaLedger, QuotaExceeded
+from testkit import FakeClient, check, make_monitor, run_tests, write_config
+from tushare_client import TushareClient
+
+CODES = [f'{600000 + i}.SH' for i in range(10)]
+
+
+def grab_slots(path, results):
+    """Worker process: take every slot it can without waiting"""
+    ledger = QuotaLedger('token-a', path, per_minute=10)
+    granted = 0
+    for _ in range(10):
+        if ledger.try_acquire():
+            granted += 1
+    results.put(granted)
+
+
+def test_processes_share_quota():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'quota.sqlite')
+        results = multiprocessing.Queue()
+        workers = [multiprocessing.Process(target=grab_slots, args=(path, results)) for _ in range(3)]
+        for w in workers:
+            w.start()
+        for w in workers:
+            w.join()
+        granted = [results.get() for _ in workers]
+
+        other_token = QuotaLedger('token-b', path, per_minute=10)
+        assert all([
+            check("3 processes together get exactly the per-minute quota", sum(granted) == 10),
+            check("usage is visible to a new process", QuotaLedger('token-a', path).usage()['minute'] == 10),
+            check("other tokens have their own quota", other_token.try_acquire()),
+        ])
+
+
+def test_waits_for_sliding_window():
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'window.sqlite')
+        ledger = QuotaLedger('token', path, per_minute=3)
+
+        # Fill the window with requests that age out in ~0.3s
+        almost_expired = time.time() - 59.7
+        conn = sqlite3.connect(path)
+        conn.executemany("INSERT INTO requests (token, ts) VALUES (?, ?)", [(ledger.key, almost_expired)] * 3)
+        conn.commit()
+        conn.close()
+
+        results = [check("full window refuses immediately", not ledger.try_acquire())]
+
+        try:
+            ledger.wait_for_slot(timeout=0.05)
+            results.append(check("wait_for_slot raises on timeout", False))
+        except QuotaExceeded:
+            results.append(check("wait_for_slot raises on timeout", True))
+
+        start = time.time()
+        acquired = ledger.acquire()
+        waited = time.time() - start
+        results.append(check(f"acquire waits for the oldest request to age out ({waited:.2f}s)",
+                             acquired and 0.1 < waited < 2))
+        assert all(results)
+
+
+def test_daily_limit():
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = QuotaLedger('token', str(Path(tmp) / 'day.sqlite'), per_minute=100, per_day=5)
+        granted = sum(ledger.try_acquire() for _ in range(8))
+        assert all([
+            check("per-day limit caps requests", granted == 5),
+            check("day usage reported", ledger.usage() == {'minute': 5, 'day': 5}),
+            check("blocked until tomorrow with a timeout", ledger.acquire(timeout=0.05) is False),
+        ])
+
+
+def test_client_fails_instead_of_sleeping():
+    with tempfile.TemporaryDirectory() as tmp:
+        ledger = QuotaLedger('token', str(Path(tmp) / 'day.sqlite'), per_day=1, max_wait=300)
+        ledger.try_acquire()
+        client = TushareClient('token', transport='http', api_url='http://127.0.0.1:9', quota=ledger)
+        start = time.time()
+        try:
+            client.get_stock_data('600000.SH', days=30)
+            raised = False
+        except QuotaExceeded:
+            raised = True
+        assert check(f"daily quota used up: client raises QuotaExceeded at once ({time.time() - start:.2f}s)",
+                     raised and time.time() - start < 5)
+
+
+class QuotaClient(FakeClient):
+    """Runs out of quota after `allowed` fetches"""
+
+    def __init__(self, allowed: int):
+        super().__init__(crashing={'600002.SH', '600007.SH'})
+        self.allowed = allowed
+
+    def get_stock_data(self, stock_code, days=30):
+        if len(self.fetched) >= self.allowed:
+            raise QuotaExceeded("No API request slot available within 300s")
+        return super().get_stock_data(stock_code, days)
+
+
+def test_run_stops_and_resumes():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, CODES, pipeline={"workers": 1, "queue_size": 2, "chunk_size": 2})
+
+        first = make_monitor(tmp, QuotaClient(allowed=4))
+        try:
+            first.run_analysis()
+            raised = False
+        except QuotaExceeded:
+            raised = True
+        first.wait_for_notifications()
+
+        second = make_monitor(tmp, FakeClient({'600002.SH', '600007.SH'}))
+        alerts = second.run_analysis(resume=True)
+        second.wait_for_notifications()
+        assert all([
+            check("run stops with QuotaExceeded", raised),
+            check("alerts found before the quota ran out are sent",
+                  first._email_notifier.sent == [['600002.SH']]
+                  and first._email_notifier.calls[0]['label'].startswith("部分结果")),
+            check("--resume fetches only the stocks left", second._tushare_client.fetched == CODES[4:]),
+            check("--resume sends only the new alert", second._email_notifier.sent == [['600007.SH']]),
+            check("--resume returns every alert", [a['stock_code'] for a in alerts] == ['600002.SH', '600007.SH']),
+        ])
+
+
+if __name__ == "__main__":
+    run_tests("quota ledger", test_processes_share_quota, test_waits_for_sliding_window, test_daily_limit,
+              test_client_fails_instead_of_sleeping, test_run_stops_and_resumes)
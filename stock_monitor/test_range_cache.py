@@ -0,0 +1,139 @@
+#!/usr/bin/env python3
+"""Test the range-aware daily bar cache"""
+
+import sys
+import tempfile
+from datetime import date
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import pandas as pd
+
+from quota_ledger import QuotaLedger
+from range_cache import RangeCache
+from testkit import check, run_tests
+from tushare_client import TushareClient
+
+
+def make_bars(start: str, end: str) -> pd.DataFrame:
+    dates = pd.bdate_range(start, end)
+    return pd.DataFrame({'ts_code': '300959.SZ', 'trade_date': dates, 'close': range(len(dates))})
+
+
+def test_gaps_and_merging():
+    """Only uncovered sub-ranges are reported, and adjacent ranges merge"""
+    cache = RangeCache()
+    code = '300959.SZ'
+    results = []
+
+    results.append(check("empty cache reports the whole range",
+                         cache.missing(code, date(2025, 9, 1), date(2025, 9, 30)) == [(date(2025, 9, 1), date(2025, 9, 30))]))
+
+    cache.add(code, date(2025, 9, 10), date(2025, 9, 20), make_bars('2025-09-10', '2025-09-20'))
+    results.append(check("gaps on both sides of a cached range",
+                         cache.missing(code, date(2025, 9, 1), date(2025, 9, 30)) ==
+                         [(date(2025, 9, 1), date(2025, 9, 9)), (date(2025, 9, 21), date(2025, 9, 30))]))
+    results.append(check("sub-range is served from memory",
+                         cache.missing(code, date(2025, 9, 12), date(2025, 9, 18)) == []))
+
+    cache.add(code, date(2025, 9, 1), date(2025, 9, 9), make_bars('2025-09-01', '2025-09-09'))
+    cache.add(code, date(2025, 9, 21), date(2025, 9, 30), make_bars('2025-09-21', '2025-09-30'))
+    results.append(check("adjacent ranges merge into one",
+                         cache.ranges(code) == [(date(2025, 9, 1), date(2025, 9, 30))]))
+
+    df = cache.get(code, date(2025, 9, 15), date(2025, 9, 19))
+    expected = pd.bdate_range('2025-09-15', '2025-09-19')
+    results.append(check("get returns exactly the bars in range",
+                         df is not None and list(df['trade_date']) == list(expected)))
+
+    df['scratch'] = 1
+    results.append(check("returned frames are copies",
+                         'scratch' not in cache.get(code, date(2025, 9, 1), date(2025, 9, 30)).columns))
+
+    results.append(check("uncovered range is not served",
+                         cache.get(code, date(2025, 8, 25), date(2025, 9, 5)) is None))
+
+    assert all(results)
+
+
+def test_lru_eviction():
+    """Least recently used stocks are evicted once the byte budget is exceeded"""
+    one_stock = int(make_bars('2025-01-01', '2025-06-30').memory_usage(deep=True).sum())
+    cache = RangeCache(max_bytes=one_stock * 2 + 1)
+    for code in ('A', 'B'):
+        cache.add(code, date(2025, 1, 1), date(2025, 6, 30), make_bars('2025-01-01', '2025-06-30'))
+
+    cache.get('A', date(2025, 2, 1), date(2025, 2, 28))  # A is now most recently used
+    cache.add('C', date(2025, 1, 1), date(2025, 6, 30), make_bars('2025-01-01', '2025-06-30'))
+
+    results = [
+        check("least recently used stock evicted", 'B' not in cache),
+        check("recently used stocks kept", 'A' in cache and 'C' in cache),
+        check("byte accounting stays within budget", cache.total_bytes <= cache.max_bytes),
+    ]
+    assert all(results)
+
+
+class ClosedTodayPro:
+    """pro API stand-in whose calendar has weekdays before today open, so the latest session has closed"""
+
+    def __init__(self, calendar_up: bool = True):
+        self.daily_requests = []
+        self.calendar_requests = 0
+        self.calendar_up = calendar_up
+
+    def trade_cal(self, exchange, start_date, end_date):
+        self.calendar_requests += 1
+        if not self.calendar_up:
+            raise ConnectionError("trade_cal unavailable")
+        days = pd.date_range(start_date, end_date)
+        return pd.DataFrame({'cal_date': days.strftime('%Y%m%d'),
+                             'is_open': ((days < pd.Timestamp.now().normalize()) & (days.dayofweek < 5)).astype(int)})
+
+    def daily(self, ts_code, start_date, end_date):
+        self.daily_requests.append((start_date, end_date))
+        dates = pd.bdate_range(start_date, min(pd.Timestamp(end_date), pd.Timestamp.now().normalize()))
+        dates = dates[dates < pd.Timestamp.now().normalize()]
+        return pd.DataFrame({'ts_code': ts_code, 'trade_date': dates.strftime('%Y%m%d'), 'close': 10.0})
+
+
+def make_client(tmp, pro) -> TushareClient:
+    client = TushareClient('token', transport='http', api_url='http://127.0.0.1:9',
+                           quota=QuotaLedger('token', str(Path(tmp) / 'quota.sqlite'), per_minute=1000))
+    client.pro = pro
+    return client
+
+
+def test_client_stops_at_closed_session():
+    """Repeated requests are served from memory instead of asking again for a day without bars"""
+    with tempfile.TemporaryDirectory() as tmp:
+        client = make_client(tmp, ClosedTodayPro())
+        first = client.get_stock_data('300959.SZ', days=30)
+        second = client.get_stock_data('300959.SZ', days=30)
+        session = (pd.Timestamp.now().normalize() - pd.offsets.BDay()).strftime('%Y%m%d')
+        # The next run re-reads the calendar but keeps the bars
+        refreshed = client.get_latest_closed_session(refresh=True)
+        third = client.get_stock_data('300959.SZ', days=30)
+        assert all([
+            check("window ends at the latest closed session", client.pro.daily_requests[0][1] == session),
+            check("second request makes no API call",
+                  len(client.pro.daily_requests) == 1 and second is not None and len(second) == len(first)),
+            check("trade calendar read once per run", client.pro.calendar_requests == 2 and refreshed == session),
+            check("bars kept for the next run", len(client.pro.daily_requests) == 1 and len(third) == len(first)),
+        ])
+
+
+def test_calendar_failure_is_remembered():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = make_client(tmp, ClosedTodayPro(calendar_up=False))
+        sessions = [client.get_latest_closed_session(refresh=True)]
+        client.get_stock_data('300959.SZ', days=30)
+        client.get_stock_data('000001.SZ', days=30)
+        assert check("an unavailable calendar is asked once per run, not on every fetch",
+                     sessions == [None] and client.pro.calendar_requests == 1)
+
+
+if __name__ == "__main__":
+    run_tests("range cache", test_gaps_and_merging, test_lru_eviction, test_client_stops_at_closed_session,
+              test_calendar_failure_is_remembered)
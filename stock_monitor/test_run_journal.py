@@ -0,0 +1,140 @@
+#!/usr/bin/env python3
+"""Test checkpointed runs and --resume"""
+
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from run_journal import RunJournal
+from testkit import FakeClient, check, make_monitor, run_tests, write_config
+
+CODES = [f'{600000 + i}.SH' for i in range(10)]
+CRASHING = {'600002.SH', '600007.SH'}  # close 30% below the 9/30 baseline
+
+
+def test_resume_after_crash():
+    results = []
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, CODES, pipeline={"workers": 1, "queue_size": 2, "chunk_size": 2})
+
+        # First attempt dies while analyzing the third chunk
+        first = make_monitor(tmp, FakeClient(CRASHING))
+        evaluate = first.analyzer.evaluate_indicators
+        calls = []
+
+        def dying_evaluate(latest):
+            calls.append(1)
+            if len(calls) == 3:
+                raise ConnectionError("quota error")
+            return evaluate(latest)
+
+        first.analyzer.evaluate_indicators = dying_evaluate
+        try:
+            first.run_analysis()
+        except ConnectionError:
+            pass
+        first.wait_for_notifications()
+        journal = RunJournal(tmp / 'cache' / 'run_journal.jsonl')
+        journal._replay(journal._read())
+        done_before = set(journal.analyzed)
+        fetched_before = set(first._tushare_client.fetched)
+        results.append(check(f"journal recorded {len(done_before)} analyzed stocks before the crash",
+                             0 < len(done_before) < len(CODES)))
+
+        # --resume continues without refetching or re-analyzing
+        second = make_monitor(tmp, FakeClient(CRASHING))
+        alerts = second.run_analysis(resume=True)
+        second.wait_for_notifications()
+        refetched = set(second._tushare_client.fetched) & fetched_before
+        results.append(check("no stock fetched twice", not refetched))
+        results.append(check("every stock fetched exactly once overall",
+                             sorted(fetched_before | set(second._tushare_client.fetched)) == CODES))
+        results.append(check("alerts from both attempts combined",
+                             [a['stock_code'] for a in alerts] == sorted(CRASHING)))
+        results.append(check("indicators cover all stocks", sorted(second.latest_indicators().index) == CODES))
+        results.append(check("email sent once with all alerts", second._email_notifier.sent == [sorted(CRASHING)]))
+
+        # A finished run is not resumed again
+        third = make_monitor(tmp, FakeClient(CRASHING))
+        third.run_analysis(resume=True)
+        third.wait_for_notifications()
+        results.append(check("finished run starts fresh", sorted(third._tushare_client.fetched) == CODES))
+    assert all(results)
+
+
+def test_email_not_resent():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, CODES)
+
+        # Dies right after the email went out
+        first = make_monitor(tmp, FakeClient(CRASHING))
+        original_finish = RunJournal.finish
+
+        def failing_finish(self):
+            raise OSError("disk full")
+
+        RunJournal.finish = failing_finish
+        try:
+            first.run_analysis()
+        except OSError:
+            pass
+        finally:
+            RunJournal.finish = original_finish
+        first.wait_for_notifications()
+
+        second = make_monitor(tmp, FakeClient(CRASHING))
+        alerts = second.run_analysis(resume=True)
+        second.wait_for_notifications()
+        assert all([
+            check("first attempt sent the email", first._email_notifier.sent == [sorted(CRASHING)]),
+            check("resumed run does not send it again", second._email_notifier.sent == []),
+            check("resumed run fetches nothing", second._tushare_client.fetched == []),
+            check("resumed run still returns the alerts", len(alerts) == len(CRASHING)),
+        ])
+
+
+class FlakyClient(FakeClient):
+    """Fetching `broken` raises like a dropped connection"""
+
+    def __init__(self, crashing, broken):
+        super().__init__(crashing)
+        self.broken = broken
+
+    def get_stock_data(self, stock_code, days=30):
+        if stock_code == self.broken:
+            raise ConnectionError("Connection reset by peer")
+        return super().get_stock_data(stock_code, days)
+
+
+def test_failed_fetch_is_resumed():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, CODES)
+        crashing = CRASHING | {'600005.SH'}
+
+        first = make_monitor(tmp, FlakyClient(crashing, broken='600005.SH'))
+        first_alerts = first.run_analysis()
+        first.wait_for_notifications()
+        journal = RunJournal(tmp / 'cache' / 'run_journal.jsonl')
+        events = [event['event'] for event in journal._read()]
+
+        second = make_monitor(tmp, FakeClient(crashing))
+        alerts = second.run_analysis(resume=True)
+        second.wait_for_notifications()
+        assert all([
+            check("first run reports the stocks it could fetch",
+                  [a['stock_code'] for a in first_alerts] == sorted(CRASHING)),
+            check("failed fetch journaled and run left unfinished", 'failed' in events and events[-1] != 'finished'),
+            check("--resume fetches only the failed stock", second._tushare_client.fetched == ['600005.SH']),
+            check("--resume sends only its alert", second._email_notifier.sent == [['600005.SH']]),
+            check("--resume returns every alert", [a['stock_code'] for a in alerts] == sorted(crashing)),
+            check("resumed run is finished", journal._read()[-1]['event'] == 'finished'),
+        ])
+
+
+if __name__ == "__main__":
+    run_tests("run journal", test_resume_after_crash, test_email_not_resent, test_failed_fetch_is_resumed)
@@ -6,9 +6,10 @@ from datetime import datetime
 import schedule
 
 sys.path.append(os.path.join(os.path.dirname(__file__), 'src'))
-from stock_monitor import StockMonitor
+from stock_monitor import StockMonitor, setup_logging
 
 def test_scheduler():
+    setup_logging()
     print(f"Testing scheduler at {datetime.now()}")
     
     monitor = StockMonitor()
@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""Test industry roll-ups of the latest indicators and the email sector table"""
+
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+import pandas as pd
+
+from email_notifier import EmailNotifier
+from stock_analyzer import StockAnalyzer
+from testkit import FakeClient, check, make_monitor, run_tests, write_config
+
+def make_latest(n: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    codes = pd.Index([f'{i:06d}.SZ' for i in range(n)], name='ts_code')
+    latest = pd.DataFrame({
+        'close': rng.uniform(5, 15, n),
+        'MA100': np.where(rng.random(n) < 0.1, np.nan, rng.uniform(5, 15, n)),
+        'baseline_price': rng.uniform(8, 12, n),
+    }, index=codes)
+    industries = pd.Series(rng.choice(['银行', '半导体', '白酒', '化学制品'], n), index=codes)
+    industries.iloc[::50] = np.nan
+    alerts = [{'stock_code': code, 'baseline_drop_alert': {'drop_percentage': -25} if i % 3 == 0 else None,
+               'mtr_drop_alert': {'price_drop': 1} if i % 3 == 1 else None,
+               'boll_drop_alert': {'drop_percentage': -6} if i % 3 == 2 or i % 2 == 0 else None}
+              for i, code in enumerate(codes[rng.random(n) < 0.2])]
+    return latest, industries, alerts
+
+
+def test_matches_per_sector_loop():
+    latest, industries, alerts = make_latest(500)
+    sectors = StockAnalyzer().sector_summary(latest, industries, alerts)
+
+    # Reference: the straightforward loop over each industry
+    alerted = {a['stock_code'] for a in alerts}
+    mtr = {a['stock_code'] for a in alerts if a['mtr_drop_alert']}
+    labels = industries.fillna('未知')
+    matches = True
+    for industry in labels.unique():
+        members = latest[labels == industry]
+        with_ma = members[members['MA100'].notna()]
+        row = sectors.loc[industry]
+        matches &= row['stocks'] == len(members)
+        matches &= np.isclose(row['under_ma100'], (with_ma['close'] < with_ma['MA100']).mean())
+        matches &= np.isclose(row['median_drawdown'],
+                              ((members['close'] / members['baseline_price'] - 1) * 100).median())
+        matches &= row['alerts'] == len(alerted & set(members.index))
+        matches &= row['mtr_drop'] == len(mtr & set(members.index))
+
+    ordered = sectors['alerts'].is_monotonic_decreasing
+    assert all([
+        check(f"group-by roll-up matches per-industry loop for {len(sectors)} industries", bool(matches)),
+        check("stocks without an industry grouped as 未知", '未知' in sectors.index),
+        check("worst sectors (most alerts) first", bool(ordered)),
+    ])
+
+
+def test_scales_to_full_market():
+    latest, industries, alerts = make_latest(5000, seed=1)
+    start = time.time()
+    sectors = StockAnalyzer().sector_summary(latest, industries, alerts)
+    elapsed = time.time() - start
+    assert check(f"5000 stocks summarized in {elapsed * 1000:.0f}ms", len(sectors) == 5 and elapsed < 1)
+
+
+def test_email_sector_table():
+    latest, industries, alerts = make_latest(200, seed=2)
+    sectors = StockAnalyzer().sector_summary(latest, industries, alerts)
+    notifier = EmailNotifier('smtp.example.com', 587, 'me@example.com', 'x', ['me@example.com'])
+    alert = {'stock_code': '600000.SH', 'close_price': 7.0, 'trade_date': '2025-10-17',
+             'baseline_drop_alert': {'baseline_date': '2025-09-30', 'baseline_price': 10.0,
+                                     'current_price': 7.0, 'drop_percentage': -30.0},
+             'mtr_drop_alert': None, 'boll_drop_alert': None}
+    body = notifier._format_alert_body([alert], sectors=sectors)
+    plain = notifier._format_alert_body([alert])
+    assert all([
+        check("email shows the industry table", '行业概览' in body and all(i in body for i in sectors.index)),
+        check("no table without sector data", '行业概览' not in plain),
+    ])
+
+
+def test_monitor_passes_sectors():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, "代码,名称,所属行业\n600001,甲,  银行\n600002,乙, 银行\n"
+                          "300001,丙, 半导体\n300002,丁, 半导体\n300003,戊, 半导体\n")
+        monitor = make_monitor(tmp, FakeClient(['600001.SH', '600002.SH']))
+        monitor.run_analysis()
+        monitor.wait_for_notifications()
+
+        calls = monitor._email_notifier.calls
+        sectors = calls[0]['sectors'] if calls else None
+        assert check("email gets the run's sector table (bank selloff on top)",
+                     sectors is not None and list(sectors.index) == ['银行', '半导体']
+                     and sectors.loc['银行', 'alerts'] == 2 and sectors.loc['半导体', 'alerts'] == 0)
+
+
+if __name__ == "__main__":
+    run_tests("sector summary", test_matches_per_sector_loop, test_scales_to_full_market, test_email_sector_table, test_monitor_passes_sectors)
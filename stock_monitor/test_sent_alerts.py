@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+"""Test that re-running a session does not send the same alerts again, in every run mode"""
+
+import shutil
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import pandas as pd
+
+from testkit import FakeClient, FakeMarketClient, check, make_monitor, run_tests, spiking_bars, write_config
+
+CODES = ['600000.SH', '600001.SH', '300001.SZ', '000001.SZ']
+SPIKING = {'600001.SH', '300001.SZ'}
+
+
+def run(tmp: Path, spiking=SPIKING, **options):
+    monitor = make_monitor(tmp, FakeMarketClient(CODES, spiking))
+    monitor.run_analysis(**options)
+    monitor.wait_for_notifications()
+    return monitor._email_notifier
+
+
+def test_market_rerun():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, [])
+        first = run(tmp, universe='all')
+        second = run(tmp, universe='all')
+        # Bars corrected after the first run, e.g. a late revision: one more stock alerts
+        shutil.rmtree(tmp / 'cache' / 'daily')
+        third = run(tmp, SPIKING | {'000001.SZ'}, universe='all')
+        other_board = run(tmp, universe='all', board='chinext')
+        assert all([
+            check("first full-market run sends its alerts", first.sent == [sorted(SPIKING)]),
+            check("same-session re-run sends nothing", second.sent == []),
+            check("a new alert in the same session is sent alone",
+                  third.sent == [['000001.SZ']] and third.calls[0]['label'] == "补充结果"),
+            check("a run over other stocks keeps its own record", other_board.sent == [['300001.SZ']]),
+        ])
+
+
+def test_snapshot_watchlist_rerun():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, CODES, snapshot_path=str(tmp / 'cache' / 'panel.snap'))
+        first = run(tmp)
+        second = run(tmp, resume=True)
+        assert all([
+            check("snapshot-backed watchlist run sends its alerts", first.sent == [sorted(SPIKING)]),
+            check("same-session re-run sends nothing", second.sent == []),
+        ])
+
+
+def test_new_bar_same_session():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, ['600000.SH'])
+        sent = []
+        # The first run sees the 10-16 bar; the 10-17 bar is published before the second run
+        for last in ('2025-10-16', '2025-10-17'):
+            dates = pd.bdate_range(end=last, periods=60)
+            client = FakeClient(session='20251017', bars=lambda code, dates=dates: spiking_bars(code, True, dates))
+            monitor = make_monitor(tmp, client)
+            monitor.run_analysis()
+            monitor.wait_for_notifications()
+            sent.append([(a['stock_code'], a['trade_date']) for call in monitor._email_notifier.calls
+                         for a in call['alerts']])
+        assert check("an alert on a newly published bar is sent in the same session",
+                     sent == [[('600000.SH', '2025-10-16')], [('600000.SH', '2025-10-17')]])
+
+
+if __name__ == "__main__":
+    run_tests("sent alerts", test_market_rerun, test_snapshot_watchlist_rerun, test_new_bar_same_session)
@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+"""Test sharded runs in several local processes and the merge step"""
+
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import zlib
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+import pandas as pd
+
+from sharding import ShardStore, parse_shard, select_shard, shard_of
+from stock_monitor import StockMonitor
+from testkit import check, run_tests, write_config
+
+HERE = Path(__file__).parent
+CODES = [f'{600000 + i}.SH' for i in range(30)] + [f'{300000 + i}.SZ' for i in range(30)]
+DATES = pd.bdate_range('2024-01-01', pd.Timestamp.now().normalize() - pd.Timedelta(days=1))
+
+
+def bars(stock_code: str) -> pd.DataFrame:
+    """Deterministic history per stock; every fourth stock spikes and then drops on the last bar"""
+    seed = zlib.crc32(stock_code.encode())
+    close = 10 * np.exp(np.cumsum(np.random.default_rng(seed).normal(0, 0.01, len(DATES))))
+    if seed % 4 == 0:
+        close[-2] = close[-3] * 1.25
+        close[-1] = close[-2] * 0.85
+    return pd.DataFrame({'ts_code': stock_code, 'trade_date': DATES.strftime('%Y%m%d'), 'open': close,
+                         'high': close * 1.01, 'low': close * 0.99, 'close': close, 'vol': 1000.0})
+
+
+class FakeProAPI(BaseHTTPRequestHandler):
+    """Local stand-in for api.tushare.pro serving `daily` and `trade_cal`"""
+    requested = Counter()
+    lock = threading.Lock()
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        params = body['params']
+        if body['api_name'] == 'daily':
+            with FakeProAPI.lock:
+                FakeProAPI.requested[params['ts_code']] += 1
+            df = bars(params['ts_code'])
+            df = df[(df['trade_date'] >= params['start_date']) & (df['trade_date'] <= params['end_date'])]
+        elif body['api_name'] == 'trade_cal':
+            days = pd.date_range(params['start_date'], params['end_date'])
+            df = pd.DataFrame({'exchange': 'SSE', 'cal_date': days.strftime('%Y%m%d'),
+                               'is_open': (days.dayofweek < 5).astype(int)})
+        else:
+            df = pd.DataFrame()
+        data = {'fields': list(df.columns), 'items': df.values.tolist(), 'has_more': False}
+        payload = json.dumps({'code': 0, 'msg': '', 'data': data}).encode('utf-8')
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def test_partition():
+    codes = [f'{i:06d}.{"SH" if i % 2 else "SZ"}' for i in range(5000)]
+    shards = [select_shard(codes, i, 4) for i in range(1, 5)]
+    sizes = [len(shard) for shard in shards]
+
+    # A process with a different hash seed must agree on every assignment
+    script = ("import sys; sys.path.insert(0, 'src'); from sharding import shard_of; "
+              f"print([shard_of(c, 4) for c in {codes[:200]!r}])")
+    other = subprocess.run([sys.executable, '-c', script], cwd=HERE, capture_output=True, text=True,
+                           env=dict(os.environ, PYTHONHASHSEED='123'))
+    here = [shard_of(code, 4) for code in codes[:200]]
+
+    try:
+        parse_shard('5/4')
+        rejected = False
+    except ValueError:
+        rejected = True
+    assert all([
+        check(f"every stock in exactly one shard, balanced {sizes}",
+              sorted(sum(shards, [])) == sorted(codes) and max(sizes) < 1.1 * min(sizes)),
+        check("assignment identical in another process", other.stdout.strip() == str(here)),
+        check("shards keep universe order", shards[0] == [c for c in codes if c in set(shards[0])]),
+        check("parse_shard('2/4') and out-of-range rejection", parse_shard('2/4') == (2, 4) and rejected),
+    ])
+
+
+def write_shards(store: ShardStore, session: str, count: int, data_sessions=None):
+    """Empty results for every shard of one run; `data_sessions` are the trade dates each shard analyzed"""
+    for index in range(1, count + 1):
+        data_session = data_sessions[index - 1] if data_sessions else session
+        alerts = [{'stock_code': f'60000{index}.SH', 'trade_date': data_session}]
+        store.write(index, count, session, alerts, positions={f'60000{index}.SH': index},
+                    indicators=None, closes=None, meta={'universe': 'all', 'session': data_session})
+
+
+def test_store_runs():
+    with tempfile.TemporaryDirectory() as tmp:
+        store = ShardStore(tmp)
+        write_shards(store, '20251016', 2)
+        write_shards(store, '20251017', 2)
+        time.sleep(0.05)
+        # The shard count changed for a re-run of the same session
+        write_shards(store, '20251017', 3)
+        runs = sorted(path.name for path in Path(tmp).iterdir())
+        alerts, _, _, records = store.load()
+
+        write_shards(store, '20251020', 2, data_sessions=['20251020', '20251017'])
+        try:
+            store.load()
+            rejected = False
+        except ValueError as e:
+            rejected = 'different sessions' in str(e)
+        assert all([
+            check(f"runs kept apart by session and shard count, older sessions removed {runs}",
+                  runs == ['20251017-of-2', '20251017-of-3']),
+            check("merge takes the run written last", len(records) == 3 and len(alerts) == 3),
+            check("shards of different sessions are rejected", rejected),
+        ])
+
+
+def shard_config(tmp: Path, port: int, name: str) -> Path:
+    return write_config(tmp, CODES, name=name, cache_dir=str(tmp / name / 'cache'), export_dir=str(tmp / name / 'exports'),
+                        tushare={"api_key": "test-token", "transport": "http", "api_url": f"http://127.0.0.1:{port}"},
+                        quota={"per_minute": 100000},
+                        notifications={"channels": [{"type": "file", "path": str(tmp / name / 'alerts.jsonl')}]})
+
+
+def test_local_processes():
+    server = ThreadingHTTPServer(('127.0.0.1', 0), FakeProAPI)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    port = server.server_address[1]
+    results = []
+    try:
+        with tempfile.TemporaryDirectory() as tmp:
+            tmp = Path(tmp)
+
+            # Reference: one unsharded run
+            single = StockMonitor(str(shard_config(tmp, port, 'single')))
+            expected = [alert['stock_code'] for alert in single.run_analysis(notify=False)]
+            FakeProAPI.requested.clear()
+
+            # Three shards as separate processes sharing one cache directory, then the merge;
+            # their logs go to the temp dir instead of the repo's logs/
+            config = shard_config(tmp, port, 'sharded')
+            env = dict(os.environ, STOCK_MONITOR_LOG_DIR=str(tmp / 'logs'))
+            shard_runs = [subprocess.Popen([sys.executable, 'src/stock_monitor.py', '--config', str(config),
+                                            '--shard', f'{i}/3'], cwd=HERE, env=env,
+                                           stdout=subprocess.DEVNULL, stderr=subprocess.STDOUT)
+                          for i in range(1, 4)]
+            codes = [run.wait(timeout=120) for run in shard_runs]
+            results.append(check(f"three shard processes finished {codes}", codes == [0, 0, 0]))
+            results.append(check("each stock fetched by exactly one shard",
+                                 sorted(FakeProAPI.requested) == sorted(CODES)
+                                 and set(FakeProAPI.requested.values()) == {1}))
+
+            merge = subprocess.run([sys.executable, 'src/stock_monitor.py', '--config', str(config), '--merge'],
+                                   cwd=HERE, env=env, capture_output=True, text=True, timeout=120)
+            messages = (tmp / 'sharded' / 'alerts.jsonl').read_text().splitlines() \
+                if (tmp / 'sharded' / 'alerts.jsonl').exists() else []
+            merged = [alert['stock_code'] for alert in json.loads(messages[0])['alerts']] if messages else []
+            results.append(check(f"merge sends one message with all {len(expected)} alerts",
+                                 merge.returncode == 0 and len(messages) == 1
+                                 and sorted(merged) == sorted(expected) and len(expected) > 0))
+
+            exported_alerts = pd.read_parquet(tmp / 'sharded' / 'exports' / 'alerts')
+            exported_indicators = pd.read_parquet(tmp / 'sharded' / 'exports' / 'indicators')
+            results.append(check("one export covering every stock",
+                                 sorted(exported_alerts['stock_code']) == sorted(expected)
+                                 and len(exported_indicators) == len(CODES)))
+
+            # Merging again does not send the same alerts twice
+            subprocess.run([sys.executable, 'src/stock_monitor.py', '--config', str(config), '--merge'],
+                           cwd=HERE, env=env, capture_output=True, timeout=120)
+            messages = (tmp / 'sharded' / 'alerts.jsonl').read_text().splitlines()
+            results.append(check("repeated merge sends nothing", len(messages) == 1))
+            results.append(check("shard and merge processes log to STOCK_MONITOR_LOG_DIR",
+                                 len(list((tmp / 'logs').glob('stock_monitor_*.log'))) == 1))
+
+            # A merge with a shard missing refuses to run
+            run_dir = ShardStore(tmp / 'sharded' / 'cache' / 'shards').latest_run()
+            (run_dir / 'shard-2.json').unlink()
+            try:
+                ShardStore(run_dir.parent).load()
+                refused = False
+            except ValueError as e:
+                refused = 'Missing shard results [2]' in str(e)
+            results.append(check("merge refuses incomplete shard results", refused))
+    finally:
+        server.shutdown()
+    assert all(results)
+
+
+if __name__ == "__main__":
+    run_tests("sharding", test_partition, test_store_runs, test_local_processes)
@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""Test coalescing of identical in-flight requests"""
+
+import asyncio
+import sys
+import threading
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from single_flight import SingleFlight
+from testkit import check, run_tests
+
+
+class SlowBackend:
+    """Stand-in for the API: counts calls and takes a while to answer"""
+
+    def __init__(self, delay: float = 0.2):
+        self.delay = delay
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def fetch(self, key):
+        with self._lock:
+            self.calls += 1
+        time.sleep(self.delay)
+        return f"data for {key}"
+
+
+def test_threads_share_one_call():
+    flight = SingleFlight()
+    backend = SlowBackend()
+    results = []
+
+    def worker():
+        results.append(flight.do('300959.SZ', lambda: backend.fetch('300959.SZ')))
+
+    threads = [threading.Thread(target=worker) for _ in range(8)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert all([
+        check("8 concurrent threads -> 1 backend call", backend.calls == 1),
+        check("every thread got the result", results == ['data for 300959.SZ'] * 8),
+        check("7 coalesced hits counted", flight.stats['coalesced'] == 7),
+        check("nothing left in flight", flight.in_flight() == 0),
+    ])
+
+
+def test_asyncio_and_threads_mixed():
+    flight = SingleFlight()
+    backend = SlowBackend()
+    thread_result = []
+
+    async def main():
+        # A worker thread starts the request, coroutines join it
+        t = threading.Thread(target=lambda: thread_result.append(
+            flight.do('600846.SH', lambda: backend.fetch('600846.SH'))))
+        t.start()
+        await asyncio.sleep(0.05)
+        results = await asyncio.gather(*[
+            flight.do_async('600846.SH', lambda: backend.fetch('600846.SH')) for _ in range(5)
+        ])
+        other = await flight.do_async('002709.SZ', lambda: backend.fetch('002709.SZ'))
+        t.join()
+        return results, other
+
+    results, other = asyncio.run(main())
+    assert all([
+        check("thread + 5 coroutines -> 1 call for the shared key", backend.calls == 2),
+        check("coroutines got the thread's result", results == ['data for 600846.SH'] * 5),
+        check("different key runs separately", other == 'data for 002709.SZ'),
+        check("thread got its result", thread_result == ['data for 600846.SH']),
+    ])
+
+
+def test_errors_propagate_and_are_not_cached():
+    flight = SingleFlight()
+    attempts = []
+
+    def failing():
+        attempts.append(1)
+        time.sleep(0.1)
+        raise ConnectionError("quota exceeded")
+
+    errors = []
+
+    def worker():
+        try:
+            flight.do('key', failing)
+        except ConnectionError as e:
+            errors.append(str(e))
+
+    threads = [threading.Thread(target=worker) for _ in range(4)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    retry = flight.do('key', lambda: 'ok')
+    assert all([
+        check("all waiters see the leader's error", errors == ['quota exceeded'] * 4),
+        check("failing call ran once", len(attempts) == 1),
+        check("a later call runs again", retry == 'ok'),
+    ])
+
+
+if __name__ == "__main__":
+    run_tests("single-flight", test_threads_share_one_call, test_asyncio_and_threads_mixed, test_errors_propagate_and_are_not_cached)
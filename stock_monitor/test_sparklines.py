@@ -0,0 +1,149 @@
+#!/usr/bin/env python3
+"""Test batch-rendered inline price sparklines and their cache"""
+
+import sys
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+import pandas as pd
+
+from email_notifier import EmailNotifier
+from sparklines import SparklineRenderer
+from stock_analyzer import StockAnalyzer
+from testkit import FakeClient, FakeMarketClient, check, make_monitor, run_tests, write_config
+
+DATES = pd.bdate_range(end='2025-10-17', periods=200)
+SVG = '{http://www.w3.org/2000/svg}'
+
+
+def make_panel(n: int, seed: int = 0, dates=DATES) -> pd.DataFrame:
+    rng = np.random.default_rng(seed)
+    data = {}
+    for i in range(n):
+        close = 10 * np.exp(np.cumsum(rng.normal(0, 0.02, len(dates))))
+        start = rng.integers(0, 120) if i % 5 == 0 else 0  # some stocks listed recently
+        data[f'{i:06d}.SZ'] = pd.DataFrame({'trade_date': dates[start:], 'open': close[start:],
+                                            'high': close[start:] * 1.01, 'low': close[start:] * 0.99,
+                                            'close': close[start:]})
+    return StockAnalyzer.build_panel(data)
+
+
+def test_series_match_indicators():
+    panel = make_panel(50)
+    codes = list(panel['ts_code'].unique())
+    index, values = SparklineRenderer().series(panel, codes)
+    latest = StockAnalyzer().latest_indicators(panel).reindex(index)
+
+    # Rolling pandas reference for one stock over the whole window
+    one = panel[panel['ts_code'] == codes[1]].set_index('trade_date')['close']
+    reference_ma = one.rolling(100).mean().iloc[-60:].to_numpy()
+    row = list(index).index(codes[1])
+    assert all([
+        check("last bar matches latest_indicators for close, MA100 and bands",
+              np.allclose(values['close'][:, -1], latest['close'], equal_nan=True)
+              and np.allclose(values['MA100'][:, -1], latest['MA100'], equal_nan=True)
+              and np.allclose(values['BB_Upper'][:, -1], latest['BB_Upper'], equal_nan=True)
+              and np.allclose(values['BB_Lower'][:, -1], latest['BB_Lower'], equal_nan=True)),
+        check("MA100 matches pandas rolling mean over all 60 bars",
+              np.allclose(values['MA100'][row], reference_ma, equal_nan=True)),
+    ])
+
+
+def test_svg_shape():
+    panel = make_panel(5)
+    charts = SparklineRenderer().render(panel, ['000001.SZ', '000000.SZ'])
+    root = ET.fromstring(charts['000001.SZ'])
+    close_line = root.findall(f'{SVG}polyline')[-1]
+    points = np.array([[float(v) for v in p.split(',')] for p in close_line.get('points').split()])
+    closes = panel[panel['ts_code'] == '000001.SZ']['close'].to_numpy()[-60:]
+    assert all([
+        check("one SVG per requested stock", sorted(charts) == ['000000.SZ', '000001.SZ']),
+        check("band, MA100 and close drawn",
+              len(root.findall(f'{SVG}polygon')) == 1 and len(root.findall(f'{SVG}polyline')) == 2),
+        check("close line has 60 points inside the chart",
+              len(points) == 60 and points[:, 1].min() >= 0 and points[:, 1].max() <= 60),
+        check("highest close drawn highest", points[np.argmax(closes), 1] == points[:, 1].min()),
+    ])
+
+
+def test_batch_speed_and_cache():
+    panel = make_panel(500, seed=1)
+    codes = list(panel['ts_code'].unique())
+    with tempfile.TemporaryDirectory() as tmp:
+        renderer = SparklineRenderer(tmp)
+        start = time.time()
+        first = renderer.render(panel, codes)
+        elapsed = time.time() - start
+        again = renderer.render(panel, codes)
+
+        # A fresh process reads the charts back from disk
+        restarted = SparklineRenderer(tmp)
+        restored = restarted.render(panel, codes)
+        redrawn = restarted.stats['rendered']
+
+        # A new bar is a new chart
+        next_day = make_panel(500, seed=1, dates=pd.bdate_range(end='2025-10-20', periods=200))
+        restarted.render(next_day, codes[:10])
+        assert all([
+            check(f"500 sparklines rendered in {elapsed * 1000:.0f}ms", len(first) == 500 and elapsed < 2),
+            check("re-render served from cache",
+                  again == first and renderer.stats == {'rendered': 500, 'cached': 500}),
+            check("disk cache survives a restart", restored == first and redrawn == 0),
+            check("new trade date rendered again", restarted.stats['rendered'] == 10
+                  and restarted.cached(codes[0], '2025-10-20') is not None),
+        ])
+
+
+def test_email_carries_sparklines():
+    def bars(stock_code):
+        close = np.full(len(DATES), 10.0) + np.sin(np.arange(len(DATES)) / 5)
+        if stock_code == '600001.SH':
+            close[-1] = 6.0
+        return pd.DataFrame({'ts_code': stock_code, 'trade_date': DATES, 'open': close,
+                             'high': close * 1.01, 'low': close * 0.99, 'close': close})
+
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, ['600000.SH', '600001.SH'])
+        monitor = make_monitor(tmp, FakeClient(bars=bars))
+        returned = monitor.run_analysis()
+        monitor.wait_for_notifications()
+
+        calls = monitor._email_notifier.calls
+        emailed = calls[0]['alerts'] if calls else []
+        body = EmailNotifier('smtp.example.com', 587, 'me@example.com', 'x', [])._format_alert_body(emailed)
+        assert all([
+            check("emailed alert carries its chart",
+                  len(emailed) == 1 and (emailed[0].get('sparkline') or '').startswith('<svg')),
+            check("chart inlined in the email body", body.count('<svg') == 1),
+            check("cached on disk by trade date", (tmp / 'cache' / 'sparklines' / '20251017' / '600001.SH.svg').exists()),
+            check("returned alerts stay lean", all('sparkline' not in alert for alert in returned)),
+        ])
+
+
+def test_snapshot_run_sparklines():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, ['600000.SH', '600001.SH'], snapshot_path=str(tmp / 'cache' / 'panel.snap'))
+        monitor = make_monitor(tmp, FakeMarketClient(['600000.SH', '600001.SH'], spiking=['600001.SH'], periods=300))
+        monitor.run_analysis()
+        monitor.wait_for_notifications()
+
+        calls = monitor._email_notifier.calls
+        emailed = calls[0]['alerts'] if calls else []
+        _, series = SparklineRenderer(window=60).series(monitor.panel, ['600001.SH'])
+        assert all([
+            check("snapshot-backed run emails the chart",
+                  len(emailed) == 1 and (emailed[0].get('sparkline') or '').startswith('<svg')),
+            check("fetched history gives MA100 on every charted bar", np.isfinite(series['MA100']).all()),
+        ])
+
+
+if __name__ == "__main__":
+    run_tests("sparkline", test_series_match_indicators, test_svg_shape, test_batch_speed_and_cache,
+              test_email_carries_sparklines, test_snapshot_run_sparklines)
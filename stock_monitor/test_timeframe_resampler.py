@@ -0,0 +1,142 @@
+#!/usr/bin/env python3
+"""Test weekly/monthly bar derivation from daily data"""
+
+import sys
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+import pandas as pd
+
+from stock_analyzer import StockAnalyzer
+from timeframe_resampler import TimeframeResampler
+from testkit import check, run_tests
+
+
+def make_daily_panel(codes=('600846.SH', '002709.SZ'), days=90, seed=7):
+    rng = np.random.default_rng(seed)
+    dates = pd.bdate_range('2025-06-02', periods=days)
+    frames = []
+    for code in codes:
+        close = 20 + np.cumsum(rng.normal(0, 0.5, days))
+        frames.append(pd.DataFrame({
+            'ts_code': code,
+            'trade_date': dates,
+            'open': close + rng.normal(0, 0.2, days),
+            'high': close + 1,
+            'low': close - 1,
+            'close': close,
+            'vol': rng.integers(1000, 5000, days).astype(float),
+            'amount': rng.integers(10000, 50000, days).astype(float),
+        }))
+    return pd.concat(frames, ignore_index=True)
+
+
+def test_incremental_matches_full_build():
+    """Updating day by day must give the same bars as one full build"""
+    panel = make_daily_panel()
+    dates = sorted(panel['trade_date'].unique())
+
+    full = TimeframeResampler()
+    full.build(panel)
+
+    incremental = TimeframeResampler()
+    incremental.build(panel[panel['trade_date'] < dates[40]])
+    for date in dates[40:]:
+        incremental.update(panel[panel['trade_date'] == date])
+
+    all_passed = True
+    for timeframe in ('W', 'M'):
+        try:
+            pd.testing.assert_frame_equal(full.bars[timeframe], incremental.bars[timeframe], check_dtype=False)
+            print(f"✅ PASS: {timeframe} bars match after incremental updates")
+        except AssertionError as e:
+            print(f"❌ FAIL: {timeframe} bars differ\n{e}")
+            all_passed = False
+
+    # Re-applying a day that is already folded in must be a no-op
+    incremental.update(panel[panel['trade_date'] == dates[-1]])
+    if not full.bars['W'].equals(incremental.bars['W']):
+        print("❌ FAIL: re-applying the last day changed the bars")
+        all_passed = False
+
+    assert all_passed
+
+
+def test_weekly_values():
+    """W:close and W:MA4 against a hand-rolled pandas resample"""
+    panel = make_daily_panel()
+    resampler = TimeframeResampler()
+    resampler.build(panel)
+
+    all_passed = True
+    for code, df in panel.groupby('ts_code'):
+        weekly_close = df.set_index('trade_date')['close'].resample('W-FRI').last().dropna()
+        checks = [
+            ('W:close', weekly_close.iloc[-1]),
+            ('W:MA4', weekly_close.iloc[-4:].mean()),
+        ]
+        for ref, expected in checks:
+            actual = resampler.get_value(ref, code)
+            passed = actual is not None and abs(actual - expected) < 1e-9
+            status = "✅ PASS" if passed else "❌ FAIL"
+            print(f"{status}: {code} {ref} expected {expected:.4f}, got {actual}")
+            all_passed = all_passed and passed
+
+    # Not enough monthly bars for a 20-month MA
+    if resampler.get_value('M:MA20', '600846.SH') is not None:
+        print("❌ FAIL: M:MA20 should be unavailable with 5 months of data")
+        all_passed = False
+
+    assert all_passed
+
+
+def test_refresh_folds_only_new_days():
+    """Refreshing with the whole window touches only the sessions not folded in yet"""
+    panel = make_daily_panel()
+    last = panel['trade_date'].max()
+    resampler = TimeframeResampler()
+    resampler.build(panel[panel['trade_date'] < last])
+
+    folded = []
+    update_timeframe = resampler._update_timeframe
+    resampler._update_timeframe = lambda timeframe, rows: (folded.append(rows['trade_date'].max()),
+                                                           update_timeframe(timeframe, rows))
+    resampler.refresh(panel)
+    resampler.refresh(panel)
+
+    full = TimeframeResampler()
+    full.build(panel)
+    assert all([
+        check("only the new session is folded in, once per timeframe", folded == [last, last]),
+        check("bars match a full build", full.bars['W'].equals(resampler.bars['W'])),
+    ])
+
+
+def test_mtr_alert_reports_weekly_ma20():
+    """Both analysis paths put the weekly MA20 next to the MA100 in MTR alerts"""
+    days = 160
+    close = np.linspace(10, 20, days)
+    close[-1] = close[-2] - 0.5
+    dates = pd.bdate_range(end='2025-10-17', periods=days)
+    df = pd.DataFrame({'ts_code': '600846.SH', 'trade_date': dates, 'open': close,
+                       'high': close + 0.1, 'low': close - 0.1, 'close': close})
+    expected = df.set_index('trade_date')['close'].resample('W-FRI').last().dropna().iloc[-20:].mean()
+
+    analyzer = StockAnalyzer()
+    batch = analyzer.analyze_panel(df)
+    per_stock = StockAnalyzer().analyze_multiple_stocks({'600846.SH': df})
+    weekly = [alerts[0]['mtr_drop_alert']['weekly_ma20'] if alerts and alerts[0]['mtr_drop_alert'] else None
+              for alerts in (batch, per_stock)]
+    assert all([
+        check(f"MTR alert carries W:MA20 {weekly}", all(w is not None and abs(w - expected) < 1e-9 for w in weekly)),
+        check("get_value agrees with get_values",
+              abs(analyzer.get_timeframe_value('600846.SH', 'W:MA20')
+                  - analyzer.timeframes.get_values('W:MA20')['600846.SH']) < 1e-9),
+    ])
+
+
+if __name__ == "__main__":
+    run_tests("timeframe resampler", test_incremental_matches_full_build, test_weekly_values,
+              test_refresh_folds_only_new_days, test_mtr_alert_reports_weekly_ma20)
@@ -0,0 +1,68 @@
+#!/usr/bin/env python3
+"""Test universe filtering by exchange and board and the cached stock_basic snapshot"""
+
+import os
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from testkit import FakeMarketClient, check, run_tests
+from universe_loader import UniverseLoader
+
+CODES = ['600000.SH', '688001.SH', '000001.SZ', '300001.SZ', '300002.SZ']
+
+
+def test_filters():
+    with tempfile.TemporaryDirectory() as tmp:
+        loader = UniverseLoader(FakeMarketClient(CODES), tmp)
+        rejected = []
+        for options in ({'exchange': 'NYSE'}, {'board': 'nasdaq'}):
+            try:
+                loader.load(**options)
+            except ValueError:
+                rejected.append(options)
+        assert all([
+            check("no filter keeps every stock", loader.load() == CODES),
+            check("exchange filter, either spelling",
+                  loader.load(exchange='SH') == loader.load(exchange='SSE') == ['600000.SH', '688001.SH']),
+            check("board filter", loader.load(board='chinext') == ['300001.SZ', '300002.SZ']),
+            check("exchange and board combined",
+                  loader.load(exchange='SZ', board='主板') == ['000001.SZ']
+                  and loader.load(exchange='SZ', board='star') == []),
+            check("unknown exchange or board is rejected", len(rejected) == 2),
+            check("industries indexed by code", loader.industries()['300001.SZ'] == '软件服务'),
+        ])
+
+
+def test_snapshot_cache():
+    with tempfile.TemporaryDirectory() as tmp:
+        client = FakeMarketClient(CODES)
+        UniverseLoader(client, tmp).load()
+        UniverseLoader(client, tmp).load()
+        fresh_requests = len(client.requests)
+
+        # A week-old snapshot is refreshed; a failed refresh falls back to it
+        snapshot = Path(tmp) / 'stock_basic.csv'
+        week_ago = time.time() - 8 * 86400
+        os.utime(snapshot, (week_ago, week_ago))
+        client.get_stock_basic = lambda: None
+        stale = UniverseLoader(client, tmp).load()
+
+        snapshot.unlink()
+        try:
+            UniverseLoader(client, tmp).load()
+            raised = False
+        except RuntimeError:
+            raised = True
+        assert all([
+            check("fresh snapshot served from disk", fresh_requests == 1),
+            check("stale snapshot used when the refresh fails", stale == CODES),
+            check("no snapshot and no API is an error", raised),
+        ])
+
+
+if __name__ == "__main__":
+    run_tests("universe loader", test_filters, test_snapshot_cache)
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""Test multi-watchlist runs: one fetch per unique stock, one email per list"""
+
+import json
+import sys
+import tempfile
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+from testkit import FakeClient, check, make_monitor, run_tests, write_config
+
+CRASHING = {'600846.SH', '002709.SZ'}
+
+
+def routed(notifier) -> list:
+    """(watchlist, receivers, alerted codes) of each email"""
+    return [(call['watchlist_name'], call['receivers'], codes) for call, codes in zip(notifier.calls, notifier.sent)]
+
+
+def test_union_fetch_and_fan_out():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        (tmp / 'growth.csv').write_text("股票代码\n300959.SZ\n600846.SH\n002709.SZ\n")
+        (tmp / 'value.csv').write_text("股票代码\n600846.SH\n300959.SZ\n")
+        (tmp / 'quiet.csv').write_text("股票代码\n300959.SZ\n")
+        config = {
+            "tushare": {"api_key": "unused"},
+            "email": {"receivers": ["team@example.com"]},
+            "schedule": {"run_time": "15:30"},
+            "price_adjustment": "none",
+            "cache_dir": str(tmp / 'cache'),
+            "watchlists": {
+                "growth": {"stock_list_path": str(tmp / 'growth.csv'), "receivers": ["growth@example.com"]},
+                "value": {"stock_list_path": str(tmp / 'value.csv'), "rules": ["mtr_drop"]},
+                "quiet": {"stock_list_path": str(tmp / 'quiet.csv')}
+            }
+        }
+        (tmp / 'config.json').write_text(json.dumps(config))
+
+        monitor = make_monitor(tmp, FakeClient(CRASHING))
+        alerts = monitor.run_analysis()
+        monitor.wait_for_notifications()
+        sent = routed(monitor._email_notifier)
+
+        assert all([
+            check("each unique stock fetched once", sorted(monitor._tushare_client.fetched)
+                  == ['002709.SZ', '300959.SZ', '600846.SH']),
+            check("union analyzed once", sorted(a['stock_code'] for a in alerts) == ['002709.SZ', '600846.SH']),
+            check("list with alerts gets its own email and receivers",
+                  ('growth', ['growth@example.com'], ['002709.SZ', '600846.SH']) in sent),
+            check("rule settings filter alerts (value only wants mtr_drop)",
+                  all(name != 'value' for name, _, _ in sent)),
+            check("lists without alerts get no email", len(sent) == 1),
+        ])
+
+
+def test_single_list_config_unchanged():
+    with tempfile.TemporaryDirectory() as tmp:
+        tmp = Path(tmp)
+        write_config(tmp, ['600846.SH', '300959.SZ'])
+        monitor = make_monitor(tmp, FakeClient(CRASHING))
+        monitor.run_analysis()
+        monitor.wait_for_notifications()
+
+        assert check("single stock_list_path sends one untagged email",
+                     routed(monitor._email_notifier) == [(None, ['me@example.com'], ['600846.SH'])])
+
+
+if __name__ == "__main__":
+    run_tests("watchlist", test_union_fetch_and_fan_out, test_single_list_config_unchanged)
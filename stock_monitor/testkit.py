@@ -0,0 +1,173 @@
+"""
+Shared stand-ins and helpers for the test scripts.
+
+Every test_*.py runs on its own (`python test_x.py`, printing a PASS/FAIL line
+per check) and under pytest (each test function asserts its checks).
+"""
+import json
+import sys
+import time
+from pathlib import Path
+from typing import Callable, Dict, Iterable, List, Optional
+
+sys.path.insert(0, str(Path(__file__).parent / 'src'))
+
+import numpy as np
+import pandas as pd
+
+DATES = pd.bdate_range(end='2025-10-17', periods=120)
+
+
+def check(description: str, passed: bool) -> bool:
+    status = "✅ PASS" if passed else "❌ FAIL"
+    print(f"{status}: {description}")
+    return passed
+
+
+def run_tests(title: str, *tests: Callable) -> bool:
+    """Run test functions outside pytest; a failed assert marks the test failed and the next one runs"""
+    passed = True
+    for test in tests:
+        try:
+            test()
+        except AssertionError:
+            passed = False
+            print(f"❌ FAIL: {test.__name__}")
+
+    print("=" * 60)
+    if passed:
+        print(f"✅ All {title} tests passed!")
+    else:
+        print("❌ Some tests failed!")
+    print("=" * 60)
+    return passed
+
+
+def flat_bars(stock_code: str, crash: bool = False, dates=DATES) -> pd.DataFrame:
+    """Flat history at 10; a crashing stock closes at 7 on the last bar (30% below the 9/30 baseline)"""
+    close = np.full(len(dates), 10.0)
+    if crash:
+        close[-1] = 7.0
+    return pd.DataFrame({'ts_code': stock_code, 'trade_date': dates, 'open': close,
+                         'high': close * 1.01, 'low': close * 0.99, 'close': close})
+
+
+class FakeClient:
+    """TushareClient stand-in: serves `bars(stock_code)` and records every fetch"""
+
+    def __init__(self, crashing: Iterable[str] = (), session: Optional[str] = None, delay: float = 0,
+                 bars: Optional[Callable[[str], pd.DataFrame]] = None):
+        crashing = set(crashing)
+        self.bars = bars or (lambda stock_code: flat_bars(stock_code, stock_code in crashing))
+        self.session = session  # None: trade calendar unavailable
+        self.delay = delay
+        self.fetched: List[str] = []
+        self.metrics = {}
+
+    def get_latest_closed_session(self, refresh=False):
+        return self.session
+
+    def get_stock_data(self, stock_code, days=30):
+        if self.delay:
+            time.sleep(self.delay)
+        self.fetched.append(stock_code)
+        return self.bars(stock_code)
+
+
+def spiking_bars(stock_code: str, spike: bool = False, dates=None) -> pd.DataFrame:
+    """Flat at 10 on `dates`; a spiking stock jumps 25% and then drops 15% (the Bollinger rule)"""
+    close = np.full(len(dates), 10.0)
+    if spike:
+        close[-2] = 12.5
+        close[-1] = 12.5 * 0.85
+    return pd.DataFrame({'ts_code': stock_code, 'trade_date': dates, 'open': close,
+                         'high': close * 1.01, 'low': close * 0.99, 'close': close, 'vol': 1000.0})
+
+
+class FakeMarketClient:
+    """TushareClient stand-in for full-market runs: stock_basic, the trade calendar and daily bars by date.
+
+    The calendar is the business days up to yesterday, so the run's date window always covers it.
+    Every API call is recorded in `requests` as (api name, argument).
+    """
+
+    def __init__(self, codes: Iterable[str], spiking: Iterable[str] = (), periods: int = 120):
+        self.codes = list(codes)
+        self.spiking = set(spiking)
+        self.dates = pd.bdate_range(end=pd.Timestamp.now().normalize() - pd.Timedelta(days=1), periods=periods)
+        self.requests: List[tuple] = []
+        self.metrics = {}
+
+    def get_stock_basic(self):
+        self.requests.append(('stock_basic', None))
+        board = {'300': '创业板', '688': '科创板'}
+        return pd.DataFrame({
+            'ts_code': self.codes,
+            'symbol': [code[:6] for code in self.codes],
+            'name': [f'股票{code[:6]}' for code in self.codes],
+            'industry': ['银行' if code.endswith('.SH') else '软件服务' for code in self.codes],
+            'market': [board.get(code[:3], '主板') for code in self.codes],
+            'exchange': ['SSE' if code.endswith('.SH') else 'SZSE' for code in self.codes],
+            'list_date': '20100101',
+        })
+
+    def get_trade_dates(self, start_date, end_date):
+        self.requests.append(('trade_cal', (start_date, end_date)))
+        dates = self.dates.strftime('%Y%m%d')
+        return [d for d in dates if start_date <= d <= end_date]
+
+    def get_latest_closed_session(self, refresh=False):
+        return self.dates[-1].strftime('%Y%m%d')
+
+    def get_daily_by_date(self, trade_date):
+        self.requests.append(('daily', trade_date))
+        frames = [spiking_bars(code, code in self.spiking, self.dates) for code in self.codes]
+        day = pd.concat(frames, ignore_index=True)
+        day = day[day['trade_date'] == pd.Timestamp(trade_date)]
+        return day.assign(trade_date=trade_date).reset_index(drop=True) if not day.empty else None
+
+
+class RecordingNotifier:
+    """EmailNotifier stand-in keeping every send_alert call; `up=False` fails like an unreachable server"""
+
+    def __init__(self, up: bool = True, delay: float = 0):
+        self.up = up
+        self.delay = delay
+        self.calls: List[Dict] = []
+
+    def send_alert(self, alerts, receivers=None, watchlist_name=None, label=None, note=None, sectors=None):
+        if self.delay:
+            time.sleep(self.delay)
+        if self.up:
+            self.calls.append({'alerts': alerts, 'receivers': receivers, 'watchlist_name': watchlist_name,
+                               'label': label, 'note': note, 'sectors': sectors})
+        return self.up
+
+    @property
+    def sent(self) -> List[List[str]]:
+        """Alerted stock codes of each email, sorted"""
+        return [sorted(a['stock_code'] for a in call['alerts']) for call in self.calls]
+
+
+def write_config(tmp: Path, stocks=None, name: str = 'config', **settings) -> Path:
+    """Config for a run inside `tmp`; `stocks` is the watchlist CSV text or a list of codes"""
+    if stocks is not None:
+        text = stocks if isinstance(stocks, str) else "股票代码\n" + "\n".join(stocks) + "\n"
+        (tmp / 'stocks.csv').write_text(text)
+    config = {"tushare": {"api_key": "unused"}, "email": {"receivers": ["me@example.com"]},
+              "schedule": {"run_time": "15:30"}, "price_adjustment": "none",
+              "stock_list_path": str(tmp / 'stocks.csv'), "cache_dir": str(tmp / 'cache')}
+    config.update(settings)
+    path = tmp / f'{name}.json'
+    path.write_text(json.dumps(config))
+    return path
+
+
+def make_monitor(tmp: Path, client=None, notifier=None, config: str = 'config.json'):
+    """StockMonitor on `tmp/config.json` with stand-ins for the API client and the email notifier"""
+    from stock_monitor import StockMonitor
+
+    monitor = StockMonitor(str(tmp / config))
+    monitor._tushare_client = client if client is not None else FakeClient()
+    monitor._email_notifier = notifier if notifier is not None else RecordingNotifier()
+    return monitor